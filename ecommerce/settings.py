@@ -52,7 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    # 'shop.middleware.LogRequestsMiddleware',
+    "shop.middleware.AccessLogMiddleware",
+    "shop.middleware.ServerTimingMiddleware",
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -151,18 +152,126 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, "shop/static")]
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "shop",
+    },
+    # При нескольких воркерах нужен общий кэш, например:
+    # "default": {
+    #     "BACKEND": "django.core.cache.backends.redis.RedisCache",
+    #     "LOCATION": "redis://127.0.0.1:6379",
+    # },
+    # или django.core.cache.backends.filebased.FileBasedCache
+}
+
+# Кэш ответов витрины (баннеры, популярные, ограниченные, скидки, теги)
+STOREFRONT_CACHE = {
+    "ALIAS": "default",
+    "TIMEOUT": 60,
+    "STALE_TIMEOUT": 300,
+}
+
+# Хранилище корзин: "database" (BasketItem) или "cache" — корзина в кэше,
+# измененные корзины пишет в БД команда flush_baskets (--interval)
+BASKET_STORAGE = {
+    "BACKEND": "database",
+    "ALIAS": "default",
+    "BATCH_SIZE": 500,
+}
+
+# Магазин ЮKassa. Уведомления принимает /api/payment/yookassa-webhook;
+# CHECK_WEBHOOK_IP пропускает только адреса ЮKassa. За прокси адрес
+# отправителя берется из X-Forwarded-For, если REMOTE_ADDR входит в
+# TRUSTED_PROXIES (адреса или сети через запятую)
+YOOKASSA = {
+    "ACCOUNT_ID": os.environ.get("YOOKASSA_ACCOUNT_ID", "1001674"),
+    "SECRET_KEY": os.environ.get(
+        "YOOKASSA_SECRET_KEY", "test_AX2vIdQrcGW0dwjLkIhAo7KecbtPvghXFfAqskjQ9yg"
+    ),
+    "API_URL": os.environ.get("YOOKASSA_API_URL", "https://api.yookassa.ru/v3"),
+    "CHECK_WEBHOOK_IP": os.environ.get("YOOKASSA_CHECK_WEBHOOK_IP", "0") == "1",
+    "TRUSTED_PROXIES": [
+        proxy.strip()
+        for proxy in os.environ.get("TRUSTED_PROXIES", "127.0.0.1,::1").split(",")
+        if proxy.strip()
+    ],
+}
+
+# Сколько секунд хранится ответ на запрос с заголовком Idempotency-Key
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+# Через сколько секунд незавершенный запрос с Idempotency-Key считается
+# брошенным (воркер упал) и ключ можно занять повторно
+IDEMPOTENCY_LEASE_TIMEOUT = 2 * 60
+
+# Сколько секунд неоплаченный заказ удерживает товар (StockReservation)
+STOCK_RESERVATION_TTL = 30 * 60
+
+# Время жизни дерева категорий в кэше (секунды); сбрасывается сигналами Category
+CATEGORY_TREE_CACHE_TIMEOUT = 60 * 60
+
+# Загружаемые файлы получают хэш содержимого в имени (shop/storage.py)
+STORAGES = {
+    "default": {"BACKEND": "shop.storage.HashedMediaStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# Отдача MEDIA_ROOT (shop.views_media.serve_media). В production байты отдает
+# nginx: BACKEND "x-accel-redirect" и
+#   location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+# или Apache/lighttpd с "x-sendfile"; "python" — FileResponse для разработки
+MEDIA_SERVING = {
+    "BACKEND": os.environ.get("MEDIA_SERVING_BACKEND", "python"),
+    "INTERNAL_URL": "/protected-media/",
+    "MAX_AGE": 60 * 60,
+}
+
+# Производные изображений (shop/images.py): уменьшенные копии в AVIF/WebP
+# строятся после сохранения в пуле потоков, недостающие — при первом запросе
+IMAGE_DERIVATIVES = {
+    "WIDTHS": [200, 400, 800],
+    "FORMATS": ["avif", "webp"],
+    "BACKGROUND": True,
+    "WORKERS": 2,
+}
+
+# Асинхронные эндпоинты витрины (shop/views_async.py); ecommerce/asgi.py
+# включает их по умолчанию, под WSGI остаются синхронные
+SHOP_ASYNC_VIEWS = os.environ.get("SHOP_ASYNC_VIEWS", "0") == "1"
+
+
+# Журнал запросов shop.access (shop.middleware.AccessLogMiddleware)
+ACCESS_LOG = {
+    "SAMPLE_RATE": float(os.environ.get("ACCESS_LOG_SAMPLE_RATE", "1.0")),
+    "SLOW_REQUEST_MS": 1000,
+    "HEADERS": ["User-Agent", "Referer"],
+}
+
+# Заголовок Server-Timing (shop.middleware.ServerTimingMiddleware); в production
+# включается для доли запросов, X-Query-Count — только при DEBUG
+SERVER_TIMING = {
+    "SAMPLE_RATE": float(
+        os.environ.get("SERVER_TIMING_SAMPLE_RATE", "1.0" if DEBUG else "0.05")
+    ),
+    "DEBUG_HEADERS": DEBUG,
+    "DUPLICATE_QUERY_THRESHOLD": 3,
+}
+
 
 class ColorFormatter(logging.Formatter):
+    COLORS = {
+        "INFO": Fore.GREEN,
+        "WARNING": Fore.RED,
+        "ERROR": Fore.MAGENTA,
+        "DEBUG": Fore.CYAN,
+    }
+
     def format(self, record):
-        if record.levelname == "INFO":
-            record.msg = f"{Fore.GREEN}{record.msg}{Style.RESET_ALL}"
-        elif record.levelname == "WARNING":
-            record.msg = f"{Fore.RED}{record.msg}{Style.RESET_ALL}"
-        elif record.levelname == "ERROR":
-            record.msg = f"{Fore.MAGENTA}{record.msg}{Style.RESET_ALL}"
-        elif record.levelname == "DEBUG":
-            record.msg = f"{Fore.CYAN}{record.msg}{Style.RESET_ALL}"
-        return super().format(record)
+        # Цвет добавляется к готовой строке: запись не меняется для других
+        # обработчиков
+        message = super().format(record)
+        color = self.COLORS.get(record.levelname)
+        return f"{color}{message}{Style.RESET_ALL}" if color else message
 
 
 LOGGING = {
@@ -172,6 +281,9 @@ LOGGING = {
         "colored": {
             "()": "ecommerce.settings.ColorFormatter",
         },
+        "json": {
+            "()": "shop.log_handlers.JsonFormatter",
+        },
         "verbose": {
             "format": "{levelname} {asctime} {module} {message}",
             "style": "{",
@@ -182,16 +294,27 @@ LOGGING = {
         },
     },
     "handlers": {
+        # Запись идет через очередь: поток запроса не ждет ввода-вывода
         "console": {
             "level": "INFO",
-            "class": "logging.StreamHandler",
+            "class": "shop.log_handlers.QueueStreamHandler",
             "formatter": "colored",
         },
+        "json": {
+            "level": "INFO",
+            "class": "shop.log_handlers.QueueStreamHandler",
+            "formatter": "json",
+        },
     },
     "loggers": {
         "django": {
             "handlers": ["console"],
             "level": "INFO",
         },
+        "shop": {
+            "handlers": ["json"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
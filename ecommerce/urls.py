@@ -16,8 +16,6 @@ Including another URLconf
 """
 
 # ecommerce/urls.py
-from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
@@ -25,7 +23,4 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("shop.urls")),
     # path('__debug__/', include('debug_toolbar.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
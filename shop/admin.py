@@ -6,11 +6,13 @@ from .models import (
     Category,
     Order,
     OrderItem,
+    PaymentNotification,
     Product,
     ProductImage,
     Profile,
     Review,
     Sale,
+    StockReservation,
     Tag,
 )
 
@@ -41,9 +43,18 @@ class ProductImageInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("title", "price", "count", "category", "date_added")
+    list_display = (
+        "title",
+        "price",
+        "count",
+        "category",
+        "date_added",
+        "rating",
+        "reviews_count",
+    )
     search_fields = ("title", "description")
     list_filter = ("category", "free_delivery")
+    readonly_fields = Product.RATING_FIELDS
     prepopulated_fields = {"title": ("description",)}
     inlines = [ProductImageInline]
 
@@ -96,3 +107,17 @@ class OrderAdmin(admin.ModelAdmin):
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ("order", "product", "quantity", "price")
     search_fields = ("order__id", "product__title")
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("order", "product", "quantity", "status", "expires_at")
+    search_fields = ("order__id", "product__title")
+    list_filter = ("status",)
+
+
+@admin.register(PaymentNotification)
+class PaymentNotificationAdmin(admin.ModelAdmin):
+    list_display = ("payment_id", "event", "received_at")
+    search_fields = ("payment_id",)
+    list_filter = ("event",)
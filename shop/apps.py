@@ -2,11 +2,20 @@ from django.apps import AppConfig
 
 
 class ShopConfig(AppConfig):
+    # В модуле два AppConfig: без default Django не вызывает ready()
+    default = True
     default_auto_field = "django.db.models.BigAutoField"
     name = "shop"
 
-    # def ready(self):
-    #         import shop.signals  # noqa: F401
+    def ready(self):
+        import shop.category_tree  # noqa: F401
+        import shop.images  # noqa: F401
+        import shop.response_cache  # noqa: F401
+        from shop import instrumentation
+
+        instrumentation.install()
+
+        # import shop.signals  # noqa: F401
 
 
 class FrontendConfig(AppConfig):
@@ -0,0 +1,447 @@
+# shop/basket.py
+import contextlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import BasketItem, Product
+
+DEFAULT_OPTIONS = {
+    # "database" — корзина в таблице BasketItem,
+    # "cache" — корзина в кэше с отложенной записью в BasketItem
+    "BACKEND": "database",
+    # Алиас из CACHES. Для бэкенда "cache" нужен общий кэш без вытеснения
+    # (Redis): корзины, еще не записанные в БД, хранятся только в нем
+    "ALIAS": "default",
+    # Сколько корзин записывается в БД за одну транзакцию
+    "BATCH_SIZE": 500,
+    "LOCK_TIMEOUT": 5,
+}
+
+SESSION_BASKET_KEY = "basket_id"
+# Измененные корзины: метка на пользователя и журнал пометок
+# (счетчик + ячейка на каждую пометку), который читает flush_dirty_baskets
+DIRTY_MARKER_KEY = "basket:dirty:{user_id}"
+DIRTY_SEQ_KEY = "basket:dirty-log:seq"
+DIRTY_SLOT_KEY = "basket:dirty-log:{number}"
+DIRTY_CURSOR_KEY = "basket:dirty-log:cursor"
+DIRTY_GAP_KEY = "basket:dirty-log:gap"
+
+UPSERT_SQL = """
+    INSERT INTO {table} (user_id, product_id, quantity, added_at)
+    SELECT %s, id, %s, NOW() FROM {product_table} WHERE id = %s
+    ON CONFLICT (user_id, product_id)
+    DO UPDATE SET quantity = {table}.quantity + EXCLUDED.quantity
+    RETURNING quantity
+"""
+
+
+def get_options():
+    return {**DEFAULT_OPTIONS, **getattr(settings, "BASKET_STORAGE", {})}
+
+
+def get_cache():
+    return caches[get_options()["ALIAS"]]
+
+
+def add_basket_item(user, product_id, count):
+    """
+    Атомарно добавляет count единиц товара в корзину.
+    Возвращает новое количество или None, если товара нет.
+    """
+    if connection.vendor == "postgresql":
+        sql = UPSERT_SQL.format(
+            table=BasketItem._meta.db_table, product_table=Product._meta.db_table
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.id, count, product_id])
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # Запасной вариант через ORM: UPDATE с F(), при отсутствии строки — INSERT
+    items = BasketItem.objects.filter(user=user, product_id=product_id)
+    with transaction.atomic():
+        if not items.update(quantity=F("quantity") + count):
+            if not Product.objects.filter(id=product_id).exists():
+                return None
+            try:
+                with transaction.atomic():
+                    BasketItem.objects.create(
+                        user=user, product_id=product_id, quantity=count
+                    )
+                    return count
+            except IntegrityError:
+                # Строку успел создать параллельный запрос
+                items.update(quantity=F("quantity") + count)
+    return items.values_list("quantity", flat=True).first()
+
+
+def remove_basket_item(user, product_id, count):
+    """
+    Уменьшает количество товара в корзине на count и удаляет строку,
+    когда оно доходит до нуля. Возвращает False, если товара в корзине нет.
+    """
+    items = BasketItem.objects.filter(user=user, product_id=product_id)
+    with transaction.atomic():
+        if items.filter(quantity__gt=count).update(quantity=F("quantity") - count):
+            return True
+        deleted, _ = items.filter(quantity__lte=count).delete()
+    return bool(deleted)
+
+
+def apply_deltas(items, deltas):
+    """Применяет {id товара: изменение} к словарю {id товара: количество}."""
+    for product_id, count in deltas.items():
+        quantity = items.get(product_id, 0) + count
+        if quantity > 0:
+            items[product_id] = quantity
+        else:
+            items.pop(product_id, None)
+    return items
+
+
+def missing_products(product_ids):
+    product_ids = set(product_ids)
+    if not product_ids:
+        return set()
+    return product_ids - set(
+        Product.objects.filter(id__in=product_ids).values_list("id", flat=True)
+    )
+
+
+class DatabaseBasket:
+    """Корзина пользователя в таблице BasketItem."""
+
+    def __init__(self, user):
+        self.user = user
+
+    def items(self):
+        """Возвращает {id товара: количество} в порядке добавления."""
+        return dict(
+            BasketItem.objects.filter(user=self.user)
+            .order_by("id")
+            .values_list("product_id", "quantity")
+        )
+
+    def add(self, product_id, count):
+        return add_basket_item(self.user, product_id, count) is not None
+
+    def remove(self, product_id, count):
+        return remove_basket_item(self.user, product_id, count)
+
+    def apply(self, deltas):
+        """
+        Применяет изменения в одной транзакции.
+        Возвращает False, если добавляемого товара не существует.
+        """
+        with transaction.atomic():
+            existing = {
+                item.product_id: item
+                for item in BasketItem.objects.select_for_update().filter(
+                    user=self.user, product_id__in=deltas
+                )
+            }
+            new_ids = [
+                product_id
+                for product_id, count in deltas.items()
+                if count > 0 and product_id not in existing
+            ]
+            if missing_products(new_ids):
+                return False
+            to_update, to_delete = [], []
+            for product_id, item in existing.items():
+                item.quantity += deltas[product_id]
+                if item.quantity > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.id)
+            # Новых строк select_for_update не блокирует: параллельный запрос
+            # мог успеть их создать, поэтому добавляем через upsert
+            for product_id in new_ids:
+                add_basket_item(self.user, product_id, deltas[product_id])
+            BasketItem.objects.bulk_update(to_update, ["quantity"])
+            BasketItem.objects.filter(id__in=to_delete).delete()
+        return True
+
+    def clear(self):
+        BasketItem.objects.filter(user=self.user).delete()
+
+    def flush(self):
+        pass
+
+
+@contextlib.contextmanager
+def cache_lock(cache, key):
+    """Простая блокировка на cache.add; зависшая блокировка истекает сама."""
+    lock_key = f"{key}:lock"
+    while not cache.add(lock_key, 1, timeout=get_options()["LOCK_TIMEOUT"]):
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+def user_basket_key(user_id):
+    return f"basket:user:{user_id}"
+
+
+class CacheBasket:
+    """
+    Корзина в кэше: словарь {id товара: количество} на пользователя или сессию.
+
+    Корзины пользователей помечаются измененными и записываются в BasketItem
+    пачками через flush_dirty_baskets(). Анонимные корзины живут только в кэше.
+    """
+
+    def __init__(self, key, user=None):
+        self.key = key
+        self.user = user
+        self.cache = get_cache()
+
+    @classmethod
+    def for_user(cls, user):
+        return cls(user_basket_key(user.id), user)
+
+    def items(self):
+        items = self.cache.get(self.key)
+        if items is None:
+            items = DatabaseBasket(self.user).items() if self.user is not None else {}
+            self.cache.add(self.key, items, timeout=None)
+        return items
+
+    def _update(self, deltas):
+        with cache_lock(self.cache, self.key):
+            items = apply_deltas(self.items(), deltas)
+            self.cache.set(self.key, items, timeout=None)
+        if self.user is not None:
+            mark_dirty([self.user.id])
+
+    def add(self, product_id, count):
+        # Ключи словаря — int, иначе "5" и 5 станут разными позициями
+        product_id = int(product_id)
+        if missing_products([product_id]):
+            return False
+        self._update({product_id: count})
+        return True
+
+    def remove(self, product_id, count):
+        product_id = int(product_id)
+        if product_id not in self.items():
+            return False
+        self._update({product_id: -count})
+        return True
+
+    def apply(self, deltas):
+        deltas = {int(product_id): count for product_id, count in deltas.items()}
+        current = self.items()
+        if missing_products(
+            product_id
+            for product_id, count in deltas.items()
+            if count > 0 and product_id not in current
+        ):
+            return False
+        self._update(deltas)
+        return True
+
+    def clear(self):
+        self.cache.delete(self.key)
+        if self.user is not None:
+            unmark_dirty([self.user.id])
+            BasketItem.objects.filter(user=self.user).delete()
+            # Запрос, прочитавший корзину до коммита, мог вернуть ее в кэш
+            transaction.on_commit(lambda: self.cache.delete(self.key))
+
+    def flush(self):
+        """Синхронно записывает корзину пользователя в BasketItem."""
+        if self.user is not None:
+            unmark_dirty([self.user.id])
+            write_baskets([self.user.id])
+
+
+def marker_key(user_id):
+    return DIRTY_MARKER_KEY.format(user_id=user_id)
+
+
+def next_dirty_number(cache):
+    try:
+        return cache.incr(DIRTY_SEQ_KEY)
+    except ValueError:
+        cache.add(DIRTY_SEQ_KEY, 0, timeout=None)
+        return cache.incr(DIRTY_SEQ_KEY)
+
+
+def mark_dirty(user_ids):
+    """
+    Помечает корзины пользователей измененными без общей блокировки: уже
+    помеченная корзина стоит одного чтения, новая пометка — атомарный incr
+    счетчика и запись своей ячейки журнала. Метка ставится последней, поэтому
+    пометка, прерванная на середине, повторится при следующем изменении.
+    """
+    cache = get_cache()
+    markers = {marker_key(user_id): user_id for user_id in user_ids}
+    marked = cache.get_many(list(markers))
+    for key, user_id in markers.items():
+        if key in marked:
+            continue
+        number = next_dirty_number(cache)
+        cache.set(DIRTY_SLOT_KEY.format(number=number), user_id, timeout=None)
+        cache.set(key, number, timeout=None)
+
+
+def unmark_dirty(user_ids):
+    # Ячейки журнала остаются: pop_dirty пропустит пользователей без метки
+    get_cache().delete_many([marker_key(user_id) for user_id in user_ids])
+
+
+def pop_dirty(limit):
+    """
+    Забирает из журнала до limit пометок и снимает их метки. Возвращает
+    множество id пользователей или None, если читать больше нечего.
+    Блокировка берется только между процессами записи, запросы корзины
+    ее не ждут.
+    """
+    cache = get_cache()
+    with cache_lock(cache, DIRTY_CURSOR_KEY):
+        start = cursor = cache.get(DIRTY_CURSOR_KEY, 0)
+        seq = cache.get(DIRTY_SEQ_KEY, 0)
+        if seq < cursor:
+            # Счетчик потерян вместе с кэшем и начат заново
+            start = cursor = 0
+        last = min(seq, cursor + limit)
+        keys = {
+            DIRTY_SLOT_KEY.format(number=number): number
+            for number in range(cursor + 1, last + 1)
+        }
+        slots = cache.get_many(list(keys))
+        for key, number in keys.items():
+            if key in slots:
+                cursor = number
+                continue
+            # Ячейка еще не записана: счетчик увеличен, set не выполнен.
+            # Пропускаем ее, только если она пустует дольше LOCK_TIMEOUT
+            # (процесс упал между incr и set)
+            gap = cache.get(DIRTY_GAP_KEY)
+            if gap is None or gap[0] != number:
+                cache.set(DIRTY_GAP_KEY, (number, time.time()), timeout=None)
+                break
+            if time.time() - gap[1] < get_options()["LOCK_TIMEOUT"]:
+                break
+            cursor = number
+        if cursor == start:
+            return None
+        users = {user_id for key, user_id in slots.items() if keys[key] <= cursor}
+        # Корзины без метки уже записаны (flush, clear) — пропускаем
+        marked = cache.get_many([marker_key(user_id) for user_id in users])
+        batch = {user_id for user_id in users if marker_key(user_id) in marked}
+        # Метки снимаем до чтения корзин: изменение после этого поставит новую
+        unmark_dirty(batch)
+        cache.delete_many([key for key, number in keys.items() if number <= cursor])
+        cache.set(DIRTY_CURSOR_KEY, cursor, timeout=None)
+    return batch
+
+
+def write_baskets(user_ids):
+    """
+    Записывает закэшированные корзины пользователей в BasketItem
+    фиксированным числом запросов на пачку.
+    """
+    keys = {user_basket_key(user_id): user_id for user_id in user_ids}
+    baskets = {
+        keys[key]: items for key, items in get_cache().get_many(list(keys)).items()
+    }
+    if not baskets:
+        return 0
+    # Товары, удаленные после добавления в корзину, пропускаем
+    missing = missing_products(
+        product_id for items in baskets.values() for product_id in items
+    )
+    with transaction.atomic():
+        rows = {
+            (item.user_id, item.product_id): item
+            for item in BasketItem.objects.select_for_update().filter(
+                user_id__in=baskets
+            )
+        }
+        to_create, to_update = [], []
+        for user_id, items in baskets.items():
+            for product_id, quantity in items.items():
+                if product_id in missing:
+                    continue
+                row = rows.pop((user_id, product_id), None)
+                if row is None:
+                    to_create.append(
+                        BasketItem(
+                            user_id=user_id, product_id=product_id, quantity=quantity
+                        )
+                    )
+                elif row.quantity != quantity:
+                    row.quantity = quantity
+                    to_update.append(row)
+        BasketItem.objects.bulk_create(to_create)
+        BasketItem.objects.bulk_update(to_update, ["quantity"])
+        BasketItem.objects.filter(id__in=[row.id for row in rows.values()]).delete()
+    return len(baskets)
+
+
+def flush_dirty_baskets(batch_size=None):
+    """Записывает в БД все измененные корзины пачками. Возвращает их число."""
+    batch_size = batch_size or get_options()["BATCH_SIZE"]
+    flushed = 0
+    while True:
+        batch = pop_dirty(batch_size)
+        if batch is None:
+            return flushed
+        if not batch:
+            continue
+        try:
+            flushed += write_baskets(batch)
+        except Exception:
+            mark_dirty(batch)
+            raise
+
+
+def get_basket_store(request, create=False):
+    """
+    Возвращает корзину текущего посетителя или None, если она недоступна.
+    Анонимная корзина в сессии поддерживается только бэкендом "cache";
+    create=True создает ее, если ее еще нет.
+    """
+    if get_options()["BACKEND"] != "cache":
+        if not request.user.is_authenticated:
+            return None
+        return DatabaseBasket(request.user)
+    if request.user.is_authenticated:
+        return CacheBasket.for_user(request.user)
+    basket_id = request.session.get(SESSION_BASKET_KEY)
+    if basket_id is None:
+        if not create:
+            return CacheBasket("basket:session:empty")
+        basket_id = request.session[SESSION_BASKET_KEY] = uuid.uuid4().hex
+    return CacheBasket(f"basket:session:{basket_id}")
+
+
+def merge_session_basket(request, user):
+    """Переносит анонимную корзину сессии в корзину вошедшего пользователя."""
+    basket_id = request.session.pop(SESSION_BASKET_KEY, None)
+    if basket_id is None:
+        return
+    session_basket = CacheBasket(f"basket:session:{basket_id}")
+    items = session_basket.items()
+    session_basket.cache.delete(session_basket.key)
+    missing = missing_products(items)
+    deltas = {
+        product_id: count
+        for product_id, count in items.items()
+        if product_id not in missing
+    }
+    if not deltas:
+        return
+    if get_options()["BACKEND"] == "cache":
+        CacheBasket.for_user(user).apply(deltas)
+    else:
+        DatabaseBasket(user).apply(deltas)
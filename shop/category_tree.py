@@ -0,0 +1,111 @@
+# shop/category_tree.py
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .images import image_sources
+from .models import Category
+
+CATEGORY_TREE_VERSION_KEY = "category_tree:version"
+CATEGORY_TREE_KEY = "category_tree:v{version}"
+
+
+def serialize_category_tree(categories):
+    """Строит дерево категорий произвольной глубины из плоского списка."""
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+
+    def serialize(category):
+        return {
+            "id": category.id,
+            "title": category.name,
+            "image": {
+                "src": category.image.url if category.image else None,
+                "alt": category.name,
+                "sources": image_sources(category.image),
+            },
+            "subcategories": [
+                serialize(child) for child in children.get(category.id, [])
+            ],
+        }
+
+    return [serialize(category) for category in children.get(None, [])]
+
+
+def build_category_tree():
+    """Строит дерево категорий произвольной глубины одним запросом."""
+    return serialize_category_tree(Category.objects.order_by("id"))
+
+
+async def abuild_category_tree():
+    return serialize_category_tree(
+        [category async for category in Category.objects.order_by("id")]
+    )
+
+
+def make_category_tree_entry(tree):
+    payload = json.dumps(tree, sort_keys=True).encode()
+    return {"etag": hashlib.md5(payload).hexdigest(), "tree": tree}
+
+
+def get_category_tree_timeout():
+    return getattr(settings, "CATEGORY_TREE_CACHE_TIMEOUT", 60 * 60)
+
+
+def get_category_tree_version():
+    version = cache.get(CATEGORY_TREE_VERSION_KEY)
+    if version is None:
+        # Уникальное начальное значение, чтобы после вытеснения ключа
+        # не попасть на старую запись дерева
+        cache.add(CATEGORY_TREE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATEGORY_TREE_VERSION_KEY)
+    return version
+
+
+def get_category_tree():
+    """
+    Возвращает {"etag": ..., "tree": [...]} из кэша, при промахе строит дерево.
+    """
+    key = CATEGORY_TREE_KEY.format(version=get_category_tree_version())
+    entry = cache.get(key)
+    if entry is None:
+        entry = make_category_tree_entry(build_category_tree())
+        cache.set(key, entry, timeout=get_category_tree_timeout())
+    return entry
+
+
+async def aget_category_tree():
+    """Асинхронный вариант get_category_tree."""
+    version = await cache.aget(CATEGORY_TREE_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATEGORY_TREE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(CATEGORY_TREE_VERSION_KEY)
+    key = CATEGORY_TREE_KEY.format(version=version)
+    entry = await cache.aget(key)
+    if entry is None:
+        entry = make_category_tree_entry(await abuild_category_tree())
+        await cache.aset(key, entry, timeout=get_category_tree_timeout())
+    return entry
+
+
+def invalidate_category_tree():
+    try:
+        cache.incr(CATEGORY_TREE_VERSION_KEY)
+    except ValueError:
+        cache.set(CATEGORY_TREE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    invalidate_category_tree()
+    # Повторно после коммита: запрос, успевший закэшировать дерево
+    # до фиксации транзакции, не оставит в кэше старые данные
+    transaction.on_commit(invalidate_category_tree)
@@ -0,0 +1,447 @@
+# shop/endpoint_benchmarks.py
+import json
+import random
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.test import Client
+
+from .instrumentation import collect_stats
+from .models import Banner, BasketItem, Order, OrderItem, Product, Profile
+from .seeding import seed_shop
+
+PASSWORDS = ("benchmark-password-1", "benchmark-password-2")
+
+
+def card_payment(context, iteration):
+    return {
+        "number": "4111111111111111",
+        "name": "Benchmark",
+        "month": "12",
+        "year": "30",
+        "code": "123",
+    }
+
+
+def basket_delta(context, iteration):
+    return {"id": context["basket_product_ids"][0], "count": 1}
+
+
+# Эндпоинты /api/* с бюджетом SQL-запросов на холодном кэше. path
+# подставляет id из набора данных; data(context, номер итерации) дает тело
+# JSON-запроса; user — от чьего имени выполняется запрос.
+ENDPOINTS = [
+    {"name": "tags", "route": "get_tags", "path": "/api/tags", "budget": 1},
+    {
+        "name": "categories",
+        "route": "get_categories",
+        "path": "/api/categories",
+        "budget": 1,
+    },
+    {
+        "name": "catalog",
+        "route": "get_catalog",
+        "path": "/api/catalog/?limit=20",
+        "budget": 4,
+    },
+    {
+        "name": "catalog_price_cursor",
+        "route": "get_catalog",
+        "path": "/api/catalog/?sort=price&sortType=inc&limit=20&cursor=",
+        "budget": 3,
+    },
+    {
+        "name": "catalog_category",
+        "route": "get_catalog",
+        "path": "/api/catalog/?category={category_id}&sort=rating&limit=20",
+        "budget": 4,
+    },
+    {
+        "name": "catalog_search",
+        "route": "get_catalog",
+        "path": '/api/catalog/?filter={{"name": "product 1"}}&limit=20',
+        "budget": 5,
+    },
+    {
+        "name": "product",
+        "route": "get_product_item",
+        "path": "/api/product/{product_id}",
+        "budget": 5,
+    },
+    {
+        "name": "product_review",
+        "route": "post_product_review",
+        "method": "POST",
+        "path": "/api/product/{product_id}/reviews",
+        "data": lambda context, iteration: {
+            "author": "Benchmark",
+            "email": "benchmark@example.com",
+            "text": f"Review {iteration}",
+            "rate": iteration % 5 + 1,
+        },
+        "budget": 6,
+    },
+    {
+        "name": "popular",
+        "route": "get_products_popular",
+        "path": "/api/products/popular",
+        "budget": 3,
+    },
+    {
+        "name": "limited",
+        "route": "get_products_limited",
+        "path": "/api/products/limited",
+        "budget": 3,
+    },
+    {"name": "sales", "route": "get_sales", "path": "/api/sales/", "budget": 3},
+    {"name": "banners", "route": "get_banners", "path": "/api/banners", "budget": 4},
+    {
+        "name": "sign_in",
+        "route": "api_sign_in",
+        "method": "POST",
+        "path": "/api/sign-in/",
+        "data": lambda context, iteration: {
+            "username": context["username"],
+            "password": PASSWORDS[0],
+        },
+        "budget": 9,
+    },
+    {
+        "name": "sign_up",
+        "route": "api_sign_up",
+        "method": "POST",
+        "path": "/api/sign-up/",
+        "data": lambda context, iteration: {
+            "name": "Benchmark",
+            "username": f"benchmark-{context['run_id']}-{iteration}",
+            "password": PASSWORDS[0],
+        },
+        "budget": 3,
+    },
+    {
+        "name": "sign_out",
+        "route": "api_sign_out",
+        "method": "POST",
+        "path": "/api/sign-out",
+        "user": "customer",
+        "budget": 4,
+    },
+    {
+        "name": "profile",
+        "route": "api_profile",
+        "path": "/api/profile/",
+        "user": "customer",
+        "budget": 3,
+    },
+    {
+        "name": "profile_update",
+        "route": "api_profile",
+        "method": "POST",
+        "path": "/api/profile/",
+        "data": lambda context, iteration: {
+            "fullName": "Benchmark Customer",
+            "email": "customer@example.com",
+            "phone": "+79990000000",
+        },
+        "user": "customer",
+        "budget": 10,
+    },
+    {
+        "name": "profile_password",
+        "route": "api_profile_password",
+        "method": "POST",
+        "path": "/api/profile/password",
+        # Пароль меняется по кругу, чтобы каждая итерация была успешной
+        "data": lambda context, iteration: {
+            "currentPassword": PASSWORDS[iteration % 2],
+            "newPassword": PASSWORDS[(iteration + 1) % 2],
+        },
+        "user": "account",
+        "budget": 10,
+    },
+    {
+        "name": "basket",
+        "route": "basket_view",
+        "path": "/api/basket",
+        "user": "customer",
+        "budget": 6,
+    },
+    {
+        "name": "basket_compact",
+        "route": "basket_view",
+        "path": "/api/basket?view=compact",
+        "user": "customer",
+        "budget": 4,
+    },
+    {
+        "name": "basket_add",
+        "route": "basket_view",
+        "method": "POST",
+        "path": "/api/basket",
+        "data": basket_delta,
+        "user": "customer",
+        "budget": 10,
+    },
+    {
+        "name": "basket_remove",
+        "route": "basket_view",
+        "method": "DELETE",
+        "path": "/api/basket",
+        "data": basket_delta,
+        "user": "customer",
+        "budget": 9,
+    },
+    {
+        "name": "basket_bulk",
+        "route": "basket_bulk",
+        "method": "POST",
+        "path": "/api/basket/bulk",
+        "data": lambda context, iteration: [
+            {"id": product_id, "count": 1 if iteration % 2 == 0 else -1}
+            for product_id in context["basket_product_ids"][:10]
+        ],
+        "user": "customer",
+        "budget": 10,
+    },
+    {
+        "name": "orders",
+        "route": "orders_view",
+        "path": "/api/orders/",
+        "user": "customer",
+        "budget": 7,
+    },
+    {
+        "name": "order_create",
+        "route": "orders_view",
+        "method": "POST",
+        "path": "/api/orders/",
+        "data": lambda context, iteration: [
+            {"id": product_id, "count": 1}
+            for product_id in context["basket_product_ids"][:3]
+        ],
+        "user": "customer",
+        "budget": 12,
+    },
+    {
+        "name": "order",
+        "route": "order_view",
+        "path": "/api/orders/{order_id}/",
+        "user": "customer",
+        "budget": 7,
+    },
+    {
+        "name": "order_update",
+        "route": "order_view",
+        "method": "POST",
+        "path": "/api/orders/{order_id}/",
+        "data": lambda context, iteration: {"status": "accepted"},
+        "user": "customer",
+        "budget": 7,
+    },
+    {
+        "name": "history",
+        "route": "get_history_order",
+        "path": "/api/history-order",
+        "user": "customer",
+        "budget": 3,
+    },
+    {
+        "name": "payment",
+        "route": "post_payment",
+        "method": "POST",
+        "path": "/api/payment/{order_id}/",
+        "data": card_payment,
+        "user": "customer",
+        "budget": 6,
+    },
+]
+
+# Маршруты /api/*, которые не замеряются, и причина
+EXCLUDED_ROUTES = {
+    "api_profile_avatar": "загрузка файла пишет в MEDIA_ROOT",
+    "create_payment": "запрос к API ЮKassa",
+    "yookassa_webhook": "запрос к API ЮKassa",
+}
+
+
+def seed_dataset(products=1000, reviews_per_product=10, basket_items=50, seed=42):
+    """
+    Детерминированный набор данных для замеров: каталог seed_shop с ровно
+    reviews_per_product отзывами на товар, баннеры, покупатель с корзиной из
+    basket_items товаров и заказом. Возвращает контекст для ENDPOINTS.
+    """
+    rng = random.Random(seed)
+    catalog = seed_shop(
+        {
+            "products": products,
+            "category_depth": 2,
+            "reviews_per_product": reviews_per_product,
+            "zipf": 0,
+            "tags": 20,
+            "max_tags_per_product": 2,
+            "sale_coverage": 0.01,
+            "users": 0,
+            "orders": 0,
+            "chunk_size": 5000,
+            "seed": seed,
+        }
+    )
+    product_ids = list(catalog["product_ids"])
+    Banner.objects.bulk_create(
+        Banner(product_id=product_id, title="Benchmark", image="banner.jpg")
+        for product_id in product_ids[:3]
+    )
+
+    run_id = rng.getrandbits(32)
+    # Хеш пароля считается один раз: это самая медленная часть создания
+    password = make_password(PASSWORDS[0])
+    customer = User.objects.create(
+        username=f"benchmark-customer-{run_id}", password=password
+    )
+    Profile.objects.create(
+        user=customer, fullName="Benchmark Customer", email="customer@example.com"
+    )
+    account = User.objects.create(
+        username=f"benchmark-account-{run_id}", password=password
+    )
+    in_stock = list(
+        Product.objects.filter(id__in=product_ids, count__gte=100)
+        .order_by("id")
+        .values_list("id", flat=True)[:basket_items]
+    )
+    BasketItem.objects.bulk_create(
+        BasketItem(user=customer, product_id=product_id, quantity=100)
+        for product_id in in_stock
+    )
+    order = Order.objects.create(
+        user=customer,
+        total_cost=0,
+        full_name="Benchmark Customer",
+        email="customer@example.com",
+        delivery_type="standard",
+        payment_type="online",
+        city="City",
+        address="Address",
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, product_id=product_id, quantity=1, price=1)
+        for product_id in in_stock[:3]
+    )
+    return {
+        "run_id": run_id,
+        "product_id": product_ids[0],
+        "category_id": catalog["category_ids"][0],
+        "order_id": order.id,
+        "basket_product_ids": in_stock,
+        "username": account.username,
+        "users": {"customer": customer, "account": account},
+    }
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def percentile(values, percent):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def measure_endpoint(endpoint, context, iterations=30, warmup=3, cold=False):
+    """
+    Замеряет эндпоинт: число SQL-запросов первого запроса на пустом кэше
+    и перцентили времени ответа по iterations запросам после прогрева.
+    cold=True очищает кэши перед каждым запросом.
+    """
+    client = Client()
+    if endpoint.get("user"):
+        client.force_login(context["users"][endpoint["user"]])
+    path = endpoint["path"].format(**context)
+    method = getattr(client, endpoint.get("method", "GET").lower())
+
+    def call(iteration):
+        if "data" not in endpoint:
+            return method(path)
+        return method(
+            path,
+            data=json.dumps(endpoint["data"](context, iteration)),
+            content_type="application/json",
+        )
+
+    clear_caches()
+    with collect_stats() as stats:
+        response = call(0)
+    for iteration in range(1, warmup + 1):
+        call(iteration)
+    latencies = []
+    for iteration in range(warmup + 1, warmup + 1 + iterations):
+        if cold:
+            clear_caches()
+        started = time.perf_counter()
+        call(iteration)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "route": endpoint["route"],
+        "method": endpoint.get("method", "GET"),
+        "status": response.status_code,
+        "queries": stats.queries,
+        "budget": endpoint["budget"],
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def run_benchmarks(context, endpoints=ENDPOINTS, **options):
+    """
+    Замеряет эндпоинты по очереди. Изменения каждого откатываются, поэтому
+    результаты не зависят от порядка и состава замеров.
+    """
+    results = {}
+    for endpoint in endpoints:
+        with transaction.atomic():
+            results[endpoint["name"]] = measure_endpoint(endpoint, context, **options)
+            transaction.set_rollback(True)
+    return results
+
+
+def dataset_label(products, reviews_per_product, basket_items):
+    return f"products={products},reviews={reviews_per_product},basket={basket_items}"
+
+
+def check_budgets(results):
+    """Ошибки и превышения бюджета SQL-запросов."""
+    problems = []
+    for name, result in results.items():
+        if result["status"] >= 400:
+            problems.append(f"{name}: status {result['status']}")
+        if result["queries"] > result["budget"]:
+            problems.append(
+                f"{name}: {result['queries']} queries, budget {result['budget']}"
+            )
+    return problems
+
+
+def compare_with_baseline(results, baseline, threshold=0.2):
+    """
+    Регрессии относительно сохраненного замера: больше SQL-запросов или
+    p50/p99 выше базового больше чем на threshold.
+    """
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["queries"] > base["queries"]:
+            problems.append(f"{name}: {base['queries']} -> {result['queries']} queries")
+        for metric in ("p50_ms", "p99_ms"):
+            if result[metric] > base[metric] * (1 + threshold):
+                problems.append(f"{name}: {metric} {base[metric]} -> {result[metric]}")
+    return problems
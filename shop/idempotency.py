@@ -0,0 +1,195 @@
+# shop/idempotency.py
+import datetime
+import functools
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .models import IdempotencyKey
+from .responses import JsonResponse
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Заголовки, которые сохраняются вместе с телом ответа
+STORED_HEADERS = ("Content-Type", "Location")
+
+
+def get_idempotency_ttl():
+    return datetime.timedelta(
+        seconds=getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 60 * 60)
+    )
+
+
+def get_lease_timeout():
+    return datetime.timedelta(
+        seconds=getattr(settings, "IDEMPOTENCY_LEASE_TIMEOUT", 2 * 60)
+    )
+
+
+def request_hash(request):
+    """
+    HMAC запроса на SECRET_KEY: тело платежа содержит номер карты и CVV,
+    простой SHA-256 от них в БД можно было бы перебрать.
+    """
+    message = b"\0".join(
+        [request.method.encode(), request.get_full_path().encode(), request.body]
+    )
+    return salted_hmac(
+        "shop.idempotency.request_hash", message, algorithm="sha256"
+    ).hexdigest()
+
+
+def cache_key(user_id, key):
+    return f"idempotency:{user_id}:{hashlib.md5(key.encode()).hexdigest()}"
+
+
+def gateway_idempotence_key(request):
+    """
+    Ключ идемпотентности для платежного шлюза: производный от Idempotency-Key
+    клиента, чтобы повтор не создал второй платеж даже при потере ответа.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key or not request.user.is_authenticated:
+        return uuid.uuid4()
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{request.user.id}:{request.path}:{key}")
+
+
+def replay(entry):
+    response = HttpResponse(entry["body"], status=entry["status_code"])
+    for name, value in entry["headers"].items():
+        response[name] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def stored_entry(record):
+    return {
+        "request_hash": record.request_hash,
+        "status_code": record.status_code,
+        "body": bytes(record.response_body),
+        "headers": record.response_headers,
+    }
+
+
+def in_progress():
+    return JsonResponse(
+        {"error": "Request with this Idempotency-Key is in progress"}, status=409
+    )
+
+
+def idempotent(view):
+    """
+    Повторяет сохраненный ответ для запроса с тем же Idempotency-Key.
+
+    Ключ действует для пользователя IDEMPOTENCY_KEY_TTL секунд. Повтор
+    отдается из кэша, при промахе — из IdempotencyKey, представление при
+    этом не вызывается. Тот же ключ с другим запросом дает 422, пока первый
+    запрос выполняется — 409. Запрос, не завершившийся за
+    IDEMPOTENCY_LEASE_TIMEOUT секунд, считается брошенным, и повтор выполняет
+    его заново. Ответы 5xx не сохраняются, такой запрос можно повторить.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return JsonResponse({"error": "Idempotency-Key is too long"}, status=400)
+        user = request.user
+        fingerprint = request_hash(request)
+        now = timezone.now()
+        entry = cache.get(cache_key(user.id, key))
+        record = None
+        if entry is None:
+            record = IdempotencyKey.objects.filter(
+                user=user, key=key, expires_at__gt=now
+            ).first()
+            if record is not None and record.status_code is not None:
+                entry = stored_entry(record)
+        if entry is not None:
+            if entry["request_hash"] != fingerprint:
+                return JsonResponse(
+                    {"error": "Idempotency-Key was used with a different request"},
+                    status=422,
+                )
+            return replay(entry)
+
+        if record is not None:
+            if record.locked_until is not None and record.locked_until > now:
+                return in_progress()
+            if record.request_hash != fingerprint:
+                return JsonResponse(
+                    {"error": "Idempotency-Key was used with a different request"},
+                    status=422,
+                )
+            # Первый запрос брошен: занимаем ключ, если параллельный
+            # повтор не успел сделать это раньше
+            record.locked_until = now + get_lease_timeout()
+            if not IdempotencyKey.objects.filter(
+                Q(locked_until__isnull=True) | Q(locked_until__lte=now),
+                pk=record.pk,
+                status_code__isnull=True,
+            ).update(locked_until=record.locked_until):
+                return in_progress()
+        else:
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.filter(
+                        user=user, key=key, expires_at__lte=now
+                    ).delete()
+                    record = IdempotencyKey.objects.create(
+                        user=user,
+                        key=key,
+                        request_hash=fingerprint,
+                        locked_until=now + get_lease_timeout(),
+                        expires_at=now + get_idempotency_ttl(),
+                    )
+            except IntegrityError:
+                # Параллельный запрос с тем же ключом успел занять его
+                return in_progress()
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500 or response.streaming:
+            record.delete()
+            return response
+        record.status_code = response.status_code
+        record.response_body = response.content
+        record.response_headers = {
+            name: response[name] for name in STORED_HEADERS if name in response
+        }
+        record.locked_until = None
+        record.save(
+            update_fields=[
+                "status_code",
+                "response_body",
+                "response_headers",
+                "locked_until",
+            ]
+        )
+        cache.set(
+            cache_key(user.id, key),
+            stored_entry(record),
+            timeout=get_idempotency_ttl().total_seconds(),
+        )
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(now=None):
+    """Удаляет истекшие ключи одним DELETE."""
+    deleted, _ = IdempotencyKey.objects.filter(
+        expires_at__lte=now or timezone.now()
+    ).delete()
+    return deleted
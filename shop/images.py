@@ -0,0 +1,362 @@
+# shop/images.py
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError, features
+
+from .models import Banner, Category, ProductImage, Profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DERIVATIVES = {
+    # Ширины производных в пикселях. Строятся только ширины меньше оригинала
+    # и сам оригинал, если он не шире наибольшей
+    "WIDTHS": [200, 400, 800],
+    # Форматы в порядке предпочтения; неподдерживаемые Pillow пропускаются
+    "FORMATS": ["avif", "webp"],
+    # Параметры Image.save для каждого формата
+    "SAVE_OPTIONS": {
+        "avif": {"quality": 50, "speed": 8},
+        "webp": {"quality": 75, "method": 4},
+    },
+    # Каталог производных в хранилище: {PREFIX}/{имя оригинала}/{ширина}.{формат}
+    "PREFIX": "derivatives",
+    # Строить после коммита в пуле потоков; False — сразу в on_commit
+    "BACKGROUND": True,
+    "WORKERS": 2,
+}
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+# EXIF Orientation с поворотом на 90°: ширина и высота меняются местами
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Поля с изображениями, для которых строятся производные; ширина оригинала
+# хранится в поле модели {поле}_width
+IMAGE_FIELDS = {
+    ProductImage: "image",
+    Banner: "image",
+    Category: "image",
+    Profile: "avatar",
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_image_derivative_options():
+    return {**DEFAULT_IMAGE_DERIVATIVES, **getattr(settings, "IMAGE_DERIVATIVES", {})}
+
+
+@functools.cache
+def format_supported(fmt):
+    return fmt in MIME_TYPES and features.check(fmt)
+
+
+def derivative_formats(options):
+    return [fmt for fmt in options["FORMATS"] if format_supported(fmt)]
+
+
+def derivative_widths(original_width, options):
+    """
+    Ширины производных оригинала шириной original_width: настроенные ширины
+    меньше него и он сам, если не шире наибольшей. Оригинал не увеличивается
+    и не сохраняется несколько раз под разными ширинами.
+    """
+    if not original_width:
+        return []
+    widths = sorted(options["WIDTHS"])
+    smaller = [width for width in widths if width < original_width]
+    if original_width <= widths[-1]:
+        smaller.append(original_width)
+    return smaller
+
+
+def derivative_variants(original_width, options):
+    """[(ширина, формат)] всех производных одного изображения."""
+    return [
+        (width, fmt)
+        for fmt in derivative_formats(options)
+        for width in derivative_widths(original_width, options)
+    ]
+
+
+def image_width(f):
+    """Ширина изображения из открытого файла с учетом EXIF-поворота."""
+    image = Image.open(f)
+    width, height = image.size
+    if image.getexif().get(ExifTags.Base.Orientation) in TRANSPOSED_ORIENTATIONS:
+        return height
+    return width
+
+
+def read_image_width(file):
+    """
+    Ширина изображения поля (в том числе еще не сохраненной загрузки)
+    или None, если файл не читается.
+    """
+    close = file.closed
+    try:
+        file.open("rb")
+        position = file.tell()
+        try:
+            return image_width(file)
+        finally:
+            file.seek(position)
+            if close:
+                file.close()
+    except (OSError, ValueError, UnidentifiedImageError):
+        return None
+
+
+def original_width(file):
+    """Сохраненная ширина оригинала для FieldFile из IMAGE_FIELDS."""
+    return getattr(file.instance, f"{file.field.name}_width", None)
+
+
+def derivative_name(name, width, fmt, options):
+    return f"{options['PREFIX']}/{name}/{width}.{fmt}"
+
+
+def parse_derivative_path(path, options):
+    """
+    (имя оригинала, ширина, формат) для пути внутри PREFIX или None, если
+    путь не соответствует настроенным ширинам и форматам.
+    """
+    name, _, filename = path.rpartition("/")
+    width, _, fmt = filename.partition(".")
+    if not name or ".." in name.split("/") or not width.isdigit():
+        return None
+    width = int(width)
+    # Ширина оригинала может быть любой не больше наибольшей настроенной;
+    # соответствие оригиналу проверяет build_derivatives
+    if width not in options["WIDTHS"] and not 0 < width < max(options["WIDTHS"]):
+        return None
+    if fmt not in derivative_formats(options):
+        return None
+    return name, width, fmt
+
+
+def image_sources(file, options=None):
+    """
+    Варианты изображения для <picture>: [{"type": "image/avif",
+    "srcset": "... 200w, ... 400w"}] с ширинами derivative_widths. Файлы
+    не проверяются: отсутствующие производные строит serve_media при первом
+    обращении. Пока ширина оригинала неизвестна, вариантов нет.
+    """
+    if not file:
+        return []
+    options = options or get_image_derivative_options()
+    widths = derivative_widths(original_width(file), options)
+    if not widths:
+        return []
+    # Один вызов url() на изображение: остальные адреса отличаются только хвостом
+    base_url = file.storage.url(f"{options['PREFIX']}/{file.name}/")
+    return [
+        {
+            "type": MIME_TYPES[fmt],
+            "srcset": ", ".join(
+                f"{base_url}{width}.{fmt} {width}w" for width in widths
+            ),
+        }
+        for fmt in derivative_formats(options)
+    ]
+
+
+def serialize_image(file, alt, options=None):
+    """Изображение карточки: оригинал в src и производные в sources."""
+    return {"src": file.url, "alt": alt, "sources": image_sources(file, options)}
+
+
+def load_source(name, storage, max_width):
+    with storage.open(name) as f:
+        image = Image.open(f)
+        # JPEG декодируется сразу в уменьшенном масштабе, не меньше max_width
+        image.draft("RGB", (max_width, max_width))
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        transparent = image.mode in ("LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+    return image
+
+
+def resize(image, width):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def build_derivatives(name, storage=None, variants=None, force=False):
+    """
+    Строит производные изображения name (по умолчанию все ширины и форматы),
+    пропуская уже существующие и ширины, которых нет в derivative_widths.
+    Возвращает {"built", "skipped", "bytes", "cpu_ms"}: число файлов,
+    их размер и процессорное время потока.
+    """
+    storage = storage or default_storage
+    options = get_image_derivative_options()
+    with storage.open(name) as f:
+        source_width = image_width(f)
+    allowed = derivative_variants(source_width, options)
+    if variants is None:
+        variants = allowed
+    else:
+        variants = [variant for variant in variants if variant in allowed]
+    stats = {"built": 0, "skipped": 0, "bytes": 0, "cpu_ms": 0.0}
+    targets = {}
+    for width, fmt in variants:
+        target = derivative_name(name, width, fmt, options)
+        if force and storage.exists(target):
+            storage.delete(target)
+        elif storage.exists(target):
+            stats["skipped"] += 1
+            continue
+        targets.setdefault(width, []).append((fmt, target))
+    if not targets:
+        return stats
+
+    started = time.thread_time()
+    image = load_source(name, storage, max(targets))
+    # От большей ширины к меньшей: каждая следующая уменьшается из предыдущей
+    for width in sorted(targets, reverse=True):
+        image = resize(image, width)
+        for fmt, target in targets[width]:
+            buffer = BytesIO()
+            image.save(
+                buffer, format=fmt.upper(), **options["SAVE_OPTIONS"].get(fmt, {})
+            )
+            saved = storage.save(target, ContentFile(buffer.getvalue()))
+            if saved != target:
+                # Файл успел сохранить параллельный запрос
+                storage.delete(saved)
+                stats["skipped"] += 1
+                continue
+            stats["built"] += 1
+            stats["bytes"] += buffer.tell()
+    stats["cpu_ms"] = round((time.thread_time() - started) * 1000, 2)
+    logger.info(
+        "Built %d image derivatives for %s",
+        stats["built"],
+        name,
+        extra={"fields": {"image": name, **stats}},
+    )
+    return stats
+
+
+def existing_derivatives(name, storage):
+    """Имена построенных производных изображения в хранилище."""
+    directory = f"{get_image_derivative_options()['PREFIX']}/{name}"
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [f"{directory}/{filename}" for filename in files]
+
+
+def delete_derivatives(name, storage=None):
+    storage = storage or default_storage
+    for target in existing_derivatives(name, storage):
+        storage.delete(target)
+
+
+def derivatives_size(name, storage=None):
+    """Суммарный размер существующих производных изображения в байтах."""
+    storage = storage or default_storage
+    return sum(storage.size(target) for target in existing_derivatives(name, storage))
+
+
+def get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="image-derivatives"
+            )
+    return _executor
+
+
+def safe_build_derivatives(name, storage):
+    try:
+        build_derivatives(name, storage)
+    except Exception:
+        logger.exception("Failed to build image derivatives for %s", name)
+
+
+def schedule_derivatives(name, storage=None):
+    """
+    После коммита строит производные вне обработки запроса: в пуле потоков
+    или, при BACKGROUND=False, сразу в on_commit.
+    """
+    options = get_image_derivative_options()
+    if options["BACKGROUND"]:
+        executor = get_executor(options["WORKERS"])
+        transaction.on_commit(
+            lambda: executor.submit(safe_build_derivatives, name, storage)
+        )
+    else:
+        transaction.on_commit(lambda: safe_build_derivatives(name, storage))
+
+
+@receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=Banner)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Profile)
+def store_image_width(sender, instance, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    file = getattr(instance, field)
+    width_field = f"{field}_width"
+    if not file:
+        setattr(instance, width_field, None)
+    elif not file._committed or getattr(instance, width_field) is None:
+        # Новая загрузка или ширина еще не известна: читаем только заголовок
+        setattr(instance, width_field, read_image_width(file))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Banner)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Profile)
+def image_saved(sender, instance, **kwargs):
+    file = getattr(instance, IMAGE_FIELDS[sender])
+    if file:
+        schedule_derivatives(file.name, file.storage)
+
+
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=Banner)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Profile)
+def image_deleted(sender, instance, **kwargs):
+    file = getattr(instance, IMAGE_FIELDS[sender])
+    if file:
+        name, storage = file.name, file.storage
+        transaction.on_commit(lambda: delete_unused_derivatives(name, storage))
+
+
+def image_in_use(name):
+    """Ссылается ли на файл хоть одна запись из IMAGE_FIELDS."""
+    return any(
+        model._default_manager.filter(**{field: name}).exists()
+        for model, field in IMAGE_FIELDS.items()
+    )
+
+
+def delete_unused_derivatives(name, storage=None):
+    """
+    Удаляет производные, если файл больше никому не нужен: одинаковые
+    загрузки хранятся под одним именем (HashedMediaStorage).
+    """
+    if not image_in_use(name):
+        delete_derivatives(name, storage)
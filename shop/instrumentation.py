@@ -0,0 +1,196 @@
+# shop/instrumentation.py
+import contextlib
+import functools
+import re
+import sys
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import import_string
+
+_request_stats = ContextVar("shop_request_stats", default=None)
+_MISSING = object()
+
+# Файлы представлений, на которые указывает поиск N+1
+VIEW_FILE_RE = re.compile(r"shop[/\\](views(_\w+)?\.py)$")
+
+
+class RequestStats:
+    """
+    Счетчики запроса: SQL-запросы и их время, попадания и промахи кэша.
+    Если sql не None, в нем копятся {текст запроса: [число, место вызова]}
+    для поиска повторяющихся запросов.
+    """
+
+    __slots__ = (
+        "queries",
+        "db_time",
+        "cache_hits",
+        "cache_misses",
+        "cache_time",
+        "in_cache",
+        "sql",
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.in_cache = False
+        self.sql = None
+
+    def snapshot(self):
+        return (
+            self.queries,
+            self.db_time,
+            self.cache_hits,
+            self.cache_misses,
+            self.cache_time,
+        )
+
+    def duplicates(self, threshold):
+        """[(запрос, число, место вызова)] для запросов, повторенных threshold раз."""
+        return sorted(
+            (
+                (sql, count, location)
+                for sql, (count, location) in (self.sql or {}).items()
+                if count >= threshold
+            ),
+            key=lambda duplicate: -duplicate[1],
+        )
+
+
+def view_frame():
+    """Ближайший кадр стека в shop/views*.py: "views_catalog.py:120 in get_catalog"."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        match = VIEW_FILE_RE.search(frame.f_code.co_filename)
+        if match:
+            return f"{match.group(1)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    if stats.sql is not None:
+        entry = stats.sql.get(sql)
+        if entry is None:
+            stats.sql[sql] = [1, None]
+        else:
+            entry[0] += 1
+            # Стек разбирается только при первом повторе запроса
+            if entry[1] is None:
+                entry[1] = view_frame()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def install_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextlib.contextmanager
+def _cache_call(stats):
+    # Вложенные вызовы (get бэкенда через get_many) не считаются дважды
+    if stats.in_cache:
+        yield False
+        return
+    stats.in_cache = True
+    started = time.perf_counter()
+    try:
+        yield True
+    finally:
+        stats.in_cache = False
+        stats.cache_time += time.perf_counter() - started
+
+
+def instrument_cache_backend(backend_class):
+    """Добавляет подсчет попаданий и промахов в get/get_many класса кэша."""
+    if backend_class.__dict__.get("_shop_instrumented"):
+        return
+    get = backend_class.get
+
+    @functools.wraps(get)
+    def instrumented_get(self, key, default=None, version=None):
+        stats = _request_stats.get()
+        if stats is None:
+            return get(self, key, default, version)
+        with _cache_call(stats) as counted:
+            value = get(self, key, _MISSING, version)
+            if counted:
+                if value is _MISSING:
+                    stats.cache_misses += 1
+                else:
+                    stats.cache_hits += 1
+        return default if value is _MISSING else value
+
+    backend_class.get = instrumented_get
+
+    if "get_many" in backend_class.__dict__:
+        get_many = backend_class.get_many
+
+        @functools.wraps(get_many)
+        def instrumented_get_many(self, keys, version=None):
+            stats = _request_stats.get()
+            if stats is None:
+                return get_many(self, keys, version)
+            keys = list(keys)
+            with _cache_call(stats) as counted:
+                values = get_many(self, keys, version)
+                if counted:
+                    stats.cache_hits += len(values)
+                    stats.cache_misses += len(keys) - len(values)
+            return values
+
+        backend_class.get_many = instrumented_get_many
+    backend_class._shop_instrumented = True
+
+
+def install():
+    """
+    Подключает record_query ко всем соединениям с БД, в том числе к тем,
+    что откроются позже (и в потоках sync_to_async), и счетчики к классам
+    кэшей из CACHES. Пока запрос не отслеживается, накладные расходы —
+    одно чтение ContextVar на вызов.
+    """
+    connection_created.connect(install_query_wrapper)
+    for connection in connections.all(initialized_only=True):
+        install_query_wrapper(connection)
+    for options in settings.CACHES.values():
+        instrument_cache_backend(import_string(options["BACKEND"]))
+
+
+@contextlib.contextmanager
+def collect_stats(trace_sql=False):
+    """
+    Собирает RequestStats текущего контекста. Статистика хранится в ContextVar,
+    поэтому учитываются и запросы из sync_to_async асинхронных представлений.
+    Вложенный вызов продолжает статистику внешнего.
+    """
+    stats = _request_stats.get()
+    if stats is not None:
+        if trace_sql and stats.sql is None:
+            stats.sql = {}
+        yield stats
+        return
+    stats = RequestStats()
+    if trace_sql:
+        stats.sql = {}
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
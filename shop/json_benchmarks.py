@@ -0,0 +1,109 @@
+# shop/json_benchmarks.py
+import datetime
+import decimal
+import random
+import time
+
+from django import http
+
+from .endpoint_benchmarks import percentile
+from .responses import JsonResponse
+
+# Формат даты карточек до перехода на shop.responses
+LEGACY_DATE_FORMAT = "%a %b %d %Y %H:%M:%S GMT%z"
+
+
+def make_cards(count, seed=42):
+    """Карточки в формате build_product_card: цена Decimal, дата datetime."""
+    rng = random.Random(seed)
+    added = datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+    cards = []
+    for i in range(1, count + 1):
+        image = f"/media/derivatives/Product_images/p{i}.0123456789ab.jpg/"
+        cards.append(
+            {
+                "id": i,
+                "category": rng.randint(1, 50),
+                "price": decimal.Decimal(rng.randint(100, 999999)) / 100,
+                "count": rng.randint(0, 100),
+                "date": added - datetime.timedelta(minutes=rng.randint(0, 10**6)),
+                "title": f"Product {i}",
+                "description": "Описание товара " * 8,
+                "freeDelivery": rng.random() < 0.3,
+                "images": [
+                    {
+                        "src": f"/media/Product_images/p{i}.0123456789ab.jpg",
+                        "alt": f"Product {i}",
+                        "sources": [
+                            {
+                                "type": f"image/{fmt}",
+                                "srcset": ", ".join(
+                                    f"{image}{width}.{fmt} {width}w"
+                                    for width in (200, 400, 800)
+                                ),
+                            }
+                            for fmt in ("avif", "webp")
+                        ],
+                    }
+                ],
+                "tags": [
+                    {"id": tag, "name": f"Tag {tag}"}
+                    for tag in rng.sample(range(1, 30), 3)
+                ],
+                "reviews": rng.randint(0, 500),
+                "rating": round(rng.uniform(1, 5), 2),
+            }
+        )
+    return cards
+
+
+def encode_stdlib(cards):
+    """Как раньше: float и strftime в каждой карточке, django.http.JsonResponse."""
+    legacy = [
+        {
+            **card,
+            "price": float(card["price"]),
+            "date": card["date"].strftime(LEGACY_DATE_FORMAT),
+        }
+        for card in cards
+    ]
+    return http.JsonResponse(legacy, safe=False).content
+
+
+def encode_orjson(cards):
+    return JsonResponse(cards, safe=False).content
+
+
+ENCODERS = {"stdlib": encode_stdlib, "orjson": encode_orjson}
+
+
+def measure_encoder(encode, cards, iterations):
+    encode(cards)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        content = encode(cards)
+        timings.append(time.perf_counter() - started)
+    return {
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "bytes": len(content),
+    }
+
+
+def run_json_benchmarks(sizes=(20, 100, 1000), iterations=200):
+    """
+    Время сборки тела ответа из карточек для каждого размера выдачи:
+    stdlib (прежний путь) и orjson. Возвращает список строк результата.
+    """
+    results = []
+    for size in sizes:
+        cards = make_cards(size)
+        row = {"cards": size}
+        for name, encode in ENCODERS.items():
+            row[name] = measure_encoder(encode, cards, iterations)
+        row["speedup"] = round(
+            row["stdlib"]["p50_ms"] / max(row["orjson"]["p50_ms"], 0.001), 1
+        )
+        results.append(row)
+    return results
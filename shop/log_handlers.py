@@ -0,0 +1,67 @@
+# shop/log_handlers.py
+import copy
+import datetime
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Одна JSON-строка на запись. Поля из extra={"fields": {...}} попадают
+    в корень объекта.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Пишет в поток из отдельного потока QueueListener: поток запроса только
+    кладет запись в очередь и не ждет ввода-вывода. Форматирование тоже
+    выполняется в потоке listener'а.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Как QueueHandler.prepare: меняем копию, другие обработчики логгера
+        # получают исходную запись с args и exc_info. Сообщение фиксируется
+        # на момент вызова, сериализовать запись для очереди в памяти не нужно
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        # logging.shutdown() при выходе дописывает очередь до конца
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,147 @@
+# shop/management/commands/benchmark_endpoints.py
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from shop.endpoint_benchmarks import (
+    ENDPOINTS,
+    check_budgets,
+    compare_with_baseline,
+    dataset_label,
+    run_benchmarks,
+    seed_dataset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет перцентили времени ответа и число SQL-запросов эндпоинтов "
+        "/api/* на сгенерированных данных, сравнивает с бюджетами и JSON-замером. "
+        "Данные создаются в транзакции и откатываются; кэши очищаются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            action="append",
+            help="Размер каталога; можно указать несколько раз (по умолчанию 1000).",
+        )
+        parser.add_argument("--reviews", type=int, default=10, help="Отзывов на товар.")
+        parser.add_argument("--basket-items", type=int, default=50)
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Очищать кэши перед каждым запросом.",
+        )
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            help="Имя эндпоинта из ENDPOINTS; можно указать несколько раз.",
+        )
+        parser.add_argument("--output", help="Записать результаты в JSON-файл.")
+        parser.add_argument("--compare", help="JSON-файл с базовым замером.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Допустимый рост p50/p99 относительно базового замера.",
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [
+            endpoint
+            for endpoint in ENDPOINTS
+            if not options["endpoints"] or endpoint["name"] in options["endpoints"]
+        ]
+        if not endpoints:
+            raise CommandError("Нет эндпоинтов с такими именами")
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)
+
+        # Тестовое окружение: Client, ALLOWED_HOSTS с testserver, почта в памяти
+        try:
+            setup_test_environment()
+            teardown = True
+        except RuntimeError:
+            teardown = False
+        try:
+            report = self.run(endpoints, options)
+        finally:
+            if teardown:
+                teardown_test_environment()
+
+        problems = []
+        for label, entry in report.items():
+            problems += [
+                f"{label}: {problem}" for problem in check_budgets(entry["endpoints"])
+            ]
+            if label in baseline:
+                problems += [
+                    f"{label}: {problem}"
+                    for problem in compare_with_baseline(
+                        entry["endpoints"],
+                        baseline[label]["endpoints"],
+                        options["threshold"],
+                    )
+                ]
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Результаты записаны в {options['output']}")
+        if problems:
+            raise CommandError("\n".join(problems))
+
+    def run(self, endpoints, options):
+        report = {}
+        for products in options["products"] or [1000]:
+            dataset = {
+                "products": products,
+                "reviews_per_product": options["reviews"],
+                "basket_items": options["basket_items"],
+                "seed": options["seed"],
+            }
+            label = dataset_label(products, options["reviews"], options["basket_items"])
+            with transaction.atomic():
+                started = time.perf_counter()
+                context = seed_dataset(**dataset)
+                self.stdout.write(
+                    f"{label}: данные созданы за {time.perf_counter() - started:.1f} с"
+                )
+                results = run_benchmarks(
+                    context,
+                    endpoints,
+                    iterations=options["iterations"],
+                    warmup=options["warmup"],
+                    cold=options["cold"],
+                )
+                transaction.set_rollback(True)
+            report[label] = {
+                "dataset": dataset,
+                "iterations": options["iterations"],
+                "cold": options["cold"],
+                "endpoints": results,
+            }
+            self.write_table(results)
+        return report
+
+    def write_table(self, results):
+        self.stdout.write(
+            f"{'endpoint':22} {'status':>6} {'queries':>9} "
+            f"{'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9}"
+        )
+        for name, result in results.items():
+            queries = f"{result['queries']}/{result['budget']}"
+            self.stdout.write(
+                f"{name:22} {result['status']:>6} {queries:>9} "
+                f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}"
+            )
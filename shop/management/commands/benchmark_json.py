@@ -0,0 +1,41 @@
+# shop/management/commands/benchmark_json.py
+import json
+
+from django.core.management.base import BaseCommand
+
+from shop.json_benchmarks import run_json_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает время кодирования JSON-ответа с карточками товаров: "
+        "django.http.JsonResponse (stdlib json) и shop.responses.JsonResponse (orjson)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[20, 100, 1000],
+            help="Число карточек в ответе.",
+        )
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--output", help="Записать результаты в JSON-файл.")
+
+    def handle(self, *args, **options):
+        results = run_json_benchmarks(options["sizes"], options["iterations"])
+        self.stdout.write(
+            f"{'cards':>6} {'stdlib p50':>11} {'orjson p50':>11} "
+            f"{'stdlib p99':>11} {'orjson p99':>11} {'speedup':>8}"
+        )
+        for row in results:
+            stdlib, fast = row["stdlib"], row["orjson"]
+            self.stdout.write(
+                f"{row['cards']:>6} {stdlib['p50_ms']:>9.3f}ms {fast['p50_ms']:>9.3f}ms "
+                f"{stdlib['p99_ms']:>9.3f}ms {fast['p99_ms']:>9.3f}ms "
+                f"{row['speedup']:>7.1f}x"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
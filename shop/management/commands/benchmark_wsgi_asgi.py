@@ -0,0 +1,237 @@
+# shop/management/commands/benchmark_wsgi_asgi.py
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Category, Product
+from shop.seeding import seed_shop
+
+DEFAULT_PATHS = [
+    "/api/catalog/?limit=20",
+    "/api/catalog/?sort=price&sortType=inc&limit=20&cursor=",
+    "/api/categories",
+    "/api/product/{product_id}",
+    "/api/products/popular",
+    "/api/products/limited",
+    "/api/sales/",
+    "/api/banners",
+]
+
+
+def seed_products(count, seed):
+    """Детерминированно дополняет каталог до count товаров."""
+    missing = count - Product.objects.count()
+    if missing <= 0:
+        return 0
+    categories = list(Category.objects.values_list("id", flat=True))
+    seed_shop(
+        {
+            "products": missing,
+            "category_depth": 2,
+            "users": 0,
+            "orders": 0,
+            "seed": seed,
+        },
+        category_ids=categories or None,
+    )
+    return missing
+
+
+def split_path(path):
+    path, _, query = path.partition("?")
+    return path, query
+
+
+def run_wsgi(paths, total, concurrency):
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+
+    def request(path):
+        path, query = split_path(path)
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "HTTP_HOST": "localhost",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+        }
+        status = []
+        started = time.perf_counter()
+        body = handler(environ, lambda code, headers: status.append(code))
+        b"".join(body)
+        body.close()
+        return time.perf_counter() - started, status[0].startswith("200")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        results = list(
+            executor.map(request, (paths[i % len(paths)] for i in range(total)))
+        )
+        return time.perf_counter() - started, results
+
+
+def run_asgi(paths, total, concurrency):
+    from django.core.handlers.asgi import ASGIHandler
+
+    handler = ASGIHandler()
+
+    async def request(path, semaphore):
+        path, query = split_path(path)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"localhost")],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Клиент не отключается: ждем, пока Django отменит ожидание
+            await asyncio.Future()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(scope, receive, send)
+            return time.perf_counter() - started, status[0] == 200
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(request(paths[i % len(paths)], semaphore) for i in range(total))
+        )
+        return time.perf_counter() - started, results
+
+    return asyncio.run(main())
+
+
+def summarize(elapsed, results):
+    latencies = sorted(latency for latency, _ in results)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok in results if not ok),
+        "rps": round(len(results) / elapsed, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает запросы/с и p99 эндпоинтов витрины под WSGI (синхронные "
+        "представления) и ASGI (shop/views_async.py) на одних и тех же данных."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--warmup", type=int, default=100)
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Путь с query string; можно указать несколько раз.",
+        )
+        parser.add_argument(
+            "--seed-products",
+            type=int,
+            default=0,
+            help="Дополнить каталог до N товаров перед замером.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--worker", choices=["wsgi", "asgi"], help="Служебный.")
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            return self.handle_worker(options)
+
+        if options["seed_products"]:
+            created = seed_products(options["seed_products"], options["seed"])
+            self.stdout.write(f"Добавлено товаров: {created}")
+        product = Product.objects.order_by("id").first()
+        if product is None:
+            raise CommandError("Каталог пуст: используйте --seed-products")
+        paths = [
+            path.format(product_id=product.id)
+            for path in options["paths"] or DEFAULT_PATHS
+        ]
+
+        # Каждый режим — отдельный процесс: urls.py выбирает представления
+        # при импорте по SHOP_ASYNC_VIEWS
+        reports = {}
+        for mode in ("wsgi", "asgi"):
+            command = [
+                sys.executable,
+                "-m",
+                "django",
+                "benchmark_wsgi_asgi",
+                "--worker",
+                mode,
+                "--requests",
+                str(options["requests"]),
+                "--concurrency",
+                str(options["concurrency"]),
+                "--warmup",
+                str(options["warmup"]),
+                *(arg for path in paths for arg in ("--path", path)),
+            ]
+            env = {**os.environ, "SHOP_ASYNC_VIEWS": "1" if mode == "asgi" else "0"}
+            completed = subprocess.run(
+                command,
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if completed.returncode:
+                raise CommandError(completed.stderr)
+            reports[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(
+            f"{'mode':6} {'req/s':>9} {'p50, ms':>9} {'p99, ms':>9} errors"
+        )
+        for mode, report in reports.items():
+            self.stdout.write(
+                f"{mode:6} {report['rps']:>9} {report['p50_ms']:>9} "
+                f"{report['p99_ms']:>9} {report['errors']}"
+            )
+
+    def handle_worker(self, options):
+        run = run_asgi if options["worker"] == "asgi" else run_wsgi
+        if options["warmup"]:
+            run(options["paths"], options["warmup"], options["concurrency"])
+        elapsed, results = run(
+            options["paths"], options["requests"], options["concurrency"]
+        )
+        self.stdout.write(json.dumps(summarize(elapsed, results)))
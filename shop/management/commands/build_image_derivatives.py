@@ -0,0 +1,78 @@
+# shop/management/commands/build_image_derivatives.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from shop.images import IMAGE_FIELDS, build_derivatives, derivatives_size
+
+
+def image_names():
+    """Имена всех загруженных изображений из полей IMAGE_FIELDS."""
+    names = []
+    for model, field in IMAGE_FIELDS.items():
+        names += (
+            model.objects.exclude(**{f"{field}__isnull": True})
+            .exclude(**{field: ""})
+            .values_list(field, flat=True)
+        )
+    return list(dict.fromkeys(names))
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит недостающие производные изображений (AVIF/WebP разных ширин) "
+        "и выводит занятое ими место и затраченное процессорное время."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Перестроить уже существующие производные.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Число потоков.",
+        )
+
+    def handle(self, *args, **options):
+        names = image_names()
+        started = time.perf_counter()
+
+        def build(name):
+            try:
+                return name, build_derivatives(name, force=options["force"]), None
+            except Exception as e:
+                return name, None, e
+
+        totals = {"built": 0, "skipped": 0, "bytes": 0, "cpu_ms": 0.0}
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for name, stats, error in executor.map(build, names):
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                    continue
+                for key in totals:
+                    totals[key] += stats[key]
+        elapsed = time.perf_counter() - started
+
+        source_bytes = derivative_bytes = 0
+        for name in names:
+            if default_storage.exists(name):
+                source_bytes += default_storage.size(name)
+            derivative_bytes += derivatives_size(name)
+
+        self.stdout.write(
+            f"Изображений: {len(names)}, ошибок: {failed}\n"
+            f"Построено производных: {totals['built']}, "
+            f"уже были: {totals['skipped']}\n"
+            f"Процессорное время: {totals['cpu_ms'] / 1000:.2f} с, "
+            f"общее: {elapsed:.2f} с\n"
+            f"Оригиналы: {source_bytes} байт, производные: {derivative_bytes} байт"
+        )
+        self.stdout.write(self.style.SUCCESS("Готово"))
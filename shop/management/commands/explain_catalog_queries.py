@@ -0,0 +1,86 @@
+# shop/management/commands/explain_catalog_queries.py
+import datetime
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shop.models import BasketItem, Order, Product, Sale
+from shop.search import search_products
+from shop.stock import annotate_available
+
+# Строки плана, по которым видно использование индекса в PostgreSQL и SQLite
+INDEX_SCAN_PATTERN = re.compile(
+    r"(?:Index Only Scan|Index Scan|Bitmap Index Scan)(?: Backward)? using (\w+)"
+    r"|USING (?:COVERING )?INDEX (\w+)"
+)
+
+
+def canonical_queries(category_id, user_id):
+    """Типовые запросы эндпоинтов магазина: имя -> QuerySet."""
+    today = datetime.date.today()
+    return {
+        "catalog: date": Product.objects.order_by("-date_added", "-id")[:20],
+        "catalog: category + date": Product.objects.filter(
+            category_id=category_id
+        ).order_by("-date_added", "-id")[:20],
+        "catalog: price range + price": Product.objects.filter(
+            effective_price__gte=100, effective_price__lte=1000
+        ).order_by("effective_price", "id")[:20],
+        "catalog: available + date": annotate_available(
+            Product.objects.filter(count__gt=0)
+        )
+        .filter(available__gt=0)
+        .order_by("-date_added", "-id")[:20],
+        "catalog: search": search_products(Product.objects.all(), "телефон").order_by(
+            "-search_rank", "-id"
+        )[:20],
+        "catalog: rating": Product.objects.order_by("-rating", "-id")[:20],
+        "products: popular": Product.objects.order_by("-reviews_count")[:10],
+        "products: limited": annotate_available(Product.objects.all()).filter(
+            available__lte=10
+        ),
+        "sales: active": Sale.objects.filter(date_from__lte=today, date_to__gte=today),
+        "basket: user": BasketItem.objects.filter(user_id=user_id),
+        "orders: user + status": Order.objects.filter(
+            user_id=user_id, status__in=["pending", "accepted"]
+        ),
+        "history: user": Order.objects.filter(user_id=user_id).order_by("-created_at"),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет EXPLAIN ANALYZE для типовых запросов эндпоинтов "
+        "и сообщает, использован ли индекс."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--category", type=int, default=1)
+        parser.add_argument("--user", type=int, default=1)
+        parser.add_argument(
+            "--no-analyze",
+            action="store_true",
+            help="Только EXPLAIN, без выполнения запросов.",
+        )
+        parser.add_argument(
+            "--plan", action="store_true", help="Печатать полный план запроса."
+        )
+
+    def handle(self, *args, **options):
+        # SQLite не поддерживает EXPLAIN ANALYZE
+        analyze = connection.vendor == "postgresql" and not options["no_analyze"]
+        missing = 0
+        queries = canonical_queries(options["category"], options["user"])
+        for name, queryset in queries.items():
+            plan = queryset.explain(analyze=True) if analyze else queryset.explain()
+            indexes = sorted({a or b for a, b in INDEX_SCAN_PATTERN.findall(plan)})
+            if indexes:
+                status = self.style.SUCCESS(f"index: {', '.join(indexes)}")
+            else:
+                missing += 1
+                status = self.style.WARNING("no index used")
+            self.stdout.write(f"{name:<32} {status}")
+            if options["plan"]:
+                self.stdout.write(plan)
+        self.stdout.write(f"Запросов без индекса: {missing} из {len(queries)}")
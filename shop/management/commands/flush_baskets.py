@@ -0,0 +1,32 @@
+# shop/management/commands/flush_baskets.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.basket import flush_dirty_baskets
+
+
+class Command(BaseCommand):
+    help = "Записывает измененные корзины из кэша в BasketItem пачками."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Сколько корзин записывать за одну транзакцию.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Повторять каждые N секунд (режим воркера).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_dirty_baskets(options["batch_size"])
+            self.stdout.write(f"Записано корзин: {flushed}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,11 @@
+# shop/management/commands/purge_idempotency_keys.py
+from django.core.management.base import BaseCommand
+
+from shop.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Удаляет сохраненные ответы с истекшим Idempotency-Key."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Удалено ключей: {purge_expired_keys()}")
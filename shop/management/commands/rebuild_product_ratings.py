@@ -0,0 +1,25 @@
+# shop/management/commands/rebuild_product_ratings.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает rating, reviews_count и rating_sum товаров по отзывам."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ids",
+            nargs="+",
+            type=int,
+            help="Пересчитать только указанные товары.",
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options["ids"]:
+            products = products.filter(id__in=options["ids"])
+        with transaction.atomic():
+            updated = products.refresh_rating_stats()
+        self.stdout.write(self.style.SUCCESS(f"Обновлено товаров: {updated}"))
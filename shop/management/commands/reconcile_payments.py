@@ -0,0 +1,70 @@
+# shop/management/commands/reconcile_payments.py
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.reconciliation import Checkpoint, reconcile_payments
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет неоплаченные заказы с платежом со статусом в ЮKassa "
+        "и записывает оплату или ошибку платежа."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Сколько запросов к ЮKassa выполнять параллельно.",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=10,
+            help="Не больше N запросов к ЮKassa в секунду (0 — без ограничения).",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=300,
+            help="Проверять заказы старше N секунд.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Файл, в котором хранится последний проверенный заказ.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать изменения, ничего не записывая.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Повторять каждые N секунд (режим воркера).",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options["checkpoint"])
+        while True:
+            stats = reconcile_payments(
+                batch_size=options["batch_size"],
+                concurrency=options["concurrency"],
+                rate=options["rate"],
+                checkpoint=checkpoint,
+                dry_run=options["dry_run"],
+                min_age=datetime.timedelta(seconds=options["min_age"]),
+                log=self.stdout.write,
+            )
+            self.stdout.write(
+                "Проверено: {checked}, оплачено: {paid}, отменено: {canceled}, "
+                "ошибок: {errors}, обновлено: {updated}".format(**stats)
+            )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,26 @@
+# shop/management/commands/release_stock_reservations.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.stock import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Снимает просроченные резервы и резервы отмененных заказов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Повторять каждые N секунд (режим воркера).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations()
+            self.stdout.write(f"Снято резервов: {released}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
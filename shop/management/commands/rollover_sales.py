@@ -0,0 +1,49 @@
+# shop/management/commands/rollover_sales.py
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.pricing import rollover_effective_prices, seconds_until_rollover
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает цену со скидкой (Product.effective_price, on_sale) "
+        "на смене даты: скидки, начавшиеся или закончившиеся сегодня. "
+        "Запускается после полуночи в TIME_ZONE, повторный запуск безопасен."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Пересчитать на дату YYYY-MM-DD вместо текущей.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Не завершаться и пересчитывать каждую полночь (режим воркера).",
+        )
+        parser.add_argument(
+            "--delay",
+            type=int,
+            default=5,
+            help="В режиме --loop запускать через N секунд после полуночи.",
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options["date"] and options["loop"]:
+            # Фиксированная дата в цикле пересчитывалась бы каждую ночь заново
+            raise CommandError("--date нельзя использовать вместе с --loop")
+        if options["date"]:
+            try:
+                today = datetime.date.fromisoformat(options["date"])
+            except ValueError:
+                raise CommandError("Дата должна быть в формате YYYY-MM-DD") from None
+        while True:
+            rows = rollover_effective_prices(today)
+            self.stdout.write(f"Обновлено товаров: {rows}")
+            if not options["loop"]:
+                break
+            time.sleep(seconds_until_rollover(options["delay"]))
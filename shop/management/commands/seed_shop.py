@@ -0,0 +1,77 @@
+# shop/management/commands/seed_shop.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.seeding import DEFAULT_SEED_OPTIONS, seed_shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует воспроизводимый набор данных магазина: категории, товары, "
+        "отзывы, теги, скидки, пользователей, корзины и заказы. Пишет пачками "
+        "через COPY (PostgreSQL) или INSERT, минуя save() и сигналы."
+    )
+
+    def add_arguments(self, parser):
+        defaults = DEFAULT_SEED_OPTIONS
+        parser.add_argument("--products", type=int, default=defaults["products"])
+        parser.add_argument(
+            "--category-depth", type=int, default=defaults["category_depth"]
+        )
+        parser.add_argument(
+            "--category-breadth", type=int, default=defaults["category_breadth"]
+        )
+        parser.add_argument(
+            "--reviews-per-product",
+            type=int,
+            default=defaults["reviews_per_product"],
+            help="Среднее число отзывов на товар.",
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=defaults["zipf"],
+            help="Показатель Zipf для популярности товаров (0 — равномерно).",
+        )
+        parser.add_argument("--tags", type=int, default=defaults["tags"])
+        parser.add_argument(
+            "--max-tags-per-product",
+            type=int,
+            default=defaults["max_tags_per_product"],
+        )
+        parser.add_argument(
+            "--sale-coverage",
+            type=float,
+            default=defaults["sale_coverage"],
+            help="Доля товаров со скидкой.",
+        )
+        parser.add_argument("--users", type=int, default=defaults["users"])
+        parser.add_argument("--orders", type=int, default=defaults["orders"])
+        parser.add_argument(
+            "--max-order-items", type=int, default=defaults["max_order_items"]
+        )
+        parser.add_argument(
+            "--max-basket-items", type=int, default=defaults["max_basket_items"]
+        )
+        parser.add_argument("--chunk-size", type=int, default=defaults["chunk_size"])
+        parser.add_argument(
+            "--no-copy",
+            action="store_false",
+            dest="use_copy",
+            help="Писать через INSERT и на PostgreSQL.",
+        )
+        parser.add_argument("--seed", type=int, default=defaults["seed"])
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = seed_shop(
+            {name: options[name] for name in DEFAULT_SEED_OPTIONS},
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - started
+        rows = sum(count for count, _ in result["rows"].values())
+        self.stdout.write(
+            f"Всего: {rows} строк за {elapsed:.1f} с "
+            f"({rows / max(elapsed, 1e-9):,.0f} строк/с)"
+        )
@@ -1,14 +1,197 @@
-# middleware.py
+# shop/middleware.py
 import logging
+import random
+import time
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import collect_stats
+
+access_logger = logging.getLogger("shop.access")
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER_TIMING = {
+    # Доля запросов, которым добавляется Server-Timing (0..1)
+    "SAMPLE_RATE": 1.0,
+    # X-Query-Count и X-Duplicate-Queries; в production выключено
+    "DEBUG_HEADERS": False,
+    # Запрос, выполненный столько раз за запрос, считается N+1 (0 — не искать)
+    "DUPLICATE_QUERY_THRESHOLD": 3,
+}
+
+DEFAULT_ACCESS_LOG = {
+    # Доля запросов, попадающих в лог (0..1)
+    "SAMPLE_RATE": 1.0,
+    # Ответы 5xx и запросы медленнее SLOW_REQUEST_MS пишутся всегда
+    "SLOW_REQUEST_MS": 1000,
+    # Заголовки запроса в записи; "*" — все заголовки
+    "HEADERS": [],
+    # Значения этих заголовков заменяются на "[redacted]"
+    "REDACT_HEADERS": [
+        "Authorization",
+        "Cookie",
+        "Proxy-Authorization",
+        "X-CSRFToken",
+        "Idempotency-Key",
+    ],
+}
+
+
+def get_server_timing_options():
+    return {**DEFAULT_SERVER_TIMING, **getattr(settings, "SERVER_TIMING", {})}
+
+
+def get_access_log_options():
+    return {**DEFAULT_ACCESS_LOG, **getattr(settings, "ACCESS_LOG", {})}
+
+
+def redact_headers(headers, names, redact):
+    """Выбирает заголовки names ("*" — все) и скрывает значения из redact."""
+    if names == "*":
+        names = list(headers)
+    return {
+        name: "[redacted]" if name.lower() in redact else headers[name]
+        for name in names
+        if name in headers
+    }
+
+
+class AccessLogMiddleware:
+    """
+    Одна JSON-запись на запрос в логгер shop.access: метод, маршрут, статус,
+    время, число и время SQL-запросов, размер ответа.
+    """
+
+    sync_capable = True
+    async_capable = True
 
-class LogRequestsMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
-        self.logger = logging.getLogger("django")
+        options = get_access_log_options()
+        self.sample_rate = options["SAMPLE_RATE"]
+        self.slow_request = options["SLOW_REQUEST_MS"] / 1000
+        self.headers = options["HEADERS"]
+        self.redact = {name.lower() for name in options["REDACT_HEADERS"]}
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        self.logger.info(f"Request: {request.method} {request.path}")
-        self.logger.info(f"Referer: {request.META.get('HTTP_REFERER', 'Unknown')}")
-        self.logger.info(f"Headers: {request.headers}")
-        return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with collect_stats() as stats:
+            response = self.get_response(request)
+        self.log(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with collect_stats() as stats:
+            response = await self.get_response(request)
+        self.log(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def log(self, request, response, duration, stats):
+        if not (
+            response.status_code >= 500
+            or duration >= self.slow_request
+            or random.random() < self.sample_rate
+        ):
+            return
+        match = request.resolver_match
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "route": match.view_name if match else None,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "db_queries": stats.queries,
+            "db_time_ms": round(stats.db_time * 1000, 2),
+            "cache_hits": stats.cache_hits,
+            "cache_misses": stats.cache_misses,
+            "response_size": None if response.streaming else len(response.content),
+        }
+        if self.headers:
+            fields["headers"] = redact_headers(
+                request.headers, self.headers, self.redact
+            )
+        access_logger.info("request", extra={"fields": fields})
+
+
+def ms(seconds):
+    return f"{seconds * 1000:.2f}"
+
+
+class ServerTimingMiddleware:
+    """
+    Добавляет к выбранным запросам заголовок Server-Timing: время SQL, кэша,
+    Python-кода и общее, число запросов и попаданий в кэш. Повторяющиеся
+    SQL-запросы (признак N+1) пишутся в лог с местом вызова в shop/views*.py.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = get_server_timing_options()
+        self.sample_rate = options["SAMPLE_RATE"]
+        self.debug_headers = options["DEBUG_HEADERS"]
+        self.threshold = options["DUPLICATE_QUERY_THRESHOLD"]
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        started = time.perf_counter()
+        with collect_stats(trace_sql=self.threshold > 0) as stats:
+            before = stats.snapshot()
+            response = self.get_response(request)
+        self.annotate(request, response, started, stats, before)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        started = time.perf_counter()
+        with collect_stats(trace_sql=self.threshold > 0) as stats:
+            before = stats.snapshot()
+            response = await self.get_response(request)
+        self.annotate(request, response, started, stats, before)
+        return response
+
+    def annotate(self, request, response, started, stats, before):
+        total = time.perf_counter() - started
+        queries, db_time, hits, misses, cache_time = (
+            after - start for after, start in zip(stats.snapshot(), before)
+        )
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={ms(db_time)};desc="{queries} queries"',
+                f'cache;dur={ms(cache_time)};desc="hit={hits} miss={misses}"',
+                f"app;dur={ms(max(total - db_time - cache_time, 0))}",
+                f"total;dur={ms(total)}",
+            ]
+        )
+        duplicates = stats.duplicates(self.threshold) if self.threshold else []
+        for sql, count, location in duplicates:
+            logger.warning(
+                "Duplicate query x%d at %s: %s",
+                count,
+                location or "unknown",
+                sql,
+                extra={
+                    "fields": {
+                        "path": request.path,
+                        "count": count,
+                        "location": location,
+                    }
+                },
+            )
+        if self.debug_headers:
+            response["X-Query-Count"] = str(queries)
+            response["X-Duplicate-Queries"] = str(len(duplicates))
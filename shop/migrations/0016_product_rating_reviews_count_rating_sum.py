@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:51
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_stats(apps, schema_editor):
+    Product = apps.get_model("shop", "Product")
+    Review = apps.get_model("shop", "Review")
+    reviews = Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+    Product.objects.update(
+        reviews_count=Coalesce(
+            Subquery(reviews.annotate(value=Count("id")).values("value")), 0
+        ),
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(value=Sum("rate")).values("value")), 0
+        ),
+        rating=Coalesce(
+            Subquery(
+                reviews.annotate(value=Avg("rate", output_field=FloatField())).values(
+                    "value"
+                )
+            ),
+            0.0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0015_order_payment_error"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating",
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="reviews_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_rating_stats, migrations.RunPython.noop),
+    ]
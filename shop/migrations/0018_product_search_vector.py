@@ -0,0 +1,49 @@
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+ALTER TABLE shop_product ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+CREATE INDEX product_search_vector_idx ON shop_product USING GIN (search_vector);
+"""
+
+TRIGRAM_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX product_title_trgm_idx ON shop_product USING GIN (title gin_trgm_ops);
+"""
+
+
+def add_search_vector(apps, schema_editor):
+    # Колонка и индексы есть только в PostgreSQL, в остальных СУБД
+    # shop.search использует icontains
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(SEARCH_VECTOR_SQL)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone():
+            schema_editor.execute(TRIGRAM_SQL)
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "DROP INDEX IF EXISTS product_title_trgm_idx;"
+        "ALTER TABLE shop_product DROP COLUMN IF EXISTS search_vector;"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0017_catalog_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_basket_items(apps, schema_editor):
+    """Сливает повторяющиеся строки корзины в одну, суммируя количество."""
+    BasketItem = apps.get_model("shop", "BasketItem")
+    duplicates = (
+        BasketItem.objects.values("user", "product")
+        .annotate(rows=Count("id"), keep_id=Min("id"), total=Sum("quantity"))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        BasketItem.objects.filter(id=group["keep_id"]).update(quantity=group["total"])
+        BasketItem.objects.filter(user=group["user"], product=group["product"]).exclude(
+            id=group["keep_id"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0019_stockreservation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_basket_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="basketitem",
+            constraint=models.UniqueConstraint(
+                fields=("user", "product"), name="basketitem_user_product_uniq"
+            ),
+        ),
+        # Уникальный индекс покрывает те же запросы, что и старый
+        migrations.RemoveIndex(
+            model_name="basketitem",
+            name="basketitem_user_product_idx",
+        ),
+    ]
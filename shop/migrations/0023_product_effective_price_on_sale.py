@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:40
+
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def fill_effective_prices(apps, schema_editor):
+    Product = apps.get_model("shop", "Product")
+    Sale = apps.get_model("shop", "Sale")
+    today = timezone.localdate()
+    active = Sale.objects.filter(
+        product=OuterRef("pk"), date_from__lte=today, date_to__gte=today
+    )
+    Product.objects.update(
+        effective_price=Coalesce(Subquery(active.values("sale_price")[:1]), F("price")),
+        on_sale=Exists(active),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0022_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="effective_price",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=10
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="on_sale",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(fill_effective_prices, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_price_idx",
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["effective_price", "id"], name="product_effective_price_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:59
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from PIL import ExifTags, Image, UnidentifiedImageError
+
+IMAGE_FIELDS = {
+    "ProductImage": "image",
+    "Banner": "image",
+    "Category": "image",
+    "Profile": "avatar",
+}
+
+
+def read_width(name):
+    try:
+        with default_storage.open(name) as f:
+            image = Image.open(f)
+            width, height = image.size
+            if image.getexif().get(ExifTags.Base.Orientation) in {5, 6, 7, 8}:
+                return height
+            return width
+    except (OSError, ValueError, UnidentifiedImageError):
+        return None
+
+
+def fill_image_widths(apps, schema_editor):
+    # Читается только заголовок файла; недоступные файлы остаются без ширины
+    for model_name, field in IMAGE_FIELDS.items():
+        model = apps.get_model("shop", model_name)
+        rows = model.objects.exclude(**{f"{field}__isnull": True}).exclude(
+            **{field: ""}
+        )
+        for pk, name in rows.values_list("pk", field).iterator():
+            width = read_width(name)
+            if width is not None:
+                model.objects.filter(pk=pk).update(**{f"{field}_width": width})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0024_idempotencykey_locked_until"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="banner",
+            name="image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_image_widths, migrations.RunPython.noop),
+    ]
@@ -4,7 +4,21 @@ from datetime import date, timedelta
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Sum,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 
 
 def user_avatar_directory_path(instance, filename):
@@ -27,6 +41,7 @@ class Profile(models.Model):
     avatar = models.ImageField(
         upload_to=user_avatar_directory_path, null=True, blank=True
     )
+    avatar_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     def clean(self):
         if not self.email:
@@ -63,12 +78,89 @@ class Category(models.Model):
         related_name="subcategories",
     )
     image = models.ImageField(upload_to="category_images/", null=True, blank=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def refresh_rating_stats(self):
+        """
+        Пересчитывает rating, reviews_count и rating_sum по таблице отзывов
+        одним UPDATE для всех товаров выборки.
+        """
+        reviews = (
+            Review.objects.filter(product=OuterRef("pk")).order_by().values("product")
+        )
+        return self.update(
+            reviews_count=Coalesce(
+                Subquery(reviews.annotate(value=Count("id")).values("value")), 0
+            ),
+            rating_sum=Coalesce(
+                Subquery(reviews.annotate(value=Sum("rate")).values("value")), 0
+            ),
+            rating=Coalesce(
+                Subquery(
+                    reviews.annotate(
+                        value=Avg("rate", output_field=FloatField())
+                    ).values("value")
+                ),
+                0.0,
+            ),
+        )
+
+    def refresh_effective_prices(self, today=None):
+        """
+        Пересчитывает effective_price и on_sale по скидкам, действующим на
+        today (по умолчанию — текущая дата в TIME_ZONE), одним UPDATE.
+        Обновляются только устаревшие строки; возвращает их число.
+        """
+        today = today or timezone.localdate()
+        active = Sale.objects.filter(
+            product=OuterRef("pk"), date_from__lte=today, date_to__gte=today
+        )
+        effective_price = Coalesce(
+            Subquery(active.values("sale_price")[:1]), F("price")
+        )
+        on_sale = Exists(active)
+        return self.exclude(effective_price=effective_price, on_sale=on_sale).update(
+            effective_price=effective_price, on_sale=on_sale
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            if obj.effective_price is None:
+                obj.effective_price = obj.price
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            self.filter(id__in={obj.pk for obj in objs}).refresh_effective_prices()
+        return objs
+
+    def update(self, **kwargs):
+        # Массовые изменения товаров не шлют сигналы, кэш витрины сбрасываем сами
+        from .response_cache import storefront_changed
+
+        if "price" not in kwargs:
+            rows = super().update(**kwargs)
+        else:
+            with transaction.atomic(using=self.db):
+                product_ids = set(self.values_list("id", flat=True))
+                rows = super().update(**kwargs)
+                Product.objects.filter(id__in=product_ids).refresh_effective_prices()
+        if rows:
+            storefront_changed()
+        return rows
+
+
 class Product(models.Model):
+    # Поля поддерживаются моделью Review, вручную их не меняем
+    RATING_FIELDS = ("rating", "reviews_count", "rating_sum")
+    # Цена с учетом действующей скидки, поддерживается моделью Sale
+    # и командой rollover_sales
+    PRICE_FIELDS = ("effective_price", "on_sale")
+
     title = models.CharField(max_length=255)
     description = models.TextField()
     full_description = models.TextField()
@@ -79,14 +171,62 @@ class Product(models.Model):
     category = models.ForeignKey(
         "Category", on_delete=models.SET_NULL, null=True, blank=True
     )
+    rating = models.FloatField(default=0.0, db_index=True)
+    reviews_count = models.PositiveIntegerField(default=0, db_index=True)
+    rating_sum = models.PositiveIntegerField(default=0)
+    effective_price = models.DecimalField(
+        max_digits=10, decimal_places=2, editable=False
+    )
+    on_sale = models.BooleanField(default=False, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        # Индексы под фильтры и сортировки get_catalog
+        indexes = [
+            models.Index(
+                fields=["category", "-date_added", "-id"],
+                name="product_category_date_idx",
+            ),
+            models.Index(fields=["-date_added", "-id"], name="product_date_idx"),
+            models.Index(
+                fields=["effective_price", "id"], name="product_effective_price_idx"
+            ),
+            models.Index(
+                fields=["-date_added", "-id"],
+                condition=models.Q(count__gt=0),
+                name="product_in_stock_date_idx",
+            ),
+            models.Index(
+                fields=["count"],
+                condition=models.Q(count__lte=10),
+                name="product_limited_idx",
+            ),
+        ]
 
     def clean(self):
         if self.price < 0:
             raise ValidationError({"price": "Price cannot be less than zero."})
 
     def save(self, *args, **kwargs):
+        if self._state.adding and self.effective_price is None:
+            # У нового товара еще нет скидки
+            self.effective_price = self.price
         self.full_clean()
-        super().save(*args, **kwargs)
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # Не затираем рейтинг и цену со скидкой устаревшими значениями
+            # из загруженного объекта
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.RATING_FIELDS + self.PRICE_FIELDS
+            ]
+        update_fields = kwargs.get("update_fields")
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is not None and "price" in update_fields:
+                Product.objects.filter(pk=self.pk).refresh_effective_prices()
 
     def __str__(self):
         return self.title
@@ -97,6 +237,8 @@ class ProductImage(models.Model):
         Product, related_name="images", on_delete=models.CASCADE
     )
     image = models.ImageField(upload_to="Product_images/")
+    # Ширина оригинала с учетом EXIF-поворота, заполняет shop.images
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
     alt_text = models.CharField(max_length=255, blank=True)
 
     def __str__(self):
@@ -108,6 +250,34 @@ class Tag(models.Model):
     products = models.ManyToManyField(Product, related_name="tags")
 
 
+class ReviewQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            Product.objects.filter(
+                id__in={obj.product_id for obj in objs}
+            ).refresh_rating_stats()
+        return objs
+
+    def update(self, **kwargs):
+        if "rate" not in kwargs and "product" not in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            product_ids = set(self.values_list("product_id", flat=True))
+            rows = super().update(**kwargs)
+            if "product" in kwargs:
+                product_ids.add(getattr(kwargs["product"], "pk", kwargs["product"]))
+            Product.objects.filter(id__in=product_ids).refresh_rating_stats()
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            product_ids = set(self.values_list("product_id", flat=True))
+            result = super().delete()
+            Product.objects.filter(id__in=product_ids).refresh_rating_stats()
+        return result
+
+
 class Review(models.Model):
     product = models.ForeignKey(
         Product, related_name="reviews", on_delete=models.CASCADE
@@ -118,6 +288,70 @@ class Review(models.Model):
     rate = models.PositiveSmallIntegerField()
     date = models.DateTimeField(auto_now_add=True)
 
+    objects = ReviewQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if not self._state.adding:
+                old_product_id = (
+                    Review.objects.filter(pk=self.pk)
+                    .values_list("product_id", flat=True)
+                    .first()
+                )
+                super().save(*args, **kwargs)
+                Product.objects.filter(
+                    id__in={old_product_id, self.product_id}
+                ).refresh_rating_stats()
+                return
+            super().save(*args, **kwargs)
+            # Инкрементально обновляем рейтинг товара в той же транзакции
+            Product.objects.filter(pk=self.product_id).update(
+                reviews_count=F("reviews_count") + 1,
+                rating_sum=F("rating_sum") + self.rate,
+                rating=Cast(F("rating_sum") + self.rate, FloatField())
+                / (F("reviews_count") + 1),
+            )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Product.objects.filter(pk=self.product_id).update(
+                reviews_count=F("reviews_count") - 1,
+                rating_sum=F("rating_sum") - self.rate,
+                rating=Case(
+                    When(reviews_count__lte=1, then=0.0),
+                    default=Cast(F("rating_sum") - self.rate, FloatField())
+                    / (F("reviews_count") - 1),
+                ),
+            )
+        return result
+
+
+class SaleQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            Product.objects.filter(
+                id__in={obj.product_id for obj in objs}
+            ).refresh_effective_prices()
+        return objs
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            product_ids = set(self.values_list("product_id", flat=True))
+            rows = super().update(**kwargs)
+            if "product" in kwargs:
+                product_ids.add(getattr(kwargs["product"], "pk", kwargs["product"]))
+            Product.objects.filter(id__in=product_ids).refresh_effective_prices()
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            product_ids = set(self.values_list("product_id", flat=True))
+            result = super().delete()
+            Product.objects.filter(id__in=product_ids).refresh_effective_prices()
+        return result
+
 
 class Sale(models.Model):
     product = models.OneToOneField(
@@ -127,6 +361,15 @@ class Sale(models.Model):
     date_from = models.DateField()
     date_to = models.DateField()
 
+    objects = SaleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["date_from", "date_to"], name="sale_active_window_idx"
+            ),
+        ]
+
     def clean(self):
         # Проверка, что `sale_price` больше нуля
         if self.sale_price <= 0:
@@ -156,7 +399,20 @@ class Sale(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()  # Запускаем валидацию перед сохранением
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            product_ids = {self.product_id}
+            if not self._state.adding:
+                product_ids.update(
+                    Sale.objects.filter(pk=self.pk).values_list("product_id", flat=True)
+                )
+            super().save(*args, **kwargs)
+            Product.objects.filter(id__in=product_ids).refresh_effective_prices()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Product.objects.filter(pk=self.product_id).refresh_effective_prices()
+        return result
 
     def __str__(self):
         return f"Sale for {self.product.title}"
@@ -169,6 +425,7 @@ class Banner(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to="banner_images/")
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
     date_added = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -185,6 +442,14 @@ class BasketItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # Одна строка на товар в корзине: добавление делается upsert-ом
+            models.UniqueConstraint(
+                fields=["user", "product"], name="basketitem_user_product_uniq"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.product.title} ({self.quantity})"
 
@@ -213,6 +478,12 @@ class Order(models.Model):
     city = models.CharField(max_length=100)
     address = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "status"], name="order_user_status_idx"),
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+        ]
+
     def clean(self):
         if not self.email:
             raise ValidationError({"email": "Email is required."})
@@ -262,3 +533,93 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.order.id} - {self.product.title} ({self.quantity})"
+
+
+class StockReservation(models.Model):
+    """Резерв товара под неоплаченный заказ, действует до expires_at."""
+
+    STATUS_CHOICES = [
+        ("active", "Active"),
+        ("committed", "Committed"),
+        ("released", "Released"),
+    ]
+
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="reservations"
+    )
+    order_item = models.OneToOneField(
+        OrderItem, on_delete=models.CASCADE, related_name="reservation"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="reservations"
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="active")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["product", "expires_at"],
+                condition=models.Q(status="active"),
+                name="reservation_active_idx",
+            ),
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status="active"),
+                name="reservation_expiry_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.product_id} ({self.quantity}, {self.status})"
+
+
+class PaymentNotification(models.Model):
+    """Обработанное уведомление ЮKassa; повтор того же события игнорируется."""
+
+    payment_id = models.CharField(max_length=255)
+    event = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["payment_id", "event"], name="payment_notification_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.payment_id} - {self.event}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Сохраненный ответ на запрос с заголовком Idempotency-Key.
+    status_code пуст, пока первый запрос еще выполняется; после locked_until
+    такой запрос считается брошенным, и ключ можно занять повторно.
+    """
+
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="idempotency_keys"
+    )
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.BinaryField(default=b"")
+    response_headers = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_user_key_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key} ({self.status_code})"
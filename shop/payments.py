@@ -0,0 +1,65 @@
+# shop/payments.py
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from yookassa import Configuration
+from yookassa.domain.notification import WebhookNotificationEventType
+
+from .models import Order, PaymentNotification
+from .stock import commit_order_stock, release_order_stock
+
+# Событие уведомления -> статус платежа, который должен вернуть API
+HANDLED_EVENTS = {
+    WebhookNotificationEventType.PAYMENT_SUCCEEDED: "succeeded",
+    WebhookNotificationEventType.PAYMENT_CANCELED: "canceled",
+}
+
+
+def configure_yookassa():
+    options = settings.YOOKASSA
+    Configuration.configure(
+        options["ACCOUNT_ID"], options["SECRET_KEY"], api_url=options["API_URL"]
+    )
+
+
+def apply_payment_event(payment, event, payload=None):
+    """
+    Применяет к заказу проверенное событие платежа ЮKassa.
+
+    Повтор события с тем же payment id ничего не меняет. Возвращает
+    "processed" или "duplicate"; если заказ не найден, бросает
+    Order.DoesNotExist и ничего не записывает, чтобы ЮKassa повторила отправку.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                PaymentNotification.objects.create(
+                    payment_id=payment.id, event=event, payload=payload or {}
+                )
+        except IntegrityError:
+            return "duplicate"
+
+        orders = Order.objects.select_for_update()
+        order = orders.filter(payment_id=payment.id).first()
+        order_id = (payment.metadata or {}).get("order_id")
+        if order is None and order_id:
+            # Уведомление пришло раньше, чем create_payment сохранил payment_id
+            order = orders.filter(id=order_id, payment_id__isnull=True).first()
+        if order is None:
+            raise Order.DoesNotExist(f"No order for payment {payment.id}")
+
+        if order.status == "paid":
+            return "processed"
+        order.payment_id = payment.id
+        if event == WebhookNotificationEventType.PAYMENT_SUCCEEDED:
+            order.status = "paid"
+            order.payment_error = None
+            order.save(update_fields=["status", "payment_id", "payment_error"])
+            commit_order_stock(order)
+        else:
+            details = payment.cancellation_details
+            order.payment_error = details.reason if details else "canceled"
+            order.save(update_fields=["payment_id", "payment_error"])
+            # Товар не держим до истечения резерва: повторная оплата
+            # перепроверит остаток в commit_order_stock
+            release_order_stock(order)
+    return "processed"
@@ -0,0 +1,27 @@
+# shop/pricing.py
+import datetime
+
+from django.utils import timezone
+
+from .models import Product
+
+
+def rollover_effective_prices(today=None):
+    """
+    Приводит Product.effective_price и on_sale к скидкам, действующим на today
+    (по умолчанию — текущая дата в TIME_ZONE). Повторный запуск за ту же дату
+    ничего не меняет. Возвращает число обновленных товаров; кэш витрины
+    сбрасывается в ProductQuerySet.update.
+    """
+    return Product.objects.refresh_effective_prices(today)
+
+
+def seconds_until_rollover(delay=0):
+    """Секунды до следующей полуночи в TIME_ZONE плюс delay."""
+    current = timezone.localtime()
+    midnight = timezone.make_aware(
+        datetime.datetime.combine(
+            current.date() + datetime.timedelta(days=1), datetime.time.min
+        )
+    )
+    return max((midnight - current).total_seconds(), 0) + delay
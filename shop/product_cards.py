@@ -0,0 +1,97 @@
+# shop/product_cards.py
+from django.db.models import QuerySet
+
+from .images import serialize_image
+from .models import Product
+
+
+def card_queryset(products):
+    """
+    Возвращает (QuerySet для карточек, список id или None) для QuerySet
+    товаров или списка id.
+    """
+    if isinstance(products, QuerySet):
+        queryset = products
+        ids = None
+    else:
+        ids = list(products)
+        queryset = Product.objects.filter(id__in=ids)
+    return queryset.prefetch_related("images", "tags"), ids
+
+
+def order_by_ids(loaded, ids):
+    if ids is None:
+        return loaded
+    by_id = {product.id: product for product in loaded}
+    return [
+        by_id[product_id] for product_id in dict.fromkeys(ids) if product_id in by_id
+    ]
+
+
+def load_card_products(products):
+    """
+    Загружает товары для карточек вместе с ценой с учетом скидки,
+    изображениями и тегами. Принимает QuerySet товаров или список id,
+    порядок исходной выборки сохраняется.
+    """
+    queryset, ids = card_queryset(products)
+    return order_by_ids(list(queryset), ids)
+
+
+async def aload_card_products(products):
+    """Асинхронный вариант load_card_products."""
+    queryset, ids = card_queryset(products)
+    # prefetch_related в aiterator() работает только с chunk_size
+    loaded = [product async for product in queryset.aiterator(chunk_size=2000)]
+    return order_by_ids(loaded, ids)
+
+
+def build_product_card(product):
+    """Формирует карточку товара из заранее загруженных данных."""
+    return {
+        "id": product.id,
+        "category": product.category_id,
+        "price": product.effective_price,
+        # available есть, если выборка аннотирована через stock.annotate_available
+        "count": getattr(product, "available", product.count),
+        "date": product.date_added,
+        "title": product.title,
+        "description": product.description,
+        "freeDelivery": product.free_delivery,
+        "images": [
+            serialize_image(image.image, image.alt_text)
+            for image in product.images.all()
+        ],
+        "tags": [{"id": tag.id, "name": tag.name} for tag in product.tags.all()],
+        "reviews": product.reviews_count,
+        "rating": product.rating,
+    }
+
+
+def get_product_cards(products):
+    """
+    Возвращает словарь {id товара: карточка} для QuerySet или списка id.
+    Число запросов не зависит от количества товаров.
+    """
+    return {
+        product.id: build_product_card(product)
+        for product in load_card_products(products)
+    }
+
+
+async def aget_product_cards(products):
+    """Асинхронный вариант get_product_cards."""
+    return {
+        product.id: build_product_card(product)
+        for product in await aload_card_products(products)
+    }
+
+
+def serialize_product_cards(products):
+    """Возвращает список карточек товаров в порядке исходной выборки."""
+    return list(get_product_cards(products).values())
+
+
+async def aserialize_product_cards(products):
+    """Асинхронный вариант serialize_product_cards."""
+    return list((await aget_product_cards(products)).values())
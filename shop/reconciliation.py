@@ -0,0 +1,158 @@
+# shop/reconciliation.py
+import datetime
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+from yookassa import Payment
+
+from .models import Order
+from .stock import commit_order_stock, release_order_stock
+
+
+class RateLimiter:
+    """Пропускает не больше rate вызовов в секунду на все потоки."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Checkpoint:
+    """id последнего проверенного заказа; с path сохраняется в JSON-файл."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.last_id = 0
+        if self.path and self.path.exists():
+            self.last_id = json.loads(self.path.read_text()).get("last_id", 0)
+
+    def save(self, last_id):
+        self.last_id = last_id
+        if self.path:
+            self.path.write_text(json.dumps({"last_id": last_id}))
+
+
+def pending_orders(after_id, limit, min_age):
+    """Следующая пачка неоплаченных заказов с платежом по возрастанию id."""
+    return list(
+        Order.objects.filter(
+            status="pending",
+            payment_id__isnull=False,
+            payment_error__isnull=True,
+            created_at__lte=timezone.now() - min_age,
+            id__gt=after_id,
+        )
+        .exclude(payment_id="")
+        .order_by("id")[:limit]
+    )
+
+
+def fetch_payments(orders, concurrency, limiter):
+    """Запрашивает платежи заказов в пуле потоков: [(заказ, платеж, ошибка)]."""
+
+    def fetch(order):
+        limiter.wait()
+        try:
+            return order, Payment.find_one(order.payment_id), None
+        except Exception as e:
+            return order, None, e
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(fetch, orders))
+
+
+def payment_changes(results):
+    """{id заказа: (status, payment_error)} для завершенных платежей."""
+    changes = {}
+    for order, payment, error in results:
+        if payment is None:
+            continue
+        if payment.status == "succeeded":
+            changes[order.id] = ("paid", None)
+        elif payment.status == "canceled":
+            details = payment.cancellation_details
+            changes[order.id] = ("pending", details.reason if details else "canceled")
+    return changes
+
+
+def apply_changes(changes):
+    """
+    Записывает изменения одним bulk_update. Заказы, которые уже обработал
+    webhook, пропускаются. Возвращает число обновленных заказов.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update().filter(id__in=changes, status="pending")
+        )
+        for order in orders:
+            order.status, order.payment_error = changes[order.id]
+        Order.objects.bulk_update(orders, ["status", "payment_error"])
+        for order in orders:
+            if order.status == "paid":
+                commit_order_stock(order)
+            else:
+                # Платеж отменен: резервы больше не нужны
+                release_order_stock(order)
+    return len(orders)
+
+
+def reconcile_payments(
+    batch_size=100,
+    concurrency=8,
+    rate=10,
+    checkpoint=None,
+    dry_run=False,
+    min_age=datetime.timedelta(minutes=5),
+    log=None,
+):
+    """
+    Один проход по неоплаченным заказам с платежом: сверяет статус с ЮKassa
+    и записывает оплату или ошибку. После каждой пачки сохраняет checkpoint,
+    в конце прохода сбрасывает его. Возвращает счетчики.
+    """
+    checkpoint = checkpoint or Checkpoint()
+    limiter = RateLimiter(rate)
+    stats = {"checked": 0, "paid": 0, "canceled": 0, "errors": 0, "updated": 0}
+    after_id = checkpoint.last_id
+    while True:
+        orders = pending_orders(after_id, batch_size, min_age)
+        if not orders:
+            break
+        results = fetch_payments(orders, concurrency, limiter)
+        changes = payment_changes(results)
+        stats["checked"] += len(results)
+        stats["errors"] += sum(1 for _, _, error in results if error is not None)
+        stats["paid"] += sum(1 for status, _ in changes.values() if status == "paid")
+        stats["canceled"] += sum(
+            1 for status, _ in changes.values() if status == "pending"
+        )
+        if log:
+            for order, payment, error in results:
+                if error is not None:
+                    log(f"Заказ {order.id}: ошибка запроса платежа: {error}")
+                elif order.id in changes:
+                    log(f"Заказ {order.id}: платеж {payment.status}")
+        if changes and not dry_run:
+            stats["updated"] += apply_changes(changes)
+        after_id = orders[-1].id
+        if not dry_run:
+            checkpoint.save(after_id)
+    if not dry_run:
+        checkpoint.save(0)
+    return stats
@@ -0,0 +1,210 @@
+# shop/response_cache.py
+import asyncio
+import functools
+import hashlib
+import inspect
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from .models import Banner, Product, ProductImage, Review, Sale, Tag
+
+STOREFRONT_GENERATION_KEY = "storefront:generation"
+
+DEFAULT_OPTIONS = {
+    # Алиас из CACHES: locmem, файловый кэш или Redis
+    "ALIAS": "default",
+    # Сколько секунд ответ считается свежим
+    "TIMEOUT": 60,
+    # Сколько секунд после этого можно отдавать устаревший ответ,
+    # пока один запрос пересчитывает данные
+    "STALE_TIMEOUT": 300,
+    # Время жизни блокировки пересчета и ожидание ответа при промахе
+    "LOCK_TIMEOUT": 10,
+    "LOCK_WAIT": 2,
+}
+
+
+def get_options():
+    return {**DEFAULT_OPTIONS, **getattr(settings, "STOREFRONT_CACHE", {})}
+
+
+def get_cache():
+    return caches[get_options()["ALIAS"]]
+
+
+def get_generation(cache):
+    generation = cache.get(STOREFRONT_GENERATION_KEY)
+    if generation is None:
+        cache.add(STOREFRONT_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(STOREFRONT_GENERATION_KEY)
+    return generation
+
+
+def invalidate_storefront_cache():
+    """Сбрасывает все закэшированные ответы витрины сменой поколения ключей."""
+    cache = get_cache()
+    try:
+        cache.incr(STOREFRONT_GENERATION_KEY)
+    except ValueError:
+        cache.set(STOREFRONT_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def storefront_changed():
+    """
+    Сбрасывает кэш витрины сейчас и повторно после коммита: запрос, успевший
+    закэшировать ответ до фиксации транзакции, не оставит старые данные.
+    Вызывается из сигналов моделей и из записей мимо сигналов
+    (QuerySet.update, bulk_create: остатки, резервы, рейтинг, цены).
+    """
+    invalidate_storefront_cache()
+    transaction.on_commit(invalidate_storefront_cache)
+
+
+async def aget_generation(cache):
+    generation = await cache.aget(STOREFRONT_GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(STOREFRONT_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = await cache.aget(STOREFRONT_GENERATION_KEY)
+    return generation
+
+
+def make_key(name, request, generation):
+    query = hashlib.md5(request.GET.urlencode().encode()).hexdigest()
+    return f"storefront:{name}:{generation}:{query}"
+
+
+def make_entry(response, options):
+    return {
+        "content": response.content,
+        "content_type": response["Content-Type"],
+        "fresh_until": time.time() + options["TIMEOUT"],
+    }
+
+
+def build_response(entry, status):
+    response = HttpResponse(
+        entry["content"], content_type=entry["content_type"], status=200
+    )
+    response["X-Cache"] = status
+    return response
+
+
+def cache_storefront_response(name):
+    """
+    Кэширует GET-ответы эндпоинта, одинаковые для всех посетителей.
+
+    Пока ответ свежий, он отдается из кэша. Устаревший ответ отдается всем,
+    кроме одного запроса, который под блокировкой пересчитывает данные,
+    поэтому промах под нагрузкой не приводит к лавине запросов в БД.
+    Поддерживает синхронные и асинхронные представления.
+    """
+
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            return _async_wrapper(view, name)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+            options = get_options()
+            cache = caches[options["ALIAS"]]
+            key = make_key(name, request, get_generation(cache))
+            entry = cache.get(key)
+            if entry is not None and entry["fresh_until"] > time.time():
+                return build_response(entry, "HIT")
+
+            lock_key = f"{key}:lock"
+            if cache.add(lock_key, 1, timeout=options["LOCK_TIMEOUT"]):
+                try:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code == 200:
+                        cache.set(
+                            key,
+                            make_entry(response, options),
+                            timeout=options["TIMEOUT"] + options["STALE_TIMEOUT"],
+                        )
+                finally:
+                    cache.delete(lock_key)
+                response["X-Cache"] = "MISS"
+                return response
+            if entry is not None:
+                return build_response(entry, "STALE")
+
+            # Ответ пересчитывает другой запрос: ждем его, а не идем в БД
+            deadline = time.time() + options["LOCK_WAIT"]
+            while time.time() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None:
+                    return build_response(entry, "HIT")
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _async_wrapper(view, name):
+    """То же, что синхронная обертка, но через асинхронное API кэша."""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return await view(request, *args, **kwargs)
+        options = get_options()
+        cache = caches[options["ALIAS"]]
+        key = make_key(name, request, await aget_generation(cache))
+        entry = await cache.aget(key)
+        if entry is not None and entry["fresh_until"] > time.time():
+            return build_response(entry, "HIT")
+
+        lock_key = f"{key}:lock"
+        if await cache.aadd(lock_key, 1, timeout=options["LOCK_TIMEOUT"]):
+            try:
+                response = await view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    await cache.aset(
+                        key,
+                        make_entry(response, options),
+                        timeout=options["TIMEOUT"] + options["STALE_TIMEOUT"],
+                    )
+            finally:
+                await cache.adelete(lock_key)
+            response["X-Cache"] = "MISS"
+            return response
+        if entry is not None:
+            return build_response(entry, "STALE")
+
+        deadline = time.time() + options["LOCK_WAIT"]
+        while time.time() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await cache.aget(key)
+            if entry is not None:
+                return build_response(entry, "HIT")
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Tag.products.through)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def storefront_data_changed(sender, **kwargs):
+    storefront_changed()
@@ -0,0 +1,90 @@
+# shop/search.py
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+# Конфигурации полнотекстового поиска, под которые построен shop_product.search_vector
+SEARCH_CONFIGS = ("russian", "english")
+
+
+def search_products(products, query):
+    """
+    Фильтрует товары по поисковой строке и аннотирует search_rank.
+
+    В PostgreSQL используется сгенерированная колонка search_vector
+    (GIN-индекс, русская и английская конфигурации) с запасным поиском
+    по триграммам title для опечаток и префиксов. В остальных СУБД
+    выполняется icontains по title и description.
+    """
+    query = query.strip()
+    if not query:
+        return products.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    if connection.vendor == "postgresql":
+        return _search_postgresql(products, query)
+    return products.filter(
+        Q(title__icontains=query) | Q(description__icontains=query)
+    ).annotate(
+        search_rank=Case(
+            When(title__icontains=query, then=Value(1.0)),
+            default=Value(0.5),
+            output_field=FloatField(),
+        )
+    )
+
+
+@functools.cache
+def has_trigram_support():
+    """Проверяет один раз на процесс, установлено ли расширение pg_trgm."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+async def aprepare_search():
+    """
+    Проверяет pg_trgm вне event loop, чтобы search_products можно было
+    вызывать из асинхронных представлений без обращения к БД.
+    """
+    if connection.vendor == "postgresql":
+        await sync_to_async(has_trigram_support)()
+
+
+def _search_postgresql(products, query):
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import (
+        SearchQuery,
+        SearchRank,
+        SearchVectorField,
+        TrigramWordSimilarity,
+    )
+
+    search_query = None
+    for config in SEARCH_CONFIGS:
+        config_query = SearchQuery(query, config=config, search_type="websearch")
+        search_query = (
+            config_query if search_query is None else search_query | config_query
+        )
+    search_vector = RawSQL(
+        f"{products.model._meta.db_table}.search_vector",
+        [],
+        output_field=SearchVectorField(),
+    )
+    products = products.alias(search_vector=search_vector).annotate(
+        text_rank=SearchRank(F("search_vector"), search_query)
+    )
+    if not has_trigram_support():
+        return products.filter(search_vector=search_query).annotate(
+            search_rank=F("text_rank")
+        )
+    return (
+        products.annotate(title_similarity=TrigramWordSimilarity(query, "title"))
+        .filter(
+            Q(search_vector=search_query)
+            # title %> query — использует триграммный GIN-индекс
+            | Q(TrigramWordSimilar(F("title"), query))
+        )
+        .annotate(search_rank=F("text_rank") + F("title_similarity"))
+    )
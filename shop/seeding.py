@@ -0,0 +1,520 @@
+# shop/seeding.py
+import bisect
+import datetime
+import io
+import itertools
+import random
+import time
+from array import array
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .category_tree import invalidate_category_tree
+from .models import (
+    BasketItem,
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    Profile,
+    Review,
+    Sale,
+    Tag,
+)
+from .response_cache import invalidate_storefront_cache
+
+DEFAULT_SEED_OPTIONS = {
+    "products": 10000,
+    # Категории: breadth корней, у каждой breadth детей, depth уровней;
+    # товары попадают в листья
+    "category_depth": 3,
+    "category_breadth": 5,
+    # Среднее число отзывов на товар; распределяются по популярности
+    "reviews_per_product": 5,
+    # Показатель Zipf для популярности товаров (0 — равномерно)
+    "zipf": 1.1,
+    "tags": 50,
+    "max_tags_per_product": 3,
+    # Доля товаров со скидкой (Sale)
+    "sale_coverage": 0.1,
+    "users": 1000,
+    "orders": 10000,
+    "max_order_items": 4,
+    "max_basket_items": 5,
+    "chunk_size": 10000,
+    # COPY на PostgreSQL; False — INSERT пачками
+    "use_copy": True,
+    "seed": 42,
+}
+
+ADJECTIVES = ["Classic", "Smart", "Compact", "Wireless", "Premium", "Eco", "Ultra"]
+NOUNS = ["Phone", "Laptop", "Headphones", "Camera", "Watch", "Speaker", "Tablet"]
+REVIEW_TEXTS = [
+    "Отличный товар, рекомендую",
+    "Соответствует описанию",
+    "Качество могло быть лучше",
+    "Быстрая доставка",
+    "Не понравилось",
+]
+# Оценки отзывов смещены к положительным
+RATES = [1, 2, 3, 4, 5]
+RATE_WEIGHTS = [5, 5, 10, 30, 50]
+ORDER_STATUSES = ["paid", "delivered", "shipped", "accepted", "canceled", "pending"]
+ORDER_STATUS_WEIGHTS = [30, 40, 10, 10, 5, 5]
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург"]
+
+
+class Zipf:
+    """
+    Выбирает индексы 0..n-1 с вероятностью ~ 1 / rank^s. Ранги перемешаны,
+    поэтому популярные товары не идут подряд по id. s=0 — равномерно.
+    """
+
+    def __init__(self, n, s, rng):
+        self.n = n
+        self.rng = rng
+        self.s = s
+        if not s:
+            return
+        self.cumulative = array(
+            "d", itertools.accumulate(rank**-s for rank in range(1, n + 1))
+        )
+        self.total = self.cumulative[-1]
+        self.index_of_rank = array("q", range(n))
+        rng.shuffle(self.index_of_rank)
+        self.rank_of = array("q", bytes(8 * n))
+        for rank, index in enumerate(self.index_of_rank):
+            self.rank_of[index] = rank
+
+    def weight(self, index):
+        """Доля индекса в общем распределении."""
+        if not self.s:
+            return 1 / self.n
+        return (self.rank_of[index] + 1) ** -self.s / self.total
+
+    def sample(self):
+        if not self.s:
+            return self.rng.randrange(self.n)
+        rank = bisect.bisect_left(self.cumulative, self.rng.random() * self.total)
+        return self.index_of_rank[min(rank, self.n - 1)]
+
+    def sample_distinct(self, count):
+        count = min(count, self.n)
+        chosen = set()
+        while len(chosen) < count:
+            chosen.add(self.sample())
+        return chosen
+
+
+def copy_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value)
+
+
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(map(copy_value, row)))
+        buffer.write("\n")
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        connection.ops.quote_name(table),
+        ", ".join(connection.ops.quote_name(column) for column in columns),
+    )
+    raw = cursor.cursor
+    buffer.seek(0)
+    if hasattr(raw, "copy_expert"):
+        raw.copy_expert(sql, buffer)
+    else:
+        # psycopg 3
+        with raw.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def insert_rows(cursor, table, fields, rows):
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        connection.ops.quote_name(table),
+        ", ".join(connection.ops.quote_name(field.column) for field in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    cursor.executemany(
+        sql,
+        [
+            tuple(
+                field.get_db_prep_save(value, connection)
+                for field, value in zip(fields, row)
+            )
+            for row in rows
+        ],
+    )
+
+
+class SeedWriter:
+    """
+    Пишет строки в таблицы пачками по chunk_size: COPY на PostgreSQL, иначе
+    INSERT ... VALUES через executemany. Модели, их save() и сигналы не
+    используются: значения полей auto_now_add задаются генератором.
+    """
+
+    def __init__(self, chunk_size, use_copy=True, log=None):
+        self.chunk_size = chunk_size
+        self.use_copy = use_copy and connection.vendor == "postgresql"
+        self.log = log
+        self.stats = {}
+
+    def write(self, model, columns, rows):
+        """Записывает строки (кортежи значений columns). Возвращает их число."""
+        fields = [model._meta.get_field(column) for column in columns]
+        table = model._meta.db_table
+        rows = iter(rows)
+        written = 0
+        started = time.perf_counter()
+        while True:
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic(), connection.cursor() as cursor:
+                if self.use_copy:
+                    copy_rows(cursor, table, [f.column for f in fields], chunk)
+                else:
+                    insert_rows(cursor, table, fields, chunk)
+            written += len(chunk)
+        elapsed = time.perf_counter() - started
+        total_rows, total_time = self.stats.get(table, (0, 0.0))
+        self.stats[table] = (total_rows + written, total_time + elapsed)
+        if self.log and written:
+            self.log(
+                f"{table}: {written} строк за {elapsed:.1f} с "
+                f"({written / max(elapsed, 1e-9):,.0f} строк/с)"
+            )
+        return written
+
+
+def new_ids(model, after_id):
+    """id строк, добавленных после after_id, в порядке вставки."""
+    return array(
+        "q",
+        model.objects.filter(id__gt=after_id)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .iterator(chunk_size=10000),
+    )
+
+
+def max_id(model):
+    return model.objects.aggregate(value=Max("id"))["value"] or 0
+
+
+def seed_categories(writer, depth, breadth):
+    """Дерево категорий по уровням. Возвращает id листьев."""
+    level = [None]
+    for depth_index in range(depth):
+        after_id = max_id(Category)
+        writer.write(
+            Category,
+            ["name", "parent_id"],
+            (
+                (f"Категория {depth_index + 1}.{number + 1}", parent_id)
+                for parent_id in level
+                for number in range(breadth)
+            ),
+        )
+        level = list(new_ids(Category, after_id))
+    return level
+
+
+def seed_shop(options=None, log=None, category_ids=None):
+    """
+    Генерирует воспроизводимый по seed набор данных: категории, товары
+    с отзывами, тегами и скидками, пользователей с профилями, корзинами и
+    заказами. Популярность товаров (отзывы, заказы, корзины) следует
+    распределению Zipf. Рейтинг товаров считается при генерации, поэтому
+    отдельный пересчет не нужен.
+
+    С category_ids товары распределяются по этим категориям вместо новых.
+    Возвращает {"rows": {таблица: (строк, секунд)}, "product_ids", "category_ids",
+    "user_ids", "order_ids"}.
+    """
+    options = {**DEFAULT_SEED_OPTIONS, **(options or {})}
+    rng = random.Random(options["seed"])
+    writer = SeedWriter(options["chunk_size"], options["use_copy"], log)
+    now = timezone.now()
+    today = timezone.localdate()
+    products = options["products"]
+
+    if category_ids is not None:
+        leaves = list(category_ids)
+    elif options["category_depth"]:
+        leaves = seed_categories(
+            writer, options["category_depth"], options["category_breadth"]
+        )
+    else:
+        leaves = []
+
+    # Товары. Число и оценки отзывов выбираются сразу, чтобы записать
+    # рейтинг в строку товара; оценки хранятся для второго прохода.
+    popularity = Zipf(products, options["zipf"], rng) if products else None
+    total_reviews = products * options["reviews_per_product"]
+    review_counts = array("I")
+    rates = array("B")
+    prices = array("q")
+    sales = []
+
+    def product_rows():
+        for index in range(products):
+            expected = total_reviews * popularity.weight(index)
+            count = int(expected) + (rng.random() < expected % 1)
+            product_rates = rng.choices(RATES, RATE_WEIGHTS, k=count)
+            review_counts.append(count)
+            rates.extend(product_rates)
+            cents = max(100, min(int(rng.lognormvariate(8.5, 1.2)), 50_000_000))
+            prices.append(cents)
+            if rng.random() < options["sale_coverage"]:
+                sales.append((index, cents))
+            rating_sum = sum(product_rates)
+            yield (
+                f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {index + 1}",
+                "Описание товара",
+                "Полное описание товара",
+                Decimal(cents) / 100,
+                0 if rng.random() < 0.05 else rng.randint(1, 500),
+                now - datetime.timedelta(seconds=rng.randint(0, 2 * 365 * 86400)),
+                rng.random() < 0.3,
+                rng.choice(leaves) if leaves else None,
+                rating_sum / count if count else 0.0,
+                count,
+                rating_sum,
+                Decimal(cents) / 100,
+                False,
+            )
+
+    after_id = max_id(Product)
+    writer.write(
+        Product,
+        [
+            "title",
+            "description",
+            "full_description",
+            "price",
+            "count",
+            "date_added",
+            "free_delivery",
+            "category_id",
+            "rating",
+            "reviews_count",
+            "rating_sum",
+            "effective_price",
+            "on_sale",
+        ],
+        product_rows(),
+    )
+    product_ids = new_ids(Product, after_id)
+
+    def review_rows():
+        offset = 0
+        for index, count in enumerate(review_counts):
+            for rate in rates[offset : offset + count]:
+                author = rng.randrange(100000)
+                yield (
+                    product_ids[index],
+                    f"Покупатель {author}",
+                    f"customer{author}@example.com",
+                    rng.choice(REVIEW_TEXTS),
+                    rate,
+                    now - datetime.timedelta(seconds=rng.randint(0, 365 * 86400)),
+                )
+            offset += count
+
+    writer.write(
+        Review,
+        ["product_id", "author", "email", "text", "rate", "date"],
+        review_rows(),
+    )
+
+    def sale_rows():
+        for index, cents in sales:
+            # Большинство скидок действует сейчас, часть закончилась или впереди
+            window = rng.random()
+            if window < 0.7:
+                date_from = today - datetime.timedelta(days=rng.randint(0, 30))
+            elif window < 0.85:
+                date_from = today - datetime.timedelta(days=rng.randint(31, 90))
+            else:
+                date_from = today + datetime.timedelta(days=rng.randint(1, 30))
+            date_to = date_from + datetime.timedelta(days=rng.randint(1, 60))
+            discount = rng.choice([5, 10, 15, 20, 30, 50])
+            yield (
+                product_ids[index],
+                Decimal(max(cents * (100 - discount) // 100, 1)) / 100,
+                date_from,
+                date_to,
+            )
+
+    writer.write(
+        Sale, ["product_id", "sale_price", "date_from", "date_to"], sale_rows()
+    )
+    # Цена со скидкой для действующих скидок — одним UPDATE, как в rollover_sales
+    if sales:
+        Product.objects.filter(
+            id__range=(product_ids[0], product_ids[-1])
+        ).refresh_effective_prices()
+
+    tag_ids = []
+    if options["tags"]:
+        after_id = max_id(Tag)
+        writer.write(
+            Tag, ["name"], ((f"Тег {number + 1}",) for number in range(options["tags"]))
+        )
+        tag_ids = list(new_ids(Tag, after_id))
+
+    def tag_rows():
+        for product_id in product_ids:
+            count = rng.randint(0, min(options["max_tags_per_product"], len(tag_ids)))
+            for tag_id in rng.sample(tag_ids, count):
+                yield tag_id, product_id
+
+    if tag_ids:
+        writer.write(Tag.products.through, ["tag_id", "product_id"], tag_rows())
+
+    # Пользователи с одинаковым паролем: хеш считается один раз
+    password = make_password(f"seed-{options['seed']}")
+    prefix = f"seed{options['seed']}-{max_id(User) + 1}-"
+    after_id = max_id(User)
+    writer.write(
+        User,
+        [
+            "username",
+            "password",
+            "first_name",
+            "last_name",
+            "email",
+            "is_staff",
+            "is_active",
+            "is_superuser",
+            "date_joined",
+        ],
+        (
+            (
+                f"{prefix}{number}",
+                password,
+                "Покупатель",
+                str(number),
+                "",
+                False,
+                True,
+                False,
+                now - datetime.timedelta(seconds=rng.randint(0, 2 * 365 * 86400)),
+            )
+            for number in range(options["users"])
+        ),
+    )
+    user_ids = new_ids(User, after_id)
+    writer.write(
+        Profile,
+        ["user_id", "fullName", "email", "phone"],
+        (
+            (
+                user_id,
+                f"Покупатель {user_id}",
+                f"{prefix}{number}@example.com",
+                f"+7999{user_id % 10_000_000:07d}",
+            )
+            for number, user_id in enumerate(user_ids)
+        ),
+    )
+
+    def basket_rows():
+        for user_id in user_ids:
+            count = rng.randint(0, options["max_basket_items"])
+            for index in sorted(popularity.sample_distinct(count)):
+                yield user_id, product_ids[index], rng.randint(1, 3), now
+
+    if products:
+        writer.write(
+            BasketItem,
+            ["user_id", "product_id", "quantity", "added_at"],
+            basket_rows(),
+        )
+
+    # Заказы: позиции выбираются вместе с заказом, чтобы посчитать сумму,
+    # и хранятся в массивах до второго прохода
+    item_orders, item_products, item_quantities = array("I"), array("I"), array("B")
+
+    def order_rows():
+        for number in range(options["orders"]):
+            count = rng.randint(1, options["max_order_items"])
+            total = 0
+            for index in sorted(popularity.sample_distinct(count)):
+                quantity = rng.randint(1, 3)
+                item_orders.append(number)
+                item_products.append(index)
+                item_quantities.append(quantity)
+                total += prices[index] * quantity
+            yield (
+                rng.choice(user_ids),
+                now - datetime.timedelta(seconds=rng.randint(0, 365 * 86400)),
+                "Покупатель",
+                "customer@example.com",
+                rng.choice(["standard", "express"]),
+                rng.choice(["online", "someone"]),
+                Decimal(total) / 100,
+                rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0],
+                rng.choice(CITIES),
+                "ул. Тестовая, 1",
+            )
+
+    order_ids = array("q")
+    if products and user_ids and options["orders"]:
+        after_id = max_id(Order)
+        writer.write(
+            Order,
+            [
+                "user_id",
+                "created_at",
+                "full_name",
+                "email",
+                "delivery_type",
+                "payment_type",
+                "total_cost",
+                "status",
+                "city",
+                "address",
+            ],
+            order_rows(),
+        )
+        order_ids = new_ids(Order, after_id)
+        writer.write(
+            OrderItem,
+            ["order_id", "product_id", "quantity", "price"],
+            (
+                (
+                    order_ids[number],
+                    product_ids[index],
+                    quantity,
+                    Decimal(prices[index]) / 100,
+                )
+                for number, index, quantity in zip(
+                    item_orders, item_products, item_quantities
+                )
+            ),
+        )
+
+    # Данные записаны мимо сигналов: сбрасываем кэши витрины явно
+    invalidate_storefront_cache()
+    invalidate_category_tree()
+    return {
+        "rows": writer.stats,
+        "product_ids": product_ids,
+        "category_ids": leaves,
+        "user_ids": user_ids,
+        "order_ids": order_ids,
+    }
@@ -1,9 +1,20 @@
 from django.utils.html import escape
 from rest_framework import serializers
 
+from .images import image_sources
 from .models import Profile
 
 
+def absolute_srcset(request, srcset):
+    """Делает адреса srcset абсолютными, как src аватара."""
+    if not request:
+        return srcset
+    return ", ".join(
+        " ".join([request.build_absolute_uri(url), width])
+        for url, width in (item.rsplit(" ", 1) for item in srcset.split(", "))
+    )
+
+
 class ProfileSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
 
@@ -21,5 +32,12 @@ class ProfileSerializer(serializers.ModelSerializer):
                     else obj.avatar.url
                 ),
                 "alt": escape(obj.fullName) if obj.fullName else "User avatar",
+                "sources": [
+                    {
+                        "type": source["type"],
+                        "srcset": absolute_srcset(request, source["srcset"]),
+                    }
+                    for source in image_sources(obj.avatar)
+                ],
             }
         return None
@@ -0,0 +1,173 @@
+# shop/stock.py
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case,
+    F,
+    IntegerField,
+    OuterRef,
+    PositiveIntegerField,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockReservation
+from .response_cache import storefront_changed
+
+logger = logging.getLogger(__name__)
+
+
+def get_reservation_ttl():
+    return datetime.timedelta(
+        seconds=getattr(settings, "STOCK_RESERVATION_TTL", 30 * 60)
+    )
+
+
+def active_reservations(now=None):
+    """Резервы, которые еще удерживают товар."""
+    return StockReservation.objects.filter(
+        status="active", expires_at__gt=now or timezone.now()
+    )
+
+
+def annotate_available(products, now=None):
+    """
+    Добавляет к товарам поле available: остаток минус активные резервы.
+    """
+    reserved = (
+        active_reservations(now)
+        .filter(product=OuterRef("pk"))
+        .order_by()
+        .values("product")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return products.annotate(
+        available=F("count")
+        - Coalesce(Subquery(reserved), Value(0), output_field=IntegerField())
+    )
+
+
+def get_reserved_quantities(product_ids, now=None):
+    """Возвращает {id товара: количество в активных резервах} одним запросом."""
+    rows = (
+        active_reservations(now)
+        .filter(product_id__in=product_ids)
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+    )
+    return {row["product_id"]: row["total"] for row in rows}
+
+
+def reserve_order_items(order, order_items):
+    """Создает резервы под позиции нового заказа."""
+    expires_at = timezone.now() + get_reservation_ttl()
+    reservations = StockReservation.objects.bulk_create(
+        StockReservation(
+            order=order,
+            order_item=item,
+            product_id=item.product_id,
+            quantity=item.quantity,
+            expires_at=expires_at,
+        )
+        for item in order_items
+    )
+    # Резервы меняют доступный остаток (фильтр available каталога)
+    storefront_changed()
+    return reservations
+
+
+def commit_order_stock(order):
+    """
+    Списывает со склада товары оплаченного заказа и закрывает его резервы.
+    Повторный вызов ничего не меняет.
+
+    Истекшие и снятые резервы товар уже не держат: остаток перепроверяется
+    под блокировкой строк товаров. Если его не хватает, склад не меняется,
+    а в payment_error заказа записывается причина (платеж нужно вернуть).
+    Возвращает число закрытых резервов.
+    """
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order=order)
+            .exclude(status="committed")
+        )
+        if not reservations:
+            return 0
+        now = timezone.now()
+        quantities = {}
+        held = {}
+        for reservation in reservations:
+            product_id = reservation.product_id
+            quantities[product_id] = (
+                quantities.get(product_id, 0) + reservation.quantity
+            )
+            if reservation.status == "active" and reservation.expires_at > now:
+                held[product_id] = held.get(product_id, 0) + reservation.quantity
+        counts = dict(
+            Product.objects.select_for_update()
+            .filter(id__in=quantities)
+            .order_by("id")
+            .values_list("id", "count")
+        )
+        # Остаток за вычетом резервов других заказов
+        reserved = get_reserved_quantities(quantities, now)
+        short = sorted(
+            product_id
+            for product_id, quantity in quantities.items()
+            if counts.get(product_id, 0)
+            - (reserved.get(product_id, 0) - held.get(product_id, 0))
+            < quantity
+        )
+        if short:
+            logger.warning(
+                "Order %s paid without stock for products %s", order.id, short
+            )
+            order.payment_error = f"Not enough stock for products {short}"
+            order.save(update_fields=["payment_error"])
+            return 0
+        Product.objects.filter(id__in=quantities).update(
+            count=Case(
+                *(
+                    When(id=product_id, then=F("count") - quantity)
+                    for product_id, quantity in quantities.items()
+                ),
+                default=F("count"),
+                output_field=PositiveIntegerField(),
+            )
+        )
+        return StockReservation.objects.filter(
+            id__in=[reservation.id for reservation in reservations]
+        ).update(status="committed")
+
+
+def release_order_stock(order):
+    """Снимает активные резервы отмененного заказа или отмененного платежа."""
+    rows = StockReservation.objects.filter(order=order, status="active").update(
+        status="released"
+    )
+    if rows:
+        storefront_changed()
+    return rows
+
+
+def release_expired_reservations(now=None):
+    """
+    Одним UPDATE снимает просроченные резервы и резервы отмененных заказов.
+    """
+    rows = StockReservation.objects.filter(
+        Q(expires_at__lte=now or timezone.now()) | Q(order__status="canceled"),
+        status="active",
+    ).update(status="released")
+    if rows:
+        storefront_changed()
+    return rows
@@ -0,0 +1,49 @@
+# shop/storage.py
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+# photo.3f2a9c1b4d5e.jpg — имя с хэшем содержимого (в том числе в пути производной)
+HASHED_NAME_RE = re.compile(r"\.([0-9a-f]{12})\.[^./]+(?:/|$)")
+
+
+def content_hash(content):
+    hasher = hashlib.md5(usedforsecurity=False)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()[:12]
+
+
+def hashed_name(name, content):
+    root, ext = os.path.splitext(name)
+    return f"{root}.{content_hash(content)}{ext}"
+
+
+def name_hash(name):
+    """Хэш содержимого из имени файла или None, если имя без хэша."""
+    match = HASHED_NAME_RE.search(name)
+    return match.group(1) if match else None
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """
+    Добавляет к именам загружаемых файлов хэш содержимого: photo.3f2a9c1b4d5e.jpg.
+    Такой файл не меняется, поэтому отдается с immutable Cache-Control;
+    одинаковые файлы хранятся один раз. Производные изображений уже названы
+    по хэшированному оригиналу и сохраняются как есть.
+    """
+
+    def save(self, name, content, max_length=None):
+        from .images import get_image_derivative_options
+
+        if name is None:
+            name = content.name
+        prefix = f"{get_image_derivative_options()['PREFIX']}/"
+        if not name.startswith(prefix):
+            name = hashed_name(name, content)
+            if self.exists(name):
+                return name
+        return super().save(name, content, max_length=max_length)
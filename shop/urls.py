@@ -1,10 +1,11 @@
 # shop/urls.py
+from django.conf import settings
 from django.urls import path
 from django.views.generic import TemplateView
 
 from .views import get_tags
 from .views_auth import post_sign_in, post_sign_out, post_sign_up
-from .views_basket import basket_view
+from .views_basket import basket_view, post_basket_bulk
 from .views_catalog import (
     get_banners,
     get_catalog,
@@ -13,16 +14,30 @@ from .views_catalog import (
     get_products_popular,
     get_sales,
 )
+from .views_media import serve_media
 from .views_orders import get_history_order, order_view, orders_view
 from .views_payments import (
     create_payment,
     payment_success,
     post_payment,
     retry_payment,
+    yookassa_webhook,
 )  # noqa: F401
 from .views_product import get_product_item, post_product_review
 from .views_profile import post_profile_avatar, post_profile_password, profile_view
 
+if settings.SHOP_ASYNC_VIEWS:
+    # Под ASGI эндпоинты витрины обслуживаются асинхронными версиями
+    from .views_async import (  # noqa: F811
+        get_banners,
+        get_catalog,
+        get_categories,
+        get_product_item,
+        get_products_limited,
+        get_products_popular,
+        get_sales,
+    )
+
 urlpatterns = [
     path("", TemplateView.as_view(template_name="frontend/index.html")),
     path("about/", TemplateView.as_view(template_name="frontend/about.html")),
@@ -76,6 +91,7 @@ urlpatterns = [
     path("api/sales/", get_sales, name="get_sales"),
     path("api/banners", get_banners, name="get_banners"),
     path("api/basket", basket_view, name="basket_view"),
+    path("api/basket/bulk", post_basket_bulk, name="basket_bulk"),
     path("api/orders/", orders_view, name="orders_view"),
     path("api/orders/<int:id>/", order_view, name="order_view"),
     path("/payment/<int:id>/", create_payment, name="create_payment"),
@@ -83,5 +99,12 @@ urlpatterns = [
     path("api/payment/<int:id>/", post_payment, name="post_payment"),
     path("api/create-payment/<int:id>/", create_payment, name="create_payment"),
     path("payment-success/", payment_success, name="payment_success"),
+    path("api/payment/yookassa-webhook", yookassa_webhook, name="yookassa_webhook"),
     path("retry-payment/<int:order_id>/", retry_payment, name="retry_payment"),
+    # Файлы MEDIA_ROOT; в production байты отдает прокси по X-Accel-Redirect
+    path(
+        f"{settings.MEDIA_URL.strip('/')}/<path:path>",
+        serve_media,
+        name="serve_media",
+    ),
 ]
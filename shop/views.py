@@ -1,13 +1,14 @@
 # shop/views.py
 import logging  # noqa: F401
 
-from django.http import JsonResponse
-
 from .models import Product, Tag
+from .response_cache import cache_storefront_response
+from .responses import JsonResponse
 
 # logger = logging.getLogger('custom_logger')
 
 
+@cache_storefront_response("tags")
 def get_tags(request):
     """
     Эндпоинт для получения тегов.
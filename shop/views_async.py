@@ -0,0 +1,137 @@
+# shop/views_async.py
+"""
+Асинхронные версии эндпоинтов витрины только для чтения.
+
+Подключаются в shop/urls.py вместо синхронных, когда SHOP_ASYNC_VIEWS
+включен (по умолчанию при запуске через ecommerce/asgi.py), и не занимают
+поток из пула sync_to_async на время всего запроса.
+"""
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
+
+from .category_tree import aget_category_tree
+from .models import Banner, Product
+from .product_cards import (
+    aget_product_cards,
+    aload_card_products,
+    aserialize_product_cards,
+)
+from .response_cache import cache_storefront_response
+from .responses import JsonResponse
+from .search import aprepare_search
+from .stock import annotate_available
+from .views_catalog import (
+    CatalogQueryError,
+    active_sales,
+    build_catalog_query,
+    cursor_page_response,
+    serialize_banners,
+    serialize_sales,
+)
+from .views_product import product_item_queryset, serialize_product_item
+
+
+async def get_categories(request):
+    entry = await aget_category_tree()
+    etag = quote_etag(entry["etag"])
+    # Слабое сравнение, как в django.views.decorators.http.condition
+    if_none_match = {
+        tag.removeprefix("W/")
+        for tag in parse_etags(request.headers.get("If-None-Match", ""))
+    }
+    if etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(entry["tree"], safe=False, status=200)
+    response["ETag"] = etag
+    return response
+
+
+async def get_catalog(request):
+    await aprepare_search()
+    try:
+        query = build_catalog_query(request)
+    except CatalogQueryError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    products, limit = query["products"], query["limit"]
+    if query["cursor"] is not None:
+        page = await aload_card_products(products[: limit + 1])
+        return cursor_page_response(page, query)
+    # Та же логика, что Paginator.get_page: номер вне диапазона — последняя страница
+    total = await products.acount()
+    last_page = max(1, -(-total // limit))
+    current_page = query["current_page"]
+    page_number = current_page if 1 <= current_page <= last_page else last_page
+    offset = (page_number - 1) * limit
+    items = await aserialize_product_cards(products[offset : offset + limit])
+    response = {
+        "items": items,
+        "currentPage": current_page,
+        "lastPage": last_page,
+    }
+    return JsonResponse(response, safe=False)
+
+
+async def get_product_item(request, id):
+    try:
+        product = await product_item_queryset().aget(id=id)
+    except Product.DoesNotExist:
+        return JsonResponse({"error": "Product not found"}, status=404)
+    return JsonResponse(serialize_product_item(product), status=200)
+
+
+@cache_storefront_response("products_popular")
+async def get_products_popular(request):
+    if request.method == "GET":
+        popular_products = Product.objects.order_by("-reviews_count")[:10]
+        data = await aserialize_product_cards(popular_products)
+        return JsonResponse(data, safe=False, status=200)
+    else:
+        return JsonResponse({"error": "Invalid HTTP method"}, status=405)
+
+
+@cache_storefront_response("products_limited")
+async def get_products_limited(request):
+    if request.method == "GET":
+        LIMIT_THRESHOLD = 10
+        limited_products = annotate_available(Product.objects.all()).filter(
+            available__lte=LIMIT_THRESHOLD
+        )
+        data = await aserialize_product_cards(limited_products)
+        return JsonResponse(data, safe=False, status=200)
+    else:
+        return JsonResponse({"error": "Invalid HTTP method"}, status=405)
+
+
+@cache_storefront_response("sales")
+async def get_sales(request):
+    if request.method == "GET":
+        current_page = int(request.GET.get("currentPage", 1))
+        items_per_page = 10
+        start = (current_page - 1) * items_per_page
+        end = start + items_per_page
+
+        sales = (
+            active_sales()
+            .select_related("product")
+            .prefetch_related("product__images")[start:end]
+        )
+        sales = [sale async for sale in sales.aiterator(chunk_size=items_per_page)]
+        data = serialize_sales(
+            sales, await active_sales().acount(), current_page, items_per_page
+        )
+        return JsonResponse(data, safe=False, status=200)
+    else:
+        return JsonResponse({"error": "Invalid HTTP method"}, status=405)
+
+
+@cache_storefront_response("banners")
+async def get_banners(request):
+    if request.method == "GET":
+        banners = [banner async for banner in Banner.objects.order_by("-date_added")]
+        cards = await aget_product_cards([banner.product_id for banner in banners])
+        return JsonResponse(serialize_banners(banners, cards), safe=False, status=200)
+    else:
+        return JsonResponse({"error": "Invalid HTTP method"}, status=405)
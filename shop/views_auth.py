@@ -1,12 +1,16 @@
 # shop/views_auth.py
 import json
-import logging  # noqa: F401
+import logging
 
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
+from .basket import merge_session_basket
+from .responses import JsonResponse
+
+logger = logging.getLogger(__name__)
+
 
 @csrf_exempt
 def post_sign_in(request):
@@ -18,11 +22,10 @@ def post_sign_in(request):
             password = data.get("password")
 
         except json.JSONDecodeError as e:
-            print("JSON decode error:", e)
+            logger.warning("JSON decode error: %s", e)
             return JsonResponse({"error": "Invalid JSON"}, status=400)
 
         if not username or not password:
-            print("Error: Missing username or password")
             return JsonResponse(
                 {"error": "Username and password are required"}, status=400
             )
@@ -30,13 +33,13 @@ def post_sign_in(request):
         user = authenticate(request, username=username, password=password)
         if user is not None:
             login(request, user)
-            print("User authenticated:", user.username)
+            merge_session_basket(request, user)
+            logger.info("User %s signed in", user.username)
             return JsonResponse({"message": "Login successful"}, status=200)
         else:
-            print("Error: Invalid username or password")
+            logger.info("Failed sign-in for %s", username)
             return JsonResponse({"error": "Invalid username or password"}, status=401)
     else:
-        print("Error: Invalid HTTP method")
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
 
 
@@ -1,58 +1,64 @@
 # shop/views_basket.py
-import datetime
 import json
-import logging  # noqa: F401
-
-from django.db.models import Avg
-from django.http import JsonResponse
-
-from .models import BasketItem, Product, Sale
-
-# logger = logging.getLogger('custom_logger')
-
-
-def get_price_with_discount(product):
-    """Возвращает цену продукта с учетом активной скидки, если она есть."""
-    try:
-        sale = product.sale
-        if sale.date_from <= datetime.date.today() <= sale.date_to:
-            return sale.sale_price
-    except Sale.DoesNotExist:
-        pass
-    return product.price
+import logging
+
+from .basket import get_basket_store
+from .models import Product
+from .product_cards import get_product_cards
+from .responses import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_basket(items):
+    """Возвращает содержимое корзины {id: количество} в виде карточек товаров."""
+    cards = get_product_cards(list(items))
+    return [
+        {**cards[product_id], "count": quantity}
+        for product_id, quantity in items.items()
+        if product_id in cards
+    ]
+
+
+def serialize_basket_compact(items):
+    """
+    Компактное содержимое корзины: id, количество, цена и итоги.
+    Выполняет один запрос к товарам независимо от размера корзины.
+    """
+    products = Product.objects.in_bulk(list(items))
+    lines = [
+        {
+            "id": product_id,
+            "count": quantity,
+            "price": products[product_id].effective_price,
+        }
+        for product_id, quantity in items.items()
+        if product_id in products
+    ]
+    return {
+        "items": lines,
+        "totals": {
+            "count": sum(line["count"] for line in lines),
+            "cost": round(sum(line["price"] * line["count"] for line in lines), 2),
+        },
+    }
+
+
+def basket_response(request, basket):
+    """Ответ с корзиной: полные карточки или ?view=compact."""
+    items = basket.items()
+    if request.GET.get("view") == "compact":
+        return JsonResponse(serialize_basket_compact(items), status=200)
+    return JsonResponse(serialize_basket(items), safe=False, status=200)
 
 
 def get_basket(request):
-    print(f"User: {request.user}, is_authenticated: {request.user.is_authenticated}")
     if request.method == "GET":
-        if not request.user.is_authenticated:
+        basket = get_basket_store(request)
+        if basket is None:
             return JsonResponse({"error": "User not authenticated"}, status=401)
 
-        basket_items = BasketItem.objects.filter(user=request.user)
-        data = [
-            {
-                "id": item.product.id,
-                "category": item.product.category.id if item.product.category else None,
-                "price": float(get_price_with_discount(item.product)),
-                "count": item.quantity,
-                "date": item.product.date_added.strftime("%a %b %d %Y %H:%M:%S GMT%z"),
-                "title": item.product.title,
-                "description": item.product.description,
-                "freeDelivery": item.product.free_delivery,
-                "images": [
-                    {"src": image.image.url, "alt": image.alt_text}
-                    for image in item.product.images.all()
-                ],
-                "tags": [
-                    {"id": tag.id, "name": tag.name} for tag in item.product.tags.all()
-                ],
-                "reviews": item.product.reviews.count(),
-                "rating": item.product.reviews.aggregate(Avg("rate"))["rate__avg"]
-                or 0.0,
-            }
-            for item in basket_items
-        ]
-        return JsonResponse(data, safe=False, status=200)
+        return basket_response(request, basket)
     else:
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
 
@@ -70,50 +76,13 @@ def post_basket(request):
                     {"error": "Invalid product ID or count"}, status=400
                 )
 
-            if not request.user.is_authenticated:
+            basket = get_basket_store(request, create=True)
+            if basket is None:
                 return JsonResponse({"error": "User not authenticated"}, status=401)
 
-            try:
-                product = Product.objects.get(id=product_id)
-            except Product.DoesNotExist:
+            if not basket.add(product_id, count):
                 return JsonResponse({"error": "Product not found"}, status=404)
-            basket_item, created = BasketItem.objects.get_or_create(
-                user=request.user, product=product, defaults={"quantity": count}
-            )
-
-            if not created:
-                basket_item.quantity += count
-                basket_item.save()
-            basket_items = BasketItem.objects.filter(user=request.user)
-            data = [
-                {
-                    "id": item.product.id,
-                    "category": (
-                        item.product.category.id if item.product.category else None
-                    ),
-                    "price": float(get_price_with_discount(item.product)),
-                    "count": item.quantity,
-                    "date": item.product.date_added.strftime(
-                        "%a %b %d %Y %H:%M:%S GMT%z"
-                    ),
-                    "title": item.product.title,
-                    "description": item.product.description,
-                    "freeDelivery": item.product.free_delivery,
-                    "images": [
-                        {"src": image.image.url, "alt": image.alt_text}
-                        for image in item.product.images.all()
-                    ],
-                    "tags": [
-                        {"id": tag.id, "name": tag.name}
-                        for tag in item.product.tags.all()
-                    ],
-                    "reviews": item.product.reviews.count(),
-                    "rating": item.product.reviews.aggregate(Avg("rate"))["rate__avg"]
-                    or 0.0,
-                }
-                for item in basket_items
-            ]
-            return JsonResponse(data, safe=False, status=200)
+            return basket_response(request, basket)
 
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON"}, status=400)
@@ -133,50 +102,13 @@ def delete_basket(request):
                     {"error": "Invalid product ID or count"}, status=400
                 )
 
-            if not request.user.is_authenticated:
+            basket = get_basket_store(request)
+            if basket is None:
                 return JsonResponse({"error": "User not authenticated"}, status=401)
 
-            try:
-                basket_item = BasketItem.objects.get(
-                    user=request.user, product_id=product_id
-                )
-            except BasketItem.DoesNotExist:
+            if not basket.remove(product_id, count):
                 return JsonResponse({"error": "Item not found in basket"}, status=404)
-            if basket_item.quantity <= count:
-                basket_item.delete()
-            else:
-                basket_item.quantity -= count
-                basket_item.save()
-            basket_items = BasketItem.objects.filter(user=request.user)
-            data = [
-                {
-                    "id": item.product.id,
-                    "category": (
-                        item.product.category.id if item.product.category else None
-                    ),
-                    "price": float(get_price_with_discount(item.product)),
-                    "count": item.quantity,
-                    "date": item.product.date_added.strftime(
-                        "%a %b %d %Y %H:%M:%S GMT%z"
-                    ),
-                    "title": item.product.title,
-                    "description": item.product.description,
-                    "freeDelivery": item.product.free_delivery,
-                    "images": [
-                        {"src": image.image.url, "alt": image.alt_text}
-                        for image in item.product.images.all()
-                    ],
-                    "tags": [
-                        {"id": tag.id, "name": tag.name}
-                        for tag in item.product.tags.all()
-                    ],
-                    "reviews": item.product.reviews.count(),
-                    "rating": item.product.reviews.aggregate(Avg("rate"))["rate__avg"]
-                    or 0.0,
-                }
-                for item in basket_items
-            ]
-            return JsonResponse(data, safe=False, status=200)
+            return basket_response(request, basket)
 
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON"}, status=400)
@@ -184,6 +116,33 @@ def delete_basket(request):
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
 
 
+def post_basket_bulk(request):
+    """
+    Применяет список изменений корзины [{"id": ..., "count": ...}] разом:
+    положительный count добавляет товар, отрицательный убирает.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid HTTP method"}, status=405)
+    basket = get_basket_store(request, create=True)
+    if basket is None:
+        return JsonResponse({"error": "User not authenticated"}, status=401)
+    try:
+        data = json.loads(request.body)
+        deltas = {}
+        for item in data:
+            product_id, count = int(item["id"]), int(item["count"])
+            deltas[product_id] = deltas.get(product_id, 0) + count
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({"error": "Invalid product ID or count"}, status=400)
+    deltas = {product_id: count for product_id, count in deltas.items() if count}
+
+    if not basket.apply(deltas):
+        return JsonResponse({"error": "Product not found"}, status=404)
+    return basket_response(request, basket)
+
+
 def basket_view(request):
     if request.method == "GET":
         return get_basket(request)
@@ -1,205 +1,207 @@
 # shop/views_catalog.py
-import datetime
+import base64
+import json
 import logging  # noqa: F401
 
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
-from django.db.models import Avg, Count, FloatField
-from django.http import JsonResponse
+from django.db.models import Q
+from django.utils import timezone
+from django.views.decorators.http import condition
 
-from .models import Banner, Category, Product, Sale
+from .category_tree import get_category_tree
+from .images import serialize_image
+from .models import Banner, Product, Sale
+from .product_cards import (
+    build_product_card,
+    get_product_cards,
+    load_card_products,
+    serialize_product_cards,
+)
+from .response_cache import cache_storefront_response
+from .responses import JsonResponse
+from .search import search_products
+from .stock import annotate_available
 
 # logger = logging.getLogger('custom_logger')
 
+# Параметр sort -> поле модели; рейтинг, число отзывов и цена с учетом скидки
+# хранятся в Product
+CATALOG_SORT_FIELDS = {
+    "rating": "rating",
+    "price": "effective_price",
+    "reviews": "reviews_count",
+    "date_added": "date_added",
+}
 
-def get_price_with_discount(product):
-    """Возвращает цену продукта с учетом активной скидки, если она есть."""
-    try:
-        sale = product.sale
-        if sale.date_from <= datetime.date.today() <= sale.date_to:
-            return sale.sale_price
-    except Sale.DoesNotExist:
-        pass
-    return product.price
+
+def category_tree_etag(request):
+    return get_category_tree()["etag"]
 
 
+@condition(etag_func=category_tree_etag)
 def get_categories(request):
     """
-    Эндпоинт для получения категорий и подкатегорий.
+    Эндпоинт для получения дерева категорий.
+    Дерево хранится в кэше и сбрасывается при изменении категорий.
     """
-    categories = Category.objects.filter(parent__isnull=True)
-
-    category_list = []
-    for category in categories:
-        subcategories = category.subcategories.all()
-        category_data = {
-            "id": category.id,
-            "title": category.name,
-            "image": {
-                "src": category.image.url if category.image else None,
-                "alt": category.name,
-            },
-            "subcategories": [
-                {
-                    "id": sub.id,
-                    "title": sub.name,
-                    "image": {
-                        "src": sub.image.url if sub.image else None,
-                        "alt": sub.name,
-                    },
-                }
-                for sub in subcategories
-            ],
-        }
-        category_list.append(category_data)
+    return JsonResponse(get_category_tree()["tree"], safe=False, status=200)
 
-    return JsonResponse(category_list, safe=False, status=200)
 
+class CatalogQueryError(ValueError):
+    pass
 
-def get_catalog(request):
+
+def build_catalog_query(request):
+    """
+    Разбирает параметры каталога и возвращает выборку с фильтрами и сортировкой
+    вместе с параметрами пагинации. Сам к БД не обращается, поэтому общий
+    для синхронного и асинхронного представлений.
+    """
     filter_params = request.GET.get("filter")
-    current_page = int(request.GET.get("currentPage", 1))
     category_id = request.GET.get("category")
     sort = request.GET.get("sort", "date")
     sort_type = request.GET.get("sortType", "dec")
-    limit = int(request.GET.get("limit", 20))
     tags = request.GET.getlist("tags")
+    cursor = request.GET.get("cursor")
     filter_data = {}
     if filter_params:
-        import json
-
         try:
             filter_data = json.loads(filter_params)
         except json.JSONDecodeError:
-            return JsonResponse({"error": "Invalid filter format"}, status=400)
+            raise CatalogQueryError("Invalid filter format") from None
     products = Product.objects.all()
-    if "name" in filter_data:
-        products = products.filter(title__icontains=filter_data["name"])
+    search = str(filter_data.get("name") or "").strip()
+    if search:
+        products = search_products(products, search)
     if "minPrice" in filter_data:
-        products = products.filter(price__gte=filter_data["minPrice"])
+        products = products.filter(effective_price__gte=filter_data["minPrice"])
     if "maxPrice" in filter_data:
-        products = products.filter(price__lte=filter_data["maxPrice"])
+        products = products.filter(effective_price__lte=filter_data["maxPrice"])
     if "freeDelivery" in filter_data:
         products = products.filter(free_delivery=filter_data["freeDelivery"])
     if "available" in filter_data:
-        products = products.filter(count__gt=0)
+        # count > 0 отсекает товары по частичному индексу до подсчета резервов
+        products = annotate_available(products.filter(count__gt=0)).filter(
+            available__gt=0
+        )
     if category_id:
         products = products.filter(category_id=category_id)
     if tags:
         products = products.filter(tags__id__in=tags).distinct()
-    products = products.annotate(
-        rating=Avg("reviews__rate", output_field=FloatField()),
-        reviews_count=Count("reviews"),
-    )
     sort_prefix = "-" if sort_type == "dec" else ""
-    if sort in ["rating", "price", "reviews", "date_added"]:
-        products = products.order_by(f"{sort_prefix}{sort}")
+    sort_field = CATALOG_SORT_FIELDS.get(sort, "date_added")
+    by_relevance = sort == "relevance" or "sort" not in request.GET
+    if search and by_relevance and cursor is None:
+        # Ранг поиска не хранится в Product, поэтому курсор по нему не строится
+        products = products.order_by("-search_rank", "-id")
     else:
-        products = products.order_by(f"{sort_prefix}date_added")
-    paginator = Paginator(products, limit)
-    page_obj = paginator.get_page(current_page)
-    items = []
-    for product in page_obj.object_list:
-        price = get_price_with_discount(product)
-        items.append(
-            {
-                "id": product.id,
-                "category": product.category.id if product.category else None,
-                "price": float(price),
-                "count": product.count,
-                "date": product.date_added.isoformat(),
-                "title": product.title,
-                "description": product.description,
-                "freeDelivery": product.free_delivery,
-                "images": [
-                    {"src": img.image.url, "alt": img.alt_text}
-                    for img in product.images.all()
-                ],
-                "tags": [
-                    {"id": tag.id, "name": tag.name} for tag in product.tags.all()
-                ],
-                "reviews": product.reviews_count,
-                "rating": product.rating or 0.0,
-            }
+        products = products.order_by(f"{sort_prefix}{sort_field}", f"{sort_prefix}id")
+    if cursor:
+        try:
+            value, last_id = decode_cursor(cursor, sort_field)
+        except ValueError:
+            raise CatalogQueryError("Invalid cursor") from None
+        lookup = "lt" if sort_prefix else "gt"
+        products = products.filter(
+            Q(**{f"{sort_field}__{lookup}": value})
+            | Q(**{sort_field: value, f"id__{lookup}": last_id})
         )
+    return {
+        "products": products,
+        "sort_field": sort_field,
+        "cursor": cursor,
+        "current_page": int(request.GET.get("currentPage", 1)),
+        "limit": int(request.GET.get("limit", 20)),
+    }
+
+
+def get_catalog(request):
+    try:
+        query = build_catalog_query(request)
+    except CatalogQueryError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if query["cursor"] is not None:
+        page = load_card_products(query["products"][: query["limit"] + 1])
+        return cursor_page_response(page, query)
+    paginator = Paginator(query["products"], query["limit"])
+    page_obj = paginator.get_page(query["current_page"])
+    items = serialize_product_cards(page_obj.object_list)
 
     response = {
         "items": items,
-        "currentPage": current_page,
+        "currentPage": query["current_page"],
         "lastPage": paginator.num_pages,
     }
     return JsonResponse(response, safe=False)
 
 
+def sort_key_field(sort_field):
+    return Product._meta.get_field(sort_field)
+
+
+def encode_cursor(product, sort_field):
+    """Упаковывает (значение ключа сортировки, id) в непрозрачную строку."""
+    value = sort_key_field(sort_field).value_to_string(product)
+    payload = json.dumps([value, product.id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort_field):
+    """Распаковывает курсор в (значение ключа сортировки, id)."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, last_id = json.loads(payload)
+        value = sort_key_field(sort_field).to_python(value)
+        return value, int(last_id)
+    except (ValueError, TypeError, ValidationError):
+        raise ValueError("Invalid cursor") from None
+
+
+def cursor_page_response(page, query):
+    """
+    Ответ keyset-пагинации: вместо COUNT(*) и OFFSET выбирается limit + 1
+    товаров после последней пары (ключ сортировки, id). lastPage не считается,
+    а оценивается по наличию следующей страницы.
+    """
+    limit, current_page = query["limit"], query["current_page"]
+    has_next = len(page) > limit
+    page = page[:limit]
+    response = {
+        "items": [build_product_card(product) for product in page],
+        "currentPage": current_page,
+        "lastPage": current_page + 1 if has_next else current_page,
+        "nextCursor": (
+            encode_cursor(page[-1], query["sort_field"]) if has_next else None
+        ),
+    }
+    return JsonResponse(response, safe=False)
+
+
+@cache_storefront_response("products_popular")
 def get_products_popular(request):
     if request.method == "GET":
-        popular_products = Product.objects.annotate(
-            review_count=Count("reviews")
-        ).order_by("-review_count")[:10]
-        data = []
-        for product in popular_products:
-            print(f"Product: {product.title}, Review count: {product.review_count}")
-            price = get_price_with_discount(product)
-            data.append(
-                {
-                    "id": product.id,
-                    "category": product.category.id if product.category else None,
-                    "price": float(price),
-                    "count": product.count,
-                    "date": product.date_added.strftime("%a %b %d %Y %H:%M:%S GMT%z"),
-                    "title": product.title,
-                    "description": product.description,
-                    "freeDelivery": product.free_delivery,
-                    "images": [
-                        {"src": img.image.url, "alt": img.alt_text}
-                        for img in product.images.all()
-                    ],
-                    "tags": [
-                        {"id": tag.id, "name": tag.name} for tag in product.tags.all()
-                    ],
-                    "reviews": product.reviews.count(),
-                    "rating": product.reviews.aggregate(Avg("rate"))["rate__avg"]
-                    or 0.0,
-                }
-            )
+        popular_products = Product.objects.order_by("-reviews_count")[:10]
+        data = serialize_product_cards(popular_products)
         return JsonResponse(data, safe=False, status=200)
     else:
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
 
 
+@cache_storefront_response("products_limited")
 def get_products_limited(request):
     if request.method == "GET":
         LIMIT_THRESHOLD = 10
-        limited_products = Product.objects.filter(count__lte=LIMIT_THRESHOLD)
-        data = []
-        for product in limited_products:
-            price = get_price_with_discount(product)
-            data.append(
-                {
-                    "id": product.id,
-                    "category": product.category.id if product.category else None,
-                    "price": float(price),
-                    "count": product.count,
-                    "date": product.date_added.strftime("%a %b %d %Y %H:%M:%S GMT%z"),
-                    "title": product.title,
-                    "description": product.description,
-                    "freeDelivery": product.free_delivery,
-                    "images": [
-                        {"src": image.image.url, "alt": image.alt_text}
-                        for image in product.images.all()
-                    ],
-                    "tags": [
-                        {"id": tag.id, "name": tag.name} for tag in product.tags.all()
-                    ],
-                    "reviews": product.reviews.count(),
-                    "rating": product.reviews.aggregate(Avg("rate"))["rate__avg"]
-                    or 0.0,
-                }
-            )
+        limited_products = annotate_available(Product.objects.all()).filter(
+            available__lte=LIMIT_THRESHOLD
+        )
+        data = serialize_product_cards(limited_products)
         return JsonResponse(data, safe=False, status=200)
     else:
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
 
 
+@cache_storefront_response("sales")
 def get_sales(request):
     if request.method == "GET":
         current_page = int(request.GET.get("currentPage", 1))
@@ -207,64 +209,66 @@ def get_sales(request):
         start = (current_page - 1) * items_per_page
         end = start + items_per_page
 
-        sales = Sale.objects.filter(
-            date_from__lte=datetime.date.today(), date_to__gte=datetime.date.today()
-        )[start:end]
-        total_sales = Sale.objects.filter(
-            date_from__lte=datetime.date.today(), date_to__gte=datetime.date.today()
-        ).count()
-
-        data = {
-            "items": [
-                {
-                    "id": sale.product.id,
-                    "price": float(sale.product.price),
-                    "salePrice": float(sale.sale_price),
-                    "dateFrom": sale.date_from.strftime("%m-%d"),
-                    "dateTo": sale.date_to.strftime("%m-%d"),
-                    "title": sale.product.title,
-                    "images": [
-                        {"src": img.image.url, "alt": img.alt_text}
-                        for img in sale.product.images.all()
-                    ],
-                }
-                for sale in sales
-            ],
-            "currentPage": current_page,
-            "lastPage": (total_sales + items_per_page - 1) // items_per_page,
-        }
+        sales = (
+            active_sales()
+            .select_related("product")
+            .prefetch_related("product__images")[start:end]
+        )
+        data = serialize_sales(
+            sales, active_sales().count(), current_page, items_per_page
+        )
         return JsonResponse(data, safe=False, status=200)
     else:
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
 
 
-def get_banners(request):
+def active_sales():
+    today = timezone.localdate()
+    return Sale.objects.filter(date_from__lte=today, date_to__gte=today).order_by("id")
 
-    if request.method == "GET":
-        banners = Banner.objects.all().order_by("-date_added")
-        data = [
+
+def serialize_sales(sales, total_sales, current_page, items_per_page):
+    return {
+        "items": [
             {
-                "id": banner.id,
-                "category": (
-                    banner.product.category.id if banner.product.category else None
-                ),
-                "price": float(banner.product.price),
-                "count": banner.product.count,
-                "date": banner.date_added.strftime("%a %b %d %Y %H:%M:%S GMT%z"),
-                "title": banner.title,
-                "description": banner.description,
-                "freeDelivery": banner.product.free_delivery,
-                "images": [{"src": banner.image.url, "alt": banner.title}],
-                "tags": [
-                    {"id": tag.id, "name": tag.name}
-                    for tag in banner.product.tags.all()
+                "id": sale.product.id,
+                "price": sale.product.price,
+                "salePrice": sale.sale_price,
+                "dateFrom": sale.date_from.strftime("%m-%d"),
+                "dateTo": sale.date_to.strftime("%m-%d"),
+                "title": sale.product.title,
+                "images": [
+                    serialize_image(img.image, img.alt_text)
+                    for img in sale.product.images.all()
                 ],
-                "reviews": banner.product.reviews.count(),
-                "rating": banner.product.reviews.aggregate(Avg("rate"))["rate__avg"]
-                or 0.0,
             }
-            for banner in banners
-        ]
-        return JsonResponse(data, safe=False, status=200)
+            for sale in sales
+        ],
+        "currentPage": current_page,
+        "lastPage": (total_sales + items_per_page - 1) // items_per_page,
+    }
+
+
+@cache_storefront_response("banners")
+def get_banners(request):
+
+    if request.method == "GET":
+        banners = list(Banner.objects.order_by("-date_added"))
+        cards = get_product_cards([banner.product_id for banner in banners])
+        return JsonResponse(serialize_banners(banners, cards), safe=False, status=200)
     else:
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
+
+
+def serialize_banners(banners, cards):
+    return [
+        {
+            **cards[banner.product_id],
+            "id": banner.id,
+            "date": banner.date_added,
+            "title": banner.title,
+            "description": banner.description,
+            "images": [serialize_image(banner.image, banner.title)],
+        }
+        for banner in banners
+    ]
@@ -0,0 +1,183 @@
+# shop/views_media.py
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
+
+from .images import (
+    MIME_TYPES,
+    build_derivatives,
+    get_image_derivative_options,
+    parse_derivative_path,
+)
+from .responses import JsonResponse
+from .storage import name_hash
+
+DEFAULT_MEDIA_SERVING = {
+    # "python" — FileResponse из воркера; "x-accel-redirect" (nginx) и
+    # "x-sendfile" (Apache, lighttpd) — файл отдает фронт-прокси
+    "BACKEND": "python",
+    # Внутренний location nginx для X-Accel-Redirect, указывающий на MEDIA_ROOT
+    "INTERNAL_URL": "/protected-media/",
+    # max-age файлов без хэша содержимого в имени; с хэшем — год и immutable
+    "MAX_AGE": 60 * 60,
+}
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_media_serving_options():
+    return {**DEFAULT_MEDIA_SERVING, **getattr(settings, "MEDIA_SERVING", {})}
+
+
+def media_content_type(path):
+    ext = os.path.splitext(path)[1].lstrip(".").lower()
+    return MIME_TYPES.get(ext) or (
+        mimetypes.guess_type(path)[0] or "application/octet-stream"
+    )
+
+
+def media_etag(path, stat):
+    """Хэш из имени файла или, для имен без хэша, время изменения и размер."""
+    # Для производных хэш в пути относится к оригиналу, а не к самому файлу
+    content_hash = name_hash(os.path.basename(path))
+    if content_hash:
+        return quote_etag(content_hash)
+    return quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+
+
+def parse_range(header, size):
+    """
+    (начало, конец включительно) для одного диапазона Range, "invalid" для
+    недостижимого диапазона и None, если заголовок нужно игнорировать.
+    """
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # bytes=-500 — последние 500 байт
+        length = int(end)
+        return (max(size - length, 0), size - 1) if length else "invalid"
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        return "invalid"
+    return start, end
+
+
+class FileRange:
+    """Файл, из которого читается не больше length байт с текущей позиции."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def file_response(request, full_path, stat, content_type, etag):
+    """
+    FileResponse с поддержкой одного диапазона Range. Несколько диапазонов
+    и If-Range с другим ETag дают ответ целиком.
+    """
+    size = stat.st_size
+    byte_range = None
+    header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if header and request.method == "GET" and if_range in (None, etag):
+        byte_range = parse_range(header, size)
+    if byte_range == "invalid":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(
+            FileRange(file, end - start + 1), content_type=content_type, status=206
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def build_missing_derivative(path):
+    """Строит отсутствующую производную изображения; True, если построена."""
+    options = get_image_derivative_options()
+    prefix = f"{options['PREFIX']}/"
+    if not path.startswith(prefix):
+        return False
+    parsed = parse_derivative_path(path[len(prefix) :], options)
+    if parsed is None:
+        return False
+    name, width, fmt = parsed
+    try:
+        stats = build_derivatives(name, variants=[(width, fmt)])
+    except FileNotFoundError:
+        return False
+    # Ширина не подходит оригиналу: такой производной нет
+    return bool(stats["built"] or stats["skipped"])
+
+
+def serve_media(request, path):
+    """
+    Отдает файл из MEDIA_ROOT с Cache-Control и ETag. Байты передает
+    фронт-прокси (X-Accel-Redirect / X-Sendfile) или, при BACKEND "python",
+    FileResponse с поддержкой Range. Отсутствующие производные изображений
+    строятся при первом запросе.
+    """
+    options = get_media_serving_options()
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        return JsonResponse({"error": "File not found"}, status=404)
+    if not os.path.isfile(full_path) and not build_missing_derivative(path):
+        return JsonResponse({"error": "File not found"}, status=404)
+
+    stat = os.stat(full_path)
+    etag = media_etag(path, stat)
+    if name_hash(path):
+        cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = f"public, max-age={options['MAX_AGE']}"
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (
+        if_none_match.strip() == "*" or etag in parse_etags(if_none_match)
+    ):
+        response = HttpResponseNotModified()
+    elif options["BACKEND"] == "x-accel-redirect":
+        response = HttpResponse(content_type=media_content_type(path))
+        response["X-Accel-Redirect"] = f"{options['INTERNAL_URL']}{quote(path)}"
+    elif options["BACKEND"] == "x-sendfile":
+        response = HttpResponse(content_type=media_content_type(path))
+        response["X-Sendfile"] = full_path
+    else:
+        response = file_response(
+            request, full_path, stat, media_content_type(path), etag
+        )
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
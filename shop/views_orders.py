@@ -1,16 +1,18 @@
 # shop/views_orders.py
 import json
-import logging  # noqa: F401
-from datetime import date
+import logging
 
 from django.db import transaction
-from django.db.models import Avg
-from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 
-from .models import BasketItem, Order, OrderItem, Product, Profile, Sale
+from .basket import get_basket_store
+from .idempotency import idempotent
+from .models import Order, OrderItem, Product, Profile
+from .product_cards import get_product_cards
+from .responses import JsonResponse
+from .stock import get_reserved_quantities, release_order_stock, reserve_order_items
 
-# logger = logging.getLogger('custom_logger')
+logger = logging.getLogger(__name__)
 
 
 def orders_view(request):
@@ -22,78 +24,59 @@ def orders_view(request):
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
 
 
+def serialize_orders(orders):
+    """
+    Формирует данные заказов с карточками товаров.
+    Позиции заказов должны быть предзагружены через prefetch_related("items").
+    """
+    cards = get_product_cards(
+        [item.product_id for order in orders for item in order.items.all()]
+    )
+    return [
+        {
+            "id": order.id,
+            # Строка для отображения в шаблонах заказа, не ISO 8601
+            "createdAt": order.created_at.strftime("%Y-%m-%d %H:%M"),
+            "fullName": order.full_name,
+            "email": order.email,
+            "phone": order.phone,
+            "deliveryType": order.delivery_type,
+            "paymentType": order.payment_type,
+            "totalCost": order.total_cost,
+            "status": order.status,
+            "city": order.city,
+            "address": order.address,
+            "products": [
+                {
+                    **cards[item.product_id],
+                    "price": item.price,
+                    "count": item.quantity,
+                }
+                for item in order.items.all()
+            ],
+        }
+        for order in orders
+    ]
+
+
 def get_orders(request):
     if request.method == "GET":
         user = request.user
         if not user.is_authenticated:
             return JsonResponse({"error": "Authentication required"}, status=401)
 
-        orders = Order.objects.filter(user=user, status__in=["pending", "accepted"])
-        data = []
-        for order in orders:
-            data.append(
-                {
-                    "id": order.id,
-                    "createdAt": order.created_at.strftime("%Y-%m-%d %H:%M"),
-                    "fullName": order.full_name,
-                    "email": order.email,
-                    "phone": order.phone,
-                    "deliveryType": order.delivery_type,
-                    "paymentType": order.payment_type,
-                    "totalCost": float(order.total_cost),
-                    "status": order.status,
-                    "city": order.city,
-                    "address": order.address,
-                    "products": [
-                        {
-                            "id": item.product.id,
-                            "category": (
-                                item.product.category.id
-                                if item.product.category
-                                else None
-                            ),
-                            "price": float(item.price),
-                            "count": item.quantity,
-                            "date": item.product.date_added.strftime(
-                                "%a %b %d %Y %H:%M:%S GMT%z"
-                            ),
-                            "title": item.product.title,
-                            "description": item.product.description,
-                            "freeDelivery": item.product.free_delivery,
-                            "images": [
-                                {"src": image.image.url, "alt": image.alt_text}
-                                for image in item.product.images.all()
-                            ],
-                            "tags": [
-                                {"id": tag.id, "name": tag.name}
-                                for tag in item.product.tags.all()
-                            ],
-                            "reviews": item.product.reviews.count(),
-                            "rating": item.product.reviews.aggregate(Avg("rate"))[
-                                "rate__avg"
-                            ]
-                            or 0.0,
-                        }
-                        for item in order.items.all()
-                    ],
-                }
-            )
+        orders = list(
+            Order.objects.filter(
+                user=user, status__in=["pending", "accepted"]
+            ).prefetch_related("items")
+        )
+        data = serialize_orders(orders)
         return JsonResponse(data, safe=False, status=200)
     else:
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
 
 
-def get_price_with_discount(product):
-    """Возвращает цену продукта с учетом активной скидки, если она есть."""
-    try:
-        sale = product.sale
-        if sale.date_from <= date.today() <= sale.date_to:
-            return float(sale.sale_price)
-    except Sale.DoesNotExist:
-        pass
-    return float(product.price)
-
-
+@idempotent
 def post_orders(request):
     if request.method == "POST":
         try:
@@ -101,25 +84,20 @@ def post_orders(request):
             user = request.user
             if not user.is_authenticated:
                 return JsonResponse({"error": "Authentication required"}, status=401)
-            total_cost = 0
-            order_items = []
+            quantities = {}
             for item in data:
                 try:
-                    product = Product.objects.get(id=item["id"])
-                    price = get_price_with_discount(product)
-                    total_cost += price * item["count"]
-                    order_items.append(
-                        {"product": product, "count": item["count"], "price": price}
+                    product_id = int(item["id"])
+                    quantities[product_id] = quantities.get(product_id, 0) + int(
+                        item["count"]
                     )
-
-                except Product.DoesNotExist:
-                    print(f"Product with id {item['id']} not found")
-                    return JsonResponse({"error": "Product not found"}, status=404)
                 except KeyError as e:
-                    print(f"Missing key in item data: {e}")
+                    logger.warning("Missing key in item data: %s", e)
                     return JsonResponse(
                         {"error": f"Missing key in item data: {e}"}, status=400
                     )
+            if not quantities or min(quantities.values()) <= 0:
+                return JsonResponse({"error": "Invalid product count"}, status=400)
             profile, _ = Profile.objects.get_or_create(user=user)
 
             if not profile.fullName or not profile.email:
@@ -132,31 +110,65 @@ def post_orders(request):
                     },
                     status=400,
                 )
-            order = Order.objects.create(
-                user=user,
-                full_name=profile.fullName,
-                email=profile.email,
-                delivery_type="standard",
-                payment_type="online",
-                total_cost=total_cost,
-                city="Moscow",
-                address="Default address",
-                status="pending",
-            )
-            for item in order_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item["product"],
-                    quantity=item["count"],
-                    price=item["price"],
+            # Отложенные изменения корзины записываются до оформления,
+            # чтобы фоновая запись не вернула корзину после заказа
+            basket = get_basket_store(request)
+            basket.flush()
+            with transaction.atomic():
+                # Блокируем строки товаров в порядке id, чтобы параллельные
+                # оформления не зарезервировали один и тот же остаток
+                products = {
+                    product.id: product
+                    for product in Product.objects.select_for_update()
+                    .filter(id__in=quantities)
+                    .order_by("id")
+                }
+                if len(products) != len(quantities):
+                    return JsonResponse({"error": "Product not found"}, status=404)
+                reserved = get_reserved_quantities(quantities)
+                short = [
+                    product_id
+                    for product_id, count in quantities.items()
+                    if products[product_id].count - reserved.get(product_id, 0) < count
+                ]
+                if short:
+                    return JsonResponse(
+                        {"error": "Not enough stock", "products": short}, status=400
+                    )
+                prices = {
+                    product_id: product.effective_price
+                    for product_id, product in products.items()
+                }
+                order = Order.objects.create(
+                    user=user,
+                    full_name=profile.fullName,
+                    email=profile.email,
+                    delivery_type="standard",
+                    payment_type="online",
+                    total_cost=sum(
+                        prices[product_id] * count
+                        for product_id, count in quantities.items()
+                    ),
+                    city="Moscow",
+                    address="Default address",
+                    status="pending",
                 )
-                item["product"].count -= item["count"]
-                item["product"].save()
-            BasketItem.objects.filter(user=user).delete()
+                order_items = OrderItem.objects.bulk_create(
+                    OrderItem(
+                        order=order,
+                        product_id=product_id,
+                        quantity=count,
+                        price=prices[product_id],
+                    )
+                    for product_id, count in quantities.items()
+                )
+                # Товар держится резервом до оплаты, списание — в commit_order_stock
+                reserve_order_items(order, order_items)
+                basket.clear()
             response = {"orderId": order.id}
             return JsonResponse(response, status=200)
         except Exception as e:
-            print("Error during order creation:", e)
+            logger.exception("Error during order creation")
             return JsonResponse({"error": str(e)}, status=500)
     else:
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
@@ -166,48 +178,10 @@ def get_order_by_id(request, id):
     if request.method == "GET":
         if not request.user.is_authenticated:
             return JsonResponse({"error": "Authentication required"}, status=401)
-        order = get_object_or_404(Order, id=id, user=request.user)
-        data = {
-            "id": order.id,
-            "createdAt": order.created_at.strftime("%Y-%m-%d %H:%M"),
-            "fullName": order.full_name,
-            "email": order.email,
-            "phone": order.phone,
-            "deliveryType": order.delivery_type,
-            "paymentType": order.payment_type,
-            "totalCost": float(order.total_cost),
-            "status": order.status,
-            "city": order.city,
-            "address": order.address,
-            "products": [
-                {
-                    "id": item.product.id,
-                    "category": (
-                        item.product.category.id if item.product.category else None
-                    ),
-                    "price": float(item.price),
-                    "count": item.quantity,
-                    "date": item.product.date_added.strftime(
-                        "%a %b %d %Y %H:%M:%S GMT%z"
-                    ),
-                    "title": item.product.title,
-                    "description": item.product.description,
-                    "freeDelivery": item.product.free_delivery,
-                    "images": [
-                        {"src": image.image.url, "alt": image.alt_text}
-                        for image in item.product.images.all()
-                    ],
-                    "tags": [
-                        {"id": tag.id, "name": tag.name}
-                        for tag in item.product.tags.all()
-                    ],
-                    "reviews": item.product.reviews.count(),
-                    "rating": item.product.reviews.aggregate(Avg("rate"))["rate__avg"]
-                    or 0.0,
-                }
-                for item in order.items.all()
-            ],
-        }
+        order = get_object_or_404(
+            Order.objects.prefetch_related("items"), id=id, user=request.user
+        )
+        data = serialize_orders([order])[0]
 
         return JsonResponse(data, status=200)
     else:
@@ -224,14 +198,16 @@ def post_order_update(request, id):
             status = data.get("status")
 
             if not status:
-                print(
-                    f"No status provided, setting status to 'accepted' for order {id}"
+                logger.info(
+                    "No status provided, setting status to 'accepted' for order %s", id
                 )
                 status = "accepted"
             order = get_object_or_404(Order, id=id, user=request.user)
             with transaction.atomic():
                 order.status = status
                 order.save()
+                if status == "canceled":
+                    release_order_stock(order)
             response_data = {"orderId": order.id}
 
             return JsonResponse(response_data, status=200)
@@ -272,8 +248,8 @@ def get_history_order(request):
             ]
 
             return JsonResponse(orders_data, safe=False)
-        except Exception as e:
-            print(f"Ошибка при получении истории заказов: {e}")
+        except Exception:
+            logger.exception("Ошибка при получении истории заказов")
             return JsonResponse(
                 {"error": "Произошла ошибка при получении истории заказов."}, status=500
             )
@@ -1,30 +1,36 @@
 # shop/views.py
+import ipaddress
 import json
-import logging  # noqa: F401
+import logging
 import re
-import uuid
 
-from django.http import HttpResponseRedirect, JsonResponse
-
-# logger = logging.getLogger('custom_logger')
+from django.conf import settings
+from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
-from yookassa import Configuration, Payment
+from django.views.decorators.csrf import csrf_exempt
+from yookassa import Payment
+from yookassa.domain.common import SecurityHelper
+from yookassa.domain.notification import WebhookNotificationFactory
 
+from .idempotency import gateway_idempotence_key, idempotent
 from .models import Order
+from .payments import HANDLED_EVENTS, apply_payment_event, configure_yookassa
+from .responses import JsonResponse
+from .stock import commit_order_stock
+
+logger = logging.getLogger(__name__)
 
-Configuration.account_id = "1001674"
-Configuration.secret_key = "test_AX2vIdQrcGW0dwjLkIhAo7KecbtPvghXFfAqskjQ9yg"
+configure_yookassa()
 
 
+@idempotent
 def post_payment(request, id):
     if request.method == "POST":
         try:
-            print(f"Received POST request for payment processing on order {id}")
             try:
                 data = json.loads(request.body)
-                print(f"Request body successfully parsed: {data}")
             except json.JSONDecodeError as e:
-                print(f"Error parsing JSON: {str(e)}")
+                logger.warning("Error parsing JSON: %s", e)
                 return JsonResponse({"error": "Invalid JSON"}, status=400)
             number = data.get("number")
             name = data.get("name")
@@ -70,32 +76,30 @@ def post_payment(request, id):
             # Пример логики (например, сохранение платежа)
             # payment = Payment.objects.create(number=number, name=name,
             # month=month, year=year, code=code)
-            # print(f"Payment object created: {payment}")
             try:
                 order = Order.objects.get(id=id)
             except Order.DoesNotExist:
-                print(f"Error: Order with id {id} does not exist.")
+                logger.warning("Order %s does not exist", id)
                 return JsonResponse({"error": "Order not found"}, status=404)
             order.status = "paid"
             order.save()
-            print(f"Order {id} status updated to 'paid'.")
-            print(f"Payment for order {id} processed successfully.")
+            commit_order_stock(order)
+            logger.info("Payment for order %s processed successfully", id)
             return JsonResponse(
                 {"message": "Payment processed successfully", "order_id": id},
                 status=200,
             )
 
         except json.JSONDecodeError:
-            print("Error: Invalid JSON in the request.")
             return JsonResponse({"error": "Invalid JSON"}, status=400)
         except Exception as e:
-            print(f"Error: {str(e)}")
+            logger.exception("Error during payment processing")
             return JsonResponse({"error": str(e)}, status=500)
     else:
-        print(f"Error: Method {request.method} not allowed for payment processing.")
         return JsonResponse({"error": "Method not allowed"}, status=405)
 
 
+@idempotent
 def create_payment(request, id):
     """
     Функция для создания платежа в YooKassa и изменения статуса заказа.
@@ -118,18 +122,22 @@ def create_payment(request, id):
                 },
                 "capture": True,
                 "description": f"Заказ №{order.id} - Оплата заказа",
+                "metadata": {"order_id": order.id},
             },
-            uuid.uuid4(),
+            # С Idempotency-Key повтор не создаст в ЮKassa второй платеж
+            gateway_idempotence_key(request),
         )
 
         order.payment_id = payment["id"]
+        # Новый платеж: ошибка прошлой попытки больше не актуальна
+        order.payment_error = None
         order.save()
 
         redirect_url = payment["confirmation"]["confirmation_url"]
         return HttpResponseRedirect(redirect_url)  # Возвращаем редирект (302)
 
     except Exception as e:
-        print(f"Ошибка при создании платежа: {e}")
+        logger.exception("Ошибка при создании платежа")
         return JsonResponse(
             {"status": "error", "message": f"Ошибка при создании платежа: {e}"},
             status=500,
@@ -152,36 +160,110 @@ def payment_success(request):
                 "payment_error.html",
                 {"error": "Платежный идентификатор отсутствует для данного заказа."},
             )
-        payment = Payment.find_one(order.payment_id)
-        print(f"Найден платеж с ID: {payment.id}, Статус: {payment.status}")
-
-        if payment.status == "succeeded":
-            order.status = "paid"
-            order.save()
+        # Статус заказа обновляет уведомление ЮKassa (yookassa_webhook),
+        # здесь только читаем его, не обращаясь к API
+        if order.status == "paid":
             return render(
                 request, "payment_success.html", {"order": order, "status": "success"}
             )
-
-        else:
-            print(f"Платеж не завершен. Статус: {payment.status}")
+        if order.payment_error:
             return render(
                 request,
                 "payment_error.html",
                 {
-                    "error": f"Платеж не завершен. Статус: {payment.status}",
+                    "error": f"Платеж не завершен: {order.payment_error}",
                     "order": order,
                 },
             )
+        return render(request, "payment_pending.html", {"order": order})
 
     except Order.DoesNotExist:
-        print("Ошибка: Заказ не найден")
+        logger.warning("Заказ %s не найден", order_id)
         return render(request, "payment_error.html", {"error": "Заказ не найден"})
 
     except Exception as e:
-        print(f"Ошибка при обработке платежа: {str(e)}")
+        logger.exception("Ошибка при обработке платежа")
         return render(request, "payment_error.html", {"error": f"Ошибка: {str(e)}"})
 
 
+def in_networks(ip, networks):
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(net, strict=False) for net in networks)
+
+
+def get_client_ip(request, trusted_proxies=()):
+    """
+    Адрес отправителя. Если запрос пришел от доверенного прокси, берется
+    ближайший недоверенный адрес из X-Forwarded-For (справа налево):
+    левые значения заголовка может подставить сам клиент.
+    """
+    ip = request.META.get("REMOTE_ADDR", "")
+    if not in_networks(ip, trusted_proxies):
+        return ip
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        ip = hop
+        if not in_networks(hop, trusted_proxies):
+            break
+    return ip
+
+
+def is_trusted_sender(ip):
+    try:
+        ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return SecurityHelper().is_ip_trusted(ip)
+
+
+@csrf_exempt
+def yookassa_webhook(request):
+    """
+    Принимает уведомления ЮKassa о платежах.
+
+    Событие проверяется по магазину получателя и по статусу платежа в API,
+    после чего применяется к заказу. Повторные уведомления по тому же
+    платежу ничего не меняют.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    options = settings.YOOKASSA
+    if options["CHECK_WEBHOOK_IP"] and not is_trusted_sender(
+        get_client_ip(request, options.get("TRUSTED_PROXIES", ()))
+    ):
+        return JsonResponse({"error": "Untrusted sender"}, status=403)
+    try:
+        data = json.loads(request.body)
+        notification = WebhookNotificationFactory().create(data)
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
+        return JsonResponse({"error": f"Invalid notification: {e}"}, status=400)
+
+    expected_status = HANDLED_EVENTS.get(notification.event)
+    if expected_status is None:
+        return JsonResponse({"status": "ignored"}, status=200)
+    recipient = notification.object.recipient
+    if recipient is None or str(recipient.account_id) != str(options["ACCOUNT_ID"]):
+        return JsonResponse({"error": "Unknown shop"}, status=400)
+
+    # Тело уведомления не подписано: статус берем из API магазина
+    try:
+        payment = Payment.find_one(notification.object.id)
+    except Exception as e:
+        logger.warning("Ошибка при проверке платежа %s: %s", notification.object.id, e)
+        return JsonResponse({"error": "Payment lookup failed"}, status=502)
+    if payment.status != expected_status:
+        return JsonResponse({"error": "Payment status mismatch"}, status=400)
+
+    try:
+        result = apply_payment_event(payment, notification.event, payload=data)
+    except Order.DoesNotExist:
+        return JsonResponse({"error": "Order not found"}, status=404)
+    return JsonResponse({"status": result}, status=200)
+
+
 def retry_payment(request, order_id):
     try:
         order = Order.objects.get(id=order_id)
@@ -2,60 +2,63 @@
 import json
 import logging  # noqa: F401
 
-from django.http import Http404, JsonResponse
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils.timezone import now
 
-from .models import Product, Review, Sale
+from .images import serialize_image
+from .models import Product, Review
+from .responses import JsonResponse
 
 # logger = logging.getLogger('custom_logger')
 
 
+def product_item_queryset():
+    """Товар со скидкой, изображениями, тегами и отзывами за четыре запроса."""
+    return Product.objects.prefetch_related("images", "tags", "reviews")
+
+
 def get_product_item(request, id):
     try:
-        product = get_object_or_404(Product, id=id)
-        sale_price = None
-        try:
-            sale = product.sale
-            if sale.date_from <= now().date() <= sale.date_to:
-                sale_price = sale.sale_price
-        except Sale.DoesNotExist:
-            pass
-
-        # Формирование ответа
-        response_data = {
-            "id": product.id,
-            "category": product.category.id if product.category else None,
-            "price": sale_price if sale_price else product.price,
-            "originalPrice": product.price,
-            "salePrice": sale_price,
-            "count": product.count,
-            "date": product.date_added.strftime("%a %b %d %Y %H:%M:%S GMT%z (%Z)"),
-            "title": product.title,
-            "description": product.description,
-            "fullDescription": product.full_description,
-            "freeDelivery": product.free_delivery,
-            "images": [
-                {"src": image.image.url, "alt": image.alt_text}
-                for image in product.images.all()
-            ],
-            "tags": [tag.name for tag in product.tags.all()],
-            "reviews": [
-                {
-                    "author": review.author,
-                    "email": review.email,
-                    "text": review.text,
-                    "rate": review.rate,
-                    "date": review.date.strftime("%Y-%m-%d %H:%M"),
-                }
-                for review in product.reviews.all()
-            ],
-        }
-        return JsonResponse(response_data, status=200)
+        product = get_object_or_404(product_item_queryset(), id=id)
+        return JsonResponse(serialize_product_item(product), status=200)
     except Http404:
         return JsonResponse({"error": "Product not found"}, status=404)
 
 
+def serialize_product_item(product):
+    # Формирование ответа
+    return {
+        "id": product.id,
+        "category": product.category_id,
+        "price": product.effective_price,
+        "originalPrice": product.price,
+        "salePrice": product.effective_price if product.on_sale else None,
+        "count": product.count,
+        "date": product.date_added,
+        "title": product.title,
+        "description": product.description,
+        "fullDescription": product.full_description,
+        "freeDelivery": product.free_delivery,
+        "images": [
+            serialize_image(image.image, image.alt_text)
+            for image in product.images.all()
+        ],
+        "tags": [tag.name for tag in product.tags.all()],
+        "reviews": [
+            {
+                "author": review.author,
+                "email": review.email,
+                "text": review.text,
+                "rate": review.rate,
+                # Выводится в шаблоне товара как есть
+                "date": review.date.strftime("%Y-%m-%d %H:%M"),
+            }
+            for review in product.reviews.all()
+        ],
+    }
+
+
 def post_product_review(request, id):
     if request.method == "POST":
         try:
@@ -1,17 +1,17 @@
 # shop/views_profile.py.py
 import json
-import logging  # noqa: F401
+import logging
 
 from django.contrib.auth import login
 from django.contrib.auth.hashers import check_password
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
-from django.http import JsonResponse
 
 from .models import Profile
+from .responses import JsonResponse
 from .serializers import ProfileSerializer
 
-# logger = logging.getLogger('custom_logger')
+logger = logging.getLogger(__name__)
 
 
 def profile_view(request):
@@ -28,18 +28,17 @@ def get_profile(request):
         try:
             profile, created = Profile.objects.get_or_create(user=request.user)
             if created:
-                print(f"Profile created for user: {request.user.username}")
+                logger.info("Profile created for user %s", request.user.username)
 
             serializer = ProfileSerializer(profile, context={"request": request})
             serialized_data = serializer.data
             return JsonResponse(serialized_data)
-        except Exception as e:
-            print(f"Error: {e}")
+        except Exception:
+            logger.exception("Error while fetching the profile")
             return JsonResponse(
                 {"error": "An error occurred while fetching the profile"}, status=500
             )
     else:
-        print("Error: User not authenticated")
         return JsonResponse({"error": "User not authenticated"}, status=401)
 
 
@@ -71,9 +70,7 @@ def post_profile_avatar(request):
 def post_profile(request):
     if request.method == "POST":
         try:
-            print("Request body:", request.body)
             data = json.loads(request.body)
-            print("Parsed data:", data)
 
             fullName = data.get("fullName", "").strip()
             email = data.get("email", "").strip()
@@ -93,7 +90,7 @@ def post_profile(request):
             if unique_errors:
                 errors.update(unique_errors)
             if errors:
-                print("Validation errors:", errors)
+                logger.info("Profile validation errors: %s", errors)
                 return JsonResponse({"errors": errors}, status=400)
             profile, created = Profile.objects.get_or_create(
                 user=request.user,
@@ -112,7 +109,6 @@ def post_profile(request):
             return JsonResponse({"message": "Profile updated successfully"}, status=200)
 
         except json.JSONDecodeError:
-            print("Error: Invalid JSON format")
             return JsonResponse({"error": "Invalid JSON"}, status=400)
     else:
         return JsonResponse({"error": "Invalid HTTP method"}, status=405)
@@ -120,13 +116,10 @@ def post_profile(request):
 
 def post_profile_password(request):
     if request.method == "POST":
-        print("Смена пароля ")
         try:
             data = json.loads(request.body)
             current_password = data.get("currentPassword")
-            print("current Password: ", current_password)
             new_password = data.get("newPassword")
-            print("new_password ", new_password)
 
             if not current_password or not new_password:
                 return JsonResponse(
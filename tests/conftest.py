@@ -0,0 +1,97 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.conf import settings as django_settings
+from django.core.cache import caches
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("shop benchmarks")
+    group.addoption(
+        "--benchmark-baseline",
+        help="JSON-замер manage.py benchmark_endpoints --output для сравнения",
+    )
+    group.addoption(
+        "--benchmark-threshold",
+        type=float,
+        default=0.2,
+        help="Допустимый рост p50/p99 относительно замера",
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # База откатывается между тестами без сигналов, поэтому кэш чистим явно
+    for cache in caches.all():
+        cache.clear()
+
+
+class FakeYooKassa(BaseHTTPRequestHandler):
+    """Отвечает на GET /v3/payments/<id> платежами из server.payments."""
+
+    def do_GET(self):
+        payment = self.server.payments.get(self.path.rsplit("/", 1)[-1])
+        self.server.lookups += 1
+        body = json.dumps(
+            payment or {"type": "error", "code": "not_found", "id": "1"}
+        ).encode()
+        self.send_response(200 if payment else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def yookassa_server(settings):
+    from shop.payments import configure_yookassa
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeYooKassa)
+    server.payments = {}
+    server.lookups = 0
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    api_url = settings.YOOKASSA["API_URL"]
+    settings.YOOKASSA = {
+        **settings.YOOKASSA,
+        "API_URL": f"http://127.0.0.1:{server.server_port}/v3",
+    }
+    configure_yookassa()
+    yield server
+    settings.YOOKASSA = {**settings.YOOKASSA, "API_URL": api_url}
+    configure_yookassa()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def yookassa_payment():
+    """Фабрика объектов платежа в формате API ЮKassa."""
+    return make_payment
+
+
+def make_payment(payment_id, status, order_id, account_id=None, reason=None):
+    payment = {
+        "id": payment_id,
+        "status": status,
+        "paid": status == "succeeded",
+        "amount": {"value": "200.00", "currency": "RUB"},
+        "recipient": {
+            "account_id": account_id or django_settings.YOOKASSA["ACCOUNT_ID"],
+            "gateway_id": "1",
+        },
+        "created_at": "2024-01-01T00:00:00.000Z",
+        "test": True,
+        "refundable": False,
+        "metadata": {"order_id": str(order_id)},
+    }
+    if reason:
+        payment["cancellation_details"] = {"party": "yoo_money", "reason": reason}
+    return payment
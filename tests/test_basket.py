@@ -0,0 +1,188 @@
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+import shop.basket
+from shop.basket import (
+    DIRTY_SEQ_KEY,
+    CacheBasket,
+    DatabaseBasket,
+    flush_dirty_baskets,
+    get_cache,
+    mark_dirty,
+)
+from shop.models import BasketItem, Product, Profile
+
+
+@pytest.fixture
+def cache_basket(settings):
+    settings.BASKET_STORAGE = {"BACKEND": "cache"}
+
+
+@pytest.fixture
+def products():
+    return [
+        Product.objects.create(
+            title=f"Product {index}",
+            price=100.0,
+            count=10,
+            description="Test description",
+            full_description="Test full description",
+        )
+        for index in range(3)
+    ]
+
+
+@pytest.fixture
+def user_client():
+    User.objects.create_user(username="testuser", password="securepassword")
+    client = APIClient()
+    client.login(username="testuser", password="securepassword")
+    return client
+
+
+@pytest.mark.django_db
+def test_cache_basket_writes_behind(cache_basket, user_client, products):
+    url = reverse("basket_view")
+    user_client.post(url, {"id": products[0].id, "count": 2}, format="json")
+    user_client.post(url, {"id": products[1].id, "count": 1}, format="json")
+    response = user_client.delete(
+        url, {"id": products[1].id, "count": 1}, format="json"
+    )
+
+    assert [item["id"] for item in response.json()] == [products[0].id]
+    assert not BasketItem.objects.exists()
+
+    out = StringIO()
+    call_command("flush_baskets", stdout=out)
+
+    assert "Записано корзин: 1" in out.getvalue()
+    assert list(BasketItem.objects.values_list("product_id", "quantity")) == [
+        (products[0].id, 2)
+    ]
+
+
+@pytest.mark.django_db
+def test_cache_basket_loads_from_database(cache_basket, user_client, products):
+    user = User.objects.get(username="testuser")
+    BasketItem.objects.create(user=user, product=products[0], quantity=3)
+    BasketItem.objects.create(user=user, product=products[1], quantity=1)
+
+    user_client.post(
+        reverse("basket_bulk"),
+        [{"id": products[1].id, "count": -1}, {"id": products[2].id, "count": 1}],
+        format="json",
+    )
+    assert flush_dirty_baskets() == 1
+
+    assert dict(BasketItem.objects.values_list("product_id", "quantity")) == {
+        products[0].id: 3,
+        products[2].id: 1,
+    }
+
+
+@pytest.mark.django_db
+def test_cache_basket_marks_user_dirty_once(cache_basket, products):
+    user = User.objects.create_user(username="testuser")
+    basket = CacheBasket.for_user(user)
+
+    basket.add(str(products[0].id), 1)
+    basket.add(products[0].id, 2)
+    basket.apply({str(products[1].id): 1})
+
+    assert basket.items() == {products[0].id: 3, products[1].id: 1}
+    assert get_cache().get(DIRTY_SEQ_KEY) == 1
+    assert flush_dirty_baskets() == 1
+    assert flush_dirty_baskets() == 0
+
+    basket.remove(products[1].id, 1)
+    assert flush_dirty_baskets() == 1
+    assert dict(BasketItem.objects.values_list("product_id", "quantity")) == {
+        products[0].id: 3
+    }
+
+
+@pytest.mark.django_db
+def test_database_basket_apply_adds_to_concurrently_created_row(monkeypatch, products):
+    user = User.objects.create_user(username="testuser")
+    missing_products = shop.basket.missing_products
+
+    def create_concurrently(product_ids):
+        # Параллельный запрос создает строку после чтения существующих
+        BasketItem.objects.create(user=user, product=products[0], quantity=2)
+        return missing_products(product_ids)
+
+    monkeypatch.setattr(shop.basket, "missing_products", create_concurrently)
+
+    assert DatabaseBasket(user).apply({products[0].id: 3, products[1].id: 1})
+    assert DatabaseBasket(user).items() == {products[0].id: 5, products[1].id: 1}
+
+
+@pytest.mark.django_db
+def test_flush_skips_abandoned_dirty_log_slot(settings, cache_basket, products):
+    user = User.objects.create_user(username="testuser")
+    # Процесс упал между incr счетчика и записью ячейки журнала
+    get_cache().add(DIRTY_SEQ_KEY, 1, timeout=None)
+    CacheBasket.for_user(user).add(products[0].id, 1)
+
+    assert flush_dirty_baskets() == 0
+
+    settings.BASKET_STORAGE = {"BACKEND": "cache", "LOCK_TIMEOUT": 0}
+    assert flush_dirty_baskets() == 1
+    assert BasketItem.objects.get().product_id == products[0].id
+    mark_dirty([user.id])
+    assert flush_dirty_baskets() == 1
+
+
+@pytest.mark.django_db
+def test_session_basket_merges_on_sign_in(cache_basket, products):
+    user = User.objects.create_user(username="testuser", password="securepassword")
+    BasketItem.objects.create(user=user, product=products[0], quantity=1)
+    client = APIClient()
+    url = reverse("basket_view")
+
+    client.post(url, {"id": products[0].id, "count": 2}, format="json")
+    client.post(url, {"id": products[1].id, "count": 1}, format="json")
+    assert len(client.get(url).json()) == 2
+
+    response = client.post(
+        reverse("api_sign_in"),
+        json.dumps({"username": "testuser", "password": "securepassword"}),
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+
+    data = {item["id"]: item["count"] for item in client.get(url).json()}
+    assert data == {products[0].id: 3, products[1].id: 1}
+
+
+@pytest.mark.django_db
+def test_anonymous_basket_requires_cache_backend(products):
+    response = APIClient().post(
+        reverse("basket_view"), {"id": products[0].id, "count": 1}, format="json"
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_checkout_flushes_and_clears_cache_basket(cache_basket, user_client, products):
+    user = User.objects.get(username="testuser")
+    Profile.objects.create(user=user, fullName="Test User", email="test@example.com")
+    url = reverse("basket_view")
+    user_client.post(url, {"id": products[0].id, "count": 2}, format="json")
+
+    response = user_client.post(
+        reverse("orders_view"),
+        json.dumps([{"id": products[0].id, "count": 2}]),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    assert user_client.get(url).json() == []
+    assert flush_dirty_baskets() == 0
+    assert not BasketItem.objects.exists()
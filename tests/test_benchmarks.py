@@ -0,0 +1,127 @@
+# tests/test_benchmarks.py
+import json
+
+import pytest
+from django.core.management import call_command
+from django.urls import get_resolver
+
+from shop.endpoint_benchmarks import (
+    ENDPOINTS,
+    EXCLUDED_ROUTES,
+    check_budgets,
+    compare_with_baseline,
+    run_benchmarks,
+    seed_dataset,
+)
+
+
+@pytest.fixture
+def dataset():
+    return seed_dataset(products=60, reviews_per_product=2, basket_items=50)
+
+
+def test_every_api_route_is_benchmarked():
+    routes = {
+        pattern.name
+        for pattern in get_resolver().url_patterns
+        if str(pattern.pattern).startswith("api/")
+    }
+    benchmarked = {endpoint["route"] for endpoint in ENDPOINTS}
+
+    assert routes - benchmarked - set(EXCLUDED_ROUTES) == set()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("endpoint", ENDPOINTS, ids=lambda endpoint: endpoint["name"])
+def test_query_budget(endpoint, dataset):
+    results = run_benchmarks(dataset, [endpoint], iterations=1, warmup=0)
+
+    assert check_budgets(results) == []
+
+
+@pytest.mark.django_db
+def test_against_baseline(request):
+    """pytest --benchmark-baseline=baseline.json: регрессии относительно замера."""
+    path = request.config.getoption("--benchmark-baseline")
+    if not path:
+        pytest.skip("--benchmark-baseline не задан")
+    with open(path) as file:
+        baseline = json.load(file)
+    problems = []
+    for label, entry in baseline.items():
+        context = seed_dataset(**entry["dataset"])
+        results = run_benchmarks(
+            context, iterations=entry["iterations"], cold=entry["cold"]
+        )
+        problems += [
+            f"{label}: {problem}"
+            for problem in check_budgets(results)
+            + compare_with_baseline(
+                results,
+                entry["endpoints"],
+                request.config.getoption("--benchmark-threshold"),
+            )
+        ]
+
+    assert problems == []
+
+
+def test_compare_with_baseline():
+    baseline = {"catalog": {"queries": 4, "p50_ms": 10.0, "p99_ms": 20.0}}
+    results = {"catalog": {"queries": 5, "p50_ms": 11.0, "p99_ms": 30.0}}
+
+    assert compare_with_baseline(results, baseline, threshold=0.2) == [
+        "catalog: 4 -> 5 queries",
+        "catalog: p99_ms 20.0 -> 30.0",
+    ]
+
+
+@pytest.mark.django_db
+def test_benchmark_endpoints_command(tmp_path):
+    output = tmp_path / "baseline.json"
+
+    call_command(
+        "benchmark_endpoints",
+        "--products=60",
+        "--reviews=1",
+        "--basket-items=20",
+        "--iterations=2",
+        "--warmup=0",
+        "--endpoint=catalog",
+        "--endpoint=basket",
+        f"--output={output}",
+    )
+
+    report = json.loads(output.read_text())
+    entry = report["products=60,reviews=1,basket=20"]
+    assert set(entry["endpoints"]) == {"catalog", "basket"}
+    assert entry["endpoints"]["catalog"]["queries"] <= 4
+    # Данные замера откатываются
+    call_command(
+        "benchmark_endpoints",
+        "--products=60",
+        "--reviews=1",
+        "--basket-items=20",
+        "--iterations=2",
+        "--warmup=0",
+        "--endpoint=catalog",
+        f"--compare={output}",
+        "--threshold=100",
+    )
+
+
+def test_json_benchmarks_encode_same_payload(tmp_path):
+    from shop.json_benchmarks import ENCODERS, make_cards
+
+    cards = make_cards(5)
+    stdlib, fast = (json.loads(encode(cards)) for encode in ENCODERS.values())
+    assert [card["price"] for card in stdlib] == [card["price"] for card in fast]
+    assert fast[0]["date"] == cards[0]["date"].isoformat()
+
+    output = tmp_path / "json.json"
+    call_command(
+        "benchmark_json", "--sizes", "20", "100", "--iterations=3", f"--output={output}"
+    )
+    results = json.loads(output.read_text())
+    assert [row["cards"] for row in results] == [20, 100]
+    assert all(row["orjson"]["bytes"] > 0 for row in results)
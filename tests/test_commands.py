@@ -0,0 +1,66 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from shop.models import Category, OrderItem, Product, Profile, Review
+
+
+@pytest.mark.django_db
+def test_explain_catalog_queries_reports_every_query():
+    out = StringIO()
+    call_command("explain_catalog_queries", "--no-analyze", stdout=out)
+    output = out.getvalue()
+
+    assert "catalog: category + date" in output
+    assert "orders: user + status" in output
+    assert "Запросов без индекса" in output
+
+
+SEED_ARGS = [
+    "--products=300",
+    "--category-depth=2",
+    "--category-breadth=3",
+    "--reviews-per-product=4",
+    "--tags=10",
+    "--users=20",
+    "--orders=50",
+    "--chunk-size=100",
+]
+
+
+@pytest.mark.django_db
+def test_seed_shop_generates_consistent_data():
+    out = StringIO()
+    call_command("seed_shop", *SEED_ARGS, stdout=out)
+
+    assert Product.objects.count() == 300
+    assert Category.objects.count() == 3 + 9
+    assert not Product.objects.filter(category__subcategories__isnull=False).exists()
+    assert OrderItem.objects.values("order").distinct().count() == 50
+    assert Profile.objects.count() == User.objects.count() == 20
+    # Рейтинг записан при генерации и совпадает с пересчетом по отзывам
+    stats = list(
+        Product.objects.order_by("id").values_list("reviews_count", "rating_sum")
+    )
+    Product.objects.refresh_rating_stats()
+    assert stats == list(
+        Product.objects.order_by("id").values_list("reviews_count", "rating_sum")
+    )
+    assert sum(count for count, _ in stats) == Review.objects.count()
+    assert "строк/с" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_seed_shop_is_reproducible():
+    call_command("seed_shop", *SEED_ARGS, stdout=StringIO())
+    first = list(Product.objects.order_by("id").values_list("title", "price", "count"))
+    Product.objects.all().delete()
+
+    call_command("seed_shop", *SEED_ARGS, "--no-copy", stdout=StringIO())
+
+    assert (
+        list(Product.objects.order_by("id").values_list("title", "price", "count"))
+        == first
+    )
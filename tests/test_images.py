@@ -0,0 +1,190 @@
+import io
+from io import StringIO
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client
+from PIL import Image
+
+from shop.images import derivative_formats, get_image_derivative_options
+from shop.models import Product, ProductImage
+from shop.product_cards import serialize_product_cards
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.IMAGE_DERIVATIVES = {**settings.IMAGE_DERIVATIVES, "BACKGROUND": False}
+    return tmp_path
+
+
+@pytest.fixture
+def product():
+    return Product.objects.create(
+        title="Camera", price=100, count=5, description="d", full_description="f"
+    )
+
+
+def make_upload(size, name="photo.jpg"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color="blue").save(buffer, format="JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+def srcset_urls(source):
+    return [item.rsplit(" ", 1)[0] for item in source["srcset"].split(", ")]
+
+
+@pytest.mark.django_db
+def test_derivatives_are_built_after_commit(
+    media, product, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        image = ProductImage.objects.create(
+            product=product, image=make_upload((1000, 500))
+        )
+
+    formats = derivative_formats(get_image_derivative_options())
+    assert formats
+    for fmt in formats:
+        for width in (200, 400, 800):
+            name = f"derivatives/{image.image.name}/{width}.{fmt}"
+            assert default_storage.exists(name)
+            with default_storage.open(name) as f:
+                derivative = Image.open(f)
+                assert derivative.format == fmt.upper()
+                assert derivative.size == (width, width // 2)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        image.delete()
+    assert not default_storage.exists(f"derivatives/{image.image.name}/400.webp")
+
+
+@pytest.mark.django_db
+def test_shared_upload_keeps_derivatives_until_last_row(
+    media, product, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        first = ProductImage.objects.create(
+            product=product, image=make_upload((1000, 500))
+        )
+        second = ProductImage.objects.create(
+            product=product, image=make_upload((1000, 500))
+        )
+    assert first.image.name == second.image.name
+    derivative = f"derivatives/{first.image.name}/400.webp"
+    assert default_storage.exists(derivative)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.delete()
+    assert default_storage.exists(derivative)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        second.delete()
+    assert not default_storage.exists(derivative)
+
+
+@pytest.mark.django_db
+def test_small_images_are_not_upscaled(
+    media, product, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        image = ProductImage.objects.create(
+            product=product, image=make_upload((300, 150))
+        )
+
+    assert image.image_width == 300
+    # Только ширины меньше оригинала и сам оригинал, без копий под 400 и 800
+    prefix = f"derivatives/{image.image.name}"
+    assert sorted(default_storage.listdir(prefix)[1]) == sorted(
+        f"{width}.{fmt}"
+        for width in (200, 300)
+        for fmt in derivative_formats(get_image_derivative_options())
+    )
+    with default_storage.open(f"{prefix}/300.webp") as f:
+        assert Image.open(f).size == (300, 150)
+
+    card_image = serialize_product_cards(Product.objects.all())[0]["images"][0]
+    webp = next(s for s in card_image["sources"] if s["type"] == "image/webp")
+    assert (
+        webp["srcset"]
+        == f"/media/{prefix}/200.webp 200w, /media/{prefix}/300.webp 300w"
+    )
+    assert Client().get(f"/media/{prefix}/400.webp").status_code == 404
+
+
+@pytest.mark.django_db
+def test_product_card_exposes_srcset(media, product):
+    image = ProductImage.objects.create(
+        product=product, image=make_upload((1000, 500)), alt_text="Front"
+    )
+
+    card_image = serialize_product_cards(Product.objects.all())[0]["images"][0]
+
+    assert card_image["src"] == image.image.url
+    assert card_image["alt"] == "Front"
+    types = [source["type"] for source in card_image["sources"]]
+    assert "image/webp" in types
+    webp = card_image["sources"][types.index("image/webp")]
+    assert srcset_urls(webp) == [
+        f"/media/derivatives/{image.image.name}/{width}.webp"
+        for width in (200, 400, 800)
+    ]
+    assert webp["srcset"].endswith(" 800w")
+
+
+@pytest.mark.django_db
+def test_missing_derivative_is_built_on_request(media, product):
+    # Без выполнения on_commit производных нет
+    image = ProductImage.objects.create(product=product, image=make_upload((1000, 500)))
+    name = f"derivatives/{image.image.name}/400.webp"
+    assert not default_storage.exists(name)
+
+    response = Client().get(f"/media/{name}")
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "image/webp"
+    assert "immutable" in response["Cache-Control"]
+    assert Image.open(io.BytesIO(b"".join(response.streaming_content))).width == 400
+    assert default_storage.exists(name)
+    # Остальные варианты строятся только по запросу
+    assert not default_storage.exists(f"derivatives/{image.image.name}/200.webp")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "path",
+    [
+        "derivatives/Product_images/photo.jpg/123.webp",
+        "derivatives/Product_images/photo.jpg/400.gif",
+        "derivatives/Product_images/missing.jpg/400.webp",
+        "derivatives/../secret.jpg/400.webp",
+    ],
+)
+def test_invalid_derivative_requests_return_404(media, path):
+    response = Client().get(f"/media/{path}")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_build_image_derivatives_command_reports_cost(media, product):
+    ProductImage.objects.create(product=product, image=make_upload((1000, 500)))
+    ProductImage.objects.create(
+        product=product, image=make_upload((600, 600), name="other.jpg")
+    )
+    variants = 3 * len(derivative_formats(get_image_derivative_options()))
+
+    out = StringIO()
+    call_command("build_image_derivatives", stdout=out)
+    output = out.getvalue()
+
+    assert "Изображений: 2, ошибок: 0" in output
+    assert f"Построено производных: {2 * variants}, уже были: 0" in output
+    assert "Процессорное время" in output
+
+    out = StringIO()
+    call_command("build_image_derivatives", stdout=out)
+    assert f"Построено производных: 0, уже были: {2 * variants}" in out.getvalue()
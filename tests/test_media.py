@@ -0,0 +1,111 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client
+
+from shop.storage import name_hash
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.MEDIA_SERVING = {**settings.MEDIA_SERVING, "BACKEND": "python"}
+    return tmp_path
+
+
+@pytest.fixture
+def stored(media):
+    return default_storage.save("docs/manual.bin", ContentFile(CONTENT))
+
+
+def test_uploads_get_content_hash_and_are_deduplicated(stored):
+    assert stored.startswith("docs/manual.")
+    assert name_hash(stored)
+    assert default_storage.save("docs/manual.bin", ContentFile(CONTENT)) == stored
+    other = default_storage.save("docs/manual.bin", ContentFile(b"other"))
+    assert other != stored
+
+
+def test_hashed_file_is_served_with_immutable_cache_headers(stored):
+    response = Client().get(f"/media/{stored}")
+
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == CONTENT
+    assert response["Accept-Ranges"] == "bytes"
+    assert response["ETag"] == f'"{name_hash(stored)}"'
+    assert response["Cache-Control"] == "public, max-age=31536000, immutable"
+
+    response = Client().get(f"/media/{stored}", HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304
+
+
+def test_unhashed_file_gets_short_max_age(media):
+    (media / "legacy.txt").write_bytes(b"legacy")
+
+    response = Client().get("/media/legacy.txt")
+
+    assert response.status_code == 200
+    assert response["Cache-Control"] == "public, max-age=3600"
+    assert response["Content-Type"].startswith("text/plain")
+
+
+@pytest.mark.parametrize(
+    "header, status, content_range, body",
+    [
+        ("bytes=0-9", 206, "bytes 0-9/1024", CONTENT[:10]),
+        ("bytes=1000-", 206, "bytes 1000-1023/1024", CONTENT[1000:]),
+        ("bytes=-4", 206, "bytes 1020-1023/1024", CONTENT[-4:]),
+        ("bytes=2000-", 416, "bytes */1024", b""),
+        ("bytes=0-1,5-6", 200, None, CONTENT),
+    ],
+)
+def test_range_requests(stored, header, status, content_range, body):
+    response = Client().get(f"/media/{stored}", HTTP_RANGE=header)
+
+    assert response.status_code == status
+    assert response.get("Content-Range") == content_range
+    content = (
+        b"".join(response.streaming_content) if response.streaming else response.content
+    )
+    assert content == body
+    if status == 206:
+        assert response["Content-Length"] == str(len(body))
+
+
+def test_if_range_with_stale_etag_returns_whole_file(stored):
+    response = Client().get(
+        f"/media/{stored}", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"'
+    )
+
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == CONTENT
+
+
+@pytest.mark.parametrize(
+    "backend, header",
+    [("x-accel-redirect", "X-Accel-Redirect"), ("x-sendfile", "X-Sendfile")],
+)
+def test_proxy_backends_delegate_file_transfer(settings, stored, backend, header):
+    settings.MEDIA_SERVING = {**settings.MEDIA_SERVING, "BACKEND": backend}
+
+    response = Client().get(f"/media/{stored}")
+
+    assert response.status_code == 200
+    assert response.content == b""
+    if backend == "x-accel-redirect":
+        assert response[header] == f"/protected-media/{stored}"
+    else:
+        assert response[header] == str(settings.MEDIA_ROOT / stored)
+    assert response["Cache-Control"].endswith("immutable")
+    assert response["ETag"]
+
+
+@pytest.mark.parametrize("path", ["missing.jpg", "../outside.txt", "docs"])
+def test_missing_or_unsafe_paths_return_404(media, path):
+    (media / "docs").mkdir(exist_ok=True)
+
+    response = Client().get(f"/media/{path}")
+
+    assert response.status_code == 404
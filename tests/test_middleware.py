@@ -0,0 +1,183 @@
+# tests/test_middleware.py
+import io
+import json
+import logging
+import sys
+
+import pytest
+from django.http import JsonResponse
+from django.test import Client
+from django.urls import path, reverse
+
+from shop.instrumentation import collect_stats, view_frame
+from shop.log_handlers import JsonFormatter, QueueStreamHandler
+from shop.middleware import redact_headers
+from shop.models import Category
+
+
+def n_plus_one_view(request):
+    names = [category.name for category in Category.objects.all()[:1]]
+    for _ in range(3):
+        names.append(Category.objects.filter(id=0).first())
+    return JsonResponse({"count": len(names)})
+
+
+urlpatterns = [path("n-plus-one", n_plus_one_view)]
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def access_log():
+    handler = ListHandler()
+    logger = logging.getLogger("shop.access")
+    logger.addHandler(handler)
+    yield handler.records
+    logger.removeHandler(handler)
+
+
+@pytest.mark.django_db
+def test_access_log_entry(access_log, settings):
+    settings.ACCESS_LOG = {"HEADERS": ["User-Agent", "Cookie"]}
+    Category.objects.create(name="Category")
+
+    response = Client().get(
+        reverse("get_categories"), HTTP_USER_AGENT="pytest", HTTP_COOKIE="a=b"
+    )
+
+    (record,) = access_log
+    fields = record.fields
+    assert fields["method"] == "GET"
+    assert fields["route"] == "get_categories"
+    assert fields["status"] == 200
+    assert fields["db_queries"] >= 1
+    assert fields["response_size"] == len(response.content)
+    assert fields["headers"] == {"User-Agent": "pytest", "Cookie": "[redacted]"}
+
+
+@pytest.mark.django_db
+def test_access_log_sampling(access_log, settings):
+    settings.ACCESS_LOG = {"SAMPLE_RATE": 0}
+
+    Client().get(reverse("get_categories"))
+
+    assert access_log == []
+
+
+def test_redact_headers_all():
+    headers = {"Authorization": "Token secret", "Accept": "*/*"}
+
+    assert redact_headers(headers, "*", {"authorization"}) == {
+        "Authorization": "[redacted]",
+        "Accept": "*/*",
+    }
+
+
+def test_queue_handler_writes_json_lines():
+    stream = io.StringIO()
+    handler = QueueStreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger("tests.queue")
+    logger.addHandler(handler)
+    try:
+        logger.warning("Заказ %s", 1, extra={"fields": {"order_id": 1}})
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Заказ 1"
+    assert (entry["level"], entry["order_id"]) == ("WARNING", 1)
+
+
+def test_queue_handler_leaves_record_for_other_handlers():
+    handler = QueueStreamHandler(io.StringIO())
+    record = logging.LogRecord(
+        "tests.queue", logging.ERROR, __file__, 1, "Заказ %s", (1,), None
+    )
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record.exc_info = sys.exc_info()
+    try:
+        prepared = handler.prepare(record)
+    finally:
+        handler.close()
+
+    assert (prepared.msg, prepared.args, prepared.exc_info) == ("Заказ 1", None, None)
+    assert "ValueError: boom" in prepared.exc_text
+    assert (record.msg, record.args) == ("Заказ %s", (1,))
+    assert record.exc_info[0] is ValueError
+
+
+@pytest.mark.django_db
+def test_server_timing_header(settings):
+    settings.SERVER_TIMING = {"DEBUG_HEADERS": True}
+    Category.objects.create(name="Category")
+    client = Client()
+
+    client.get(reverse("get_categories"))
+    response = client.get(reverse("get_categories"))
+
+    metrics = dict(
+        part.strip().split(";", 1) for part in response["Server-Timing"].split(",")
+    )
+    assert set(metrics) == {"db", "cache", "app", "total"}
+    # Второй ответ отдан из кэша: попадание есть, SQL нет
+    assert '"0 queries"' in metrics["db"]
+    assert 'miss=0"' in metrics["cache"]
+    assert response["X-Query-Count"] == "0"
+
+
+@pytest.mark.django_db
+def test_server_timing_sampled_out(settings):
+    settings.SERVER_TIMING = {"SAMPLE_RATE": 0, "DEBUG_HEADERS": True}
+
+    response = Client().get(reverse("get_categories"))
+
+    assert "Server-Timing" not in response
+    assert "X-Query-Count" not in response
+
+
+@pytest.mark.django_db
+@pytest.mark.urls("test_middleware")
+def test_duplicate_queries_are_reported(settings, caplog):
+    settings.SERVER_TIMING = {"DEBUG_HEADERS": True, "DUPLICATE_QUERY_THRESHOLD": 3}
+    logger = logging.getLogger("shop.middleware")
+    logger.addHandler(handler := ListHandler())
+    try:
+        response = Client().get("/n-plus-one")
+    finally:
+        logger.removeHandler(handler)
+
+    assert response["X-Query-Count"] == "4"
+    assert response["X-Duplicate-Queries"] == "1"
+    (record,) = handler.records
+    assert record.fields["count"] == 3
+
+
+def test_view_frame_points_at_views_module():
+    code = compile("def view():\n    return view_frame()\n", "shop/views_x.py", "exec")
+    namespace = {"view_frame": lambda: view_frame()}
+    exec(code, namespace)
+
+    assert namespace["view"]() == "views_x.py:2 in view"
+
+
+@pytest.mark.django_db
+def test_collect_stats_nested_calls_share_counters():
+    with collect_stats() as outer:
+        with collect_stats(trace_sql=True) as inner:
+            list(Category.objects.all())
+            list(Category.objects.all())
+
+    assert inner is outer
+    assert outer.queries == 2
+    assert outer.duplicates(2)[0][1] == 2
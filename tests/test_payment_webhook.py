@@ -0,0 +1,158 @@
+# tests/test_payment_webhook.py
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.models import Order, OrderItem, PaymentNotification, Product, StockReservation
+from shop.stock import reserve_order_items
+
+
+@pytest.fixture
+def order():
+    user = User.objects.create_user(username="testuser", password="securepassword")
+    product = Product.objects.create(
+        title="Product", price=100, count=5, description="D", full_description="F"
+    )
+    order = Order.objects.create(
+        user=user,
+        total_cost=200,
+        full_name="Test User",
+        email="test@example.com",
+        delivery_type="standard",
+        payment_type="online",
+        city="City",
+        address="Address",
+        payment_id="pay_1",
+    )
+    items = [
+        OrderItem.objects.create(order=order, product=product, quantity=2, price=100)
+    ]
+    reserve_order_items(order, items)
+    return order
+
+
+def notify(payment, event, **extra):
+    body = {"type": "notification", "event": event, "object": payment}
+    return APIClient().post(
+        reverse("yookassa_webhook"),
+        json.dumps(body),
+        content_type="application/json",
+        **extra,
+    )
+
+
+@pytest.mark.django_db
+def test_webhook_marks_order_paid_once(yookassa_server, yookassa_payment, order):
+    payment = yookassa_payment("pay_1", "succeeded", order.id)
+    yookassa_server.payments["pay_1"] = payment
+
+    first = notify(payment, "payment.succeeded")
+    second = notify(payment, "payment.succeeded")
+
+    assert first.json() == {"status": "processed"}
+    assert second.json() == {"status": "duplicate"}
+    order.refresh_from_db()
+    assert order.status == "paid"
+    assert order.items.get().product.count == 3
+    assert not StockReservation.objects.filter(status="active").exists()
+    assert PaymentNotification.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_webhook_matches_order_by_metadata(yookassa_server, yookassa_payment, order):
+    Order.objects.filter(id=order.id).update(payment_id=None)
+    payment = yookassa_payment("pay_2", "succeeded", order.id)
+    yookassa_server.payments["pay_2"] = payment
+
+    assert notify(payment, "payment.succeeded").status_code == 200
+    order.refresh_from_db()
+    assert (order.status, order.payment_id) == ("paid", "pay_2")
+
+
+@pytest.mark.django_db
+def test_webhook_records_cancellation(yookassa_server, yookassa_payment, order):
+    payment = yookassa_payment("pay_1", "canceled", order.id, reason="card_expired")
+    yookassa_server.payments["pay_1"] = payment
+
+    assert notify(payment, "payment.canceled").status_code == 200
+    order.refresh_from_db()
+    assert (order.status, order.payment_error) == ("pending", "card_expired")
+    assert order.reservations.get().status == "released"
+
+
+@pytest.mark.django_db
+def test_webhook_rejects_forged_status(yookassa_server, yookassa_payment, order):
+    yookassa_server.payments["pay_1"] = yookassa_payment("pay_1", "pending", order.id)
+
+    response = notify(
+        yookassa_payment("pay_1", "succeeded", order.id), "payment.succeeded"
+    )
+
+    assert response.status_code == 400
+    order.refresh_from_db()
+    assert order.status == "pending"
+    assert not PaymentNotification.objects.exists()
+
+
+@pytest.mark.django_db
+def test_webhook_rejects_other_shop(yookassa_server, yookassa_payment, order):
+    payment = yookassa_payment("pay_1", "succeeded", order.id, account_id="999")
+    yookassa_server.payments["pay_1"] = payment
+
+    response = notify(payment, "payment.succeeded")
+
+    assert response.json() == {"error": "Unknown shop"}
+    assert yookassa_server.lookups == 0
+
+
+@pytest.mark.django_db
+def test_webhook_unknown_order_is_retried(yookassa_server, yookassa_payment, order):
+    payment = yookassa_payment("pay_9", "succeeded", 999)
+    yookassa_server.payments["pay_9"] = payment
+
+    assert notify(payment, "payment.succeeded").status_code == 404
+    # Событие не записано, поэтому повторное уведомление будет обработано
+    assert not PaymentNotification.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "extra, status",
+    [
+        # ЮKassa напрямую
+        ({"REMOTE_ADDR": "185.71.76.1"}, 200),
+        ({"REMOTE_ADDR": "203.0.113.5"}, 403),
+        # ЮKassa через прокси
+        ({"REMOTE_ADDR": "127.0.0.1", "HTTP_X_FORWARDED_FOR": "185.71.76.1"}, 200),
+        # Клиент подставил адрес ЮKassa в начало X-Forwarded-For
+        (
+            {
+                "REMOTE_ADDR": "127.0.0.1",
+                "HTTP_X_FORWARDED_FOR": "185.71.76.1, 203.0.113.5",
+            },
+            403,
+        ),
+        # Адрес ЮKassa в заголовке от недоверенного отправителя
+        ({"REMOTE_ADDR": "203.0.113.5", "HTTP_X_FORWARDED_FOR": "185.71.76.1"}, 403),
+        ({"REMOTE_ADDR": "127.0.0.1", "HTTP_X_FORWARDED_FOR": "unknown"}, 403),
+    ],
+)
+def test_webhook_checks_sender_ip(
+    settings, yookassa_server, yookassa_payment, order, extra, status
+):
+    settings.YOOKASSA = {
+        **settings.YOOKASSA,
+        "CHECK_WEBHOOK_IP": True,
+        "TRUSTED_PROXIES": ["127.0.0.1"],
+    }
+    payment = yookassa_payment("pay_1", "succeeded", order.id)
+    yookassa_server.payments["pay_1"] = payment
+
+    response = notify(payment, "payment.succeeded", **extra)
+
+    assert response.status_code == status
+    order.refresh_from_db()
+    assert (order.status == "paid") == (status == 200)
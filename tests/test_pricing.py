@@ -0,0 +1,121 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from shop.models import Product, Sale
+
+
+@pytest.fixture
+def create_product():
+    def _create_product(title="Product", price=Decimal("100.00")):
+        return Product.objects.create(
+            title=title,
+            price=price,
+            count=10,
+            description="Description",
+            full_description="Full description",
+        )
+
+    return _create_product
+
+
+def make_sale(product, days=3):
+    today = datetime.date.today()
+    return Sale.objects.create(
+        product=product,
+        sale_price=Decimal("60.00"),
+        date_from=today,
+        date_to=today + datetime.timedelta(days=days),
+    )
+
+
+def prices(product):
+    product.refresh_from_db()
+    return product.effective_price, product.on_sale
+
+
+def rollover(*args):
+    out = StringIO()
+    call_command("rollover_sales", *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_effective_price_follows_sale_save_and_delete(create_product):
+    product = create_product()
+    assert prices(product) == (Decimal("100.00"), False)
+
+    sale = make_sale(product)
+    assert prices(product) == (Decimal("60.00"), True)
+
+    sale.sale_price = Decimal("55.00")
+    sale.save()
+    assert prices(product) == (Decimal("55.00"), True)
+
+    sale.delete()
+    assert prices(product) == (Decimal("100.00"), False)
+
+
+@pytest.mark.django_db
+def test_effective_price_follows_queryset_changes(create_product):
+    product, other = create_product(), create_product("Other")
+    make_sale(product)
+
+    Sale.objects.filter(product=product).update(product=other)
+    assert prices(product) == (Decimal("100.00"), False)
+    assert prices(other) == (Decimal("60.00"), True)
+
+    Sale.objects.all().delete()
+    assert prices(other) == (Decimal("100.00"), False)
+
+
+@pytest.mark.django_db
+def test_price_change_updates_effective_price(create_product):
+    product = create_product()
+    product.price = Decimal("120.00")
+    product.save()
+    assert prices(product) == (Decimal("120.00"), False)
+
+    make_sale(product)
+    Product.objects.filter(pk=product.pk).update(price=Decimal("90.00"))
+    assert prices(product) == (Decimal("60.00"), True)
+
+    Sale.objects.all().delete()
+    assert prices(product) == (Decimal("90.00"), False)
+
+
+@pytest.mark.django_db
+def test_rollover_applies_started_and_ended_sales_once(create_product):
+    today = datetime.date.today()
+    ending, starting = create_product("Ending"), create_product("Starting")
+    make_sale(ending, days=0)
+    # Скидка начинается завтра, а первая заканчивается сегодня
+    sale = make_sale(starting)
+    Sale.objects.filter(pk=sale.pk).update(date_from=today + datetime.timedelta(days=1))
+    assert prices(starting) == (Decimal("100.00"), False)
+
+    tomorrow = (today + datetime.timedelta(days=1)).isoformat()
+    assert rollover("--date", tomorrow) == "Обновлено товаров: 2\n"
+    assert prices(ending) == (Decimal("100.00"), False)
+    assert prices(starting) == (Decimal("60.00"), True)
+
+    assert rollover("--date", tomorrow) == "Обновлено товаров: 0\n"
+
+
+@pytest.mark.django_db
+def test_rollover_fixes_stale_rows(create_product):
+    product = create_product()
+    make_sale(product)
+    Product.objects.filter(pk=product.pk).update(on_sale=False)
+
+    assert rollover() == "Обновлено товаров: 1\n"
+    assert prices(product) == (Decimal("60.00"), True)
+    assert rollover() == "Обновлено товаров: 0\n"
+
+
+def test_rollover_rejects_fixed_date_in_loop():
+    with pytest.raises(CommandError):
+        rollover("--loop", "--date", datetime.date.today().isoformat())
@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.models import BasketItem, Product, Review, Sale, Tag
+from shop.product_cards import get_product_cards, serialize_product_cards
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def create_products():
+    def _create_products(amount):
+        tag = Tag.objects.create(name="Tag")
+        products = []
+        for index in range(amount):
+            product = Product.objects.create(
+                title=f"Product {index}",
+                price=100.0 + index,
+                count=5,
+                description="Description",
+                full_description="Full description",
+            )
+            tag.products.add(product)
+            Review.objects.create(
+                product=product, author="A", email="a@example.com", text="T", rate=4
+            )
+            products.append(product)
+        return products
+
+    return _create_products
+
+
+@pytest.mark.django_db
+def test_cards_query_count_does_not_depend_on_size(
+    create_products, django_assert_num_queries
+):
+    products = create_products(5)
+    with django_assert_num_queries(3):
+        cards = serialize_product_cards(Product.objects.order_by("id"))
+    assert [card["id"] for card in cards] == [product.id for product in products]
+    assert cards[0]["reviews"] == 1
+    assert cards[0]["rating"] == 4.0
+    assert cards[0]["tags"] == [{"id": products[0].tags.get().id, "name": "Tag"}]
+
+
+@pytest.mark.django_db
+def test_cards_by_ids_keep_order_and_apply_sale(create_products):
+    first, second = create_products(2)
+    Sale.objects.create(
+        product=second,
+        sale_price=50.0,
+        date_from=datetime.date.today(),
+        date_to=datetime.date.today() + datetime.timedelta(days=1),
+    )
+    cards = get_product_cards([second.id, first.id, second.id])
+    assert list(cards) == [second.id, first.id]
+    assert cards[second.id]["price"] == 50.0
+    assert cards[first.id]["price"] == 100.0
+
+
+@pytest.mark.django_db
+def test_get_basket_query_count_is_fixed(
+    api_client, create_products, django_assert_max_num_queries
+):
+    user = User.objects.create_user(username="testuser", password="securepassword")
+    api_client.login(username="testuser", password="securepassword")
+    for product in create_products(10):
+        BasketItem.objects.create(user=user, product=product, quantity=1)
+
+    with django_assert_max_num_queries(8):
+        response = api_client.get(reverse("basket_view"))
+    assert response.status_code == 200
+    assert len(response.json()) == 10
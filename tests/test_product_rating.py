@@ -0,0 +1,86 @@
+import pytest
+from django.core.management import call_command
+
+from shop.models import Product, Review
+
+
+@pytest.fixture
+def create_product():
+    def _create_product(title="Product"):
+        return Product.objects.create(
+            title=title,
+            price=100.0,
+            count=10,
+            description="Description",
+            full_description="Full description",
+        )
+
+    return _create_product
+
+
+def make_review(product, rate):
+    return Review(
+        product=product, author="Author", email="a@example.com", text="Text", rate=rate
+    )
+
+
+@pytest.mark.django_db
+def test_rating_updated_on_review_create_and_delete(create_product):
+    product = create_product()
+    make_review(product, 5).save()
+    review = make_review(product, 2)
+    review.save()
+
+    product.refresh_from_db()
+    assert product.reviews_count == 2
+    assert product.rating_sum == 7
+    assert product.rating == 3.5
+
+    review.delete()
+    product.refresh_from_db()
+    assert product.reviews_count == 1
+    assert product.rating == 5.0
+
+    Review.objects.filter(product=product).delete()
+    product.refresh_from_db()
+    assert (product.reviews_count, product.rating_sum, product.rating) == (0, 0, 0.0)
+
+
+@pytest.mark.django_db
+def test_rating_updated_on_bulk_create_and_update(create_product):
+    first, second = create_product("First"), create_product("Second")
+    Review.objects.bulk_create(
+        [make_review(first, 4), make_review(first, 2), make_review(second, 3)]
+    )
+    first.refresh_from_db()
+    assert (first.reviews_count, first.rating) == (2, 3.0)
+
+    Review.objects.filter(product=first).update(rate=5)
+    first.refresh_from_db()
+    assert first.rating == 5.0
+
+
+@pytest.mark.django_db
+def test_product_save_does_not_overwrite_rating(create_product):
+    product = create_product()
+    stale = Product.objects.get(pk=product.pk)
+    make_review(product, 4).save()
+
+    stale.count = 3
+    stale.save()
+    product.refresh_from_db()
+    assert product.count == 3
+    assert product.reviews_count == 1
+
+
+@pytest.mark.django_db
+def test_rebuild_product_ratings_command(create_product):
+    product = create_product()
+    make_review(product, 4).save()
+    Product.objects.filter(pk=product.pk).update(
+        rating=0.0, reviews_count=0, rating_sum=0
+    )
+
+    call_command("rebuild_product_ratings")
+    product.refresh_from_db()
+    assert (product.reviews_count, product.rating_sum, product.rating) == (1, 4, 4.0)
@@ -0,0 +1,137 @@
+# tests/test_reconciliation.py
+import datetime
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from shop.models import Order, OrderItem, Product, StockReservation
+from shop.reconciliation import Checkpoint, reconcile_payments
+from shop.stock import reserve_order_items
+
+NOW = datetime.timedelta(0)
+
+
+@pytest.fixture
+def make_order():
+    user = User.objects.create_user(username="testuser", password="securepassword")
+    product = Product.objects.create(
+        title="Product", price=100, count=10, description="D", full_description="F"
+    )
+
+    def make(payment_id):
+        order = Order.objects.create(
+            user=user,
+            total_cost=200,
+            full_name="Test User",
+            email="test@example.com",
+            delivery_type="standard",
+            payment_type="online",
+            city="City",
+            address="Address",
+            payment_id=payment_id,
+        )
+        items = [
+            OrderItem.objects.create(
+                order=order, product=product, quantity=2, price=100
+            )
+        ]
+        reserve_order_items(order, items)
+        return order
+
+    return make
+
+
+@pytest.mark.django_db
+def test_reconcile_applies_final_statuses(
+    yookassa_server, yookassa_payment, make_order
+):
+    paid, canceled, waiting = (
+        make_order("pay_1"),
+        make_order("pay_2"),
+        make_order("pay_3"),
+    )
+    yookassa_server.payments.update(
+        pay_1=yookassa_payment("pay_1", "succeeded", paid.id),
+        pay_2=yookassa_payment("pay_2", "canceled", canceled.id, reason="card_expired"),
+        pay_3=yookassa_payment("pay_3", "pending", waiting.id),
+    )
+
+    stats = reconcile_payments(batch_size=2, concurrency=2, rate=0, min_age=NOW)
+
+    assert stats == {"checked": 3, "paid": 1, "canceled": 1, "errors": 0, "updated": 2}
+    assert Order.objects.get(id=paid.id).status == "paid"
+    assert paid.items.get().product.count == 8
+    assert not StockReservation.objects.filter(order=paid, status="active").exists()
+    assert Order.objects.get(id=canceled.id).payment_error == "card_expired"
+    assert canceled.reservations.get().status == "released"
+    assert Order.objects.get(id=waiting.id).payment_error is None
+
+
+@pytest.mark.django_db
+def test_reconcile_counts_gateway_errors(yookassa_server, make_order):
+    make_order("pay_missing")
+
+    stats = reconcile_payments(rate=0, min_age=NOW)
+
+    assert (stats["checked"], stats["errors"], stats["updated"]) == (1, 1, 0)
+
+
+@pytest.mark.django_db
+def test_reconcile_skips_recent_orders(yookassa_server, make_order):
+    make_order("pay_1")
+
+    assert reconcile_payments(rate=0)["checked"] == 0
+    assert yookassa_server.lookups == 0
+
+
+@pytest.mark.django_db
+def test_reconcile_dry_run_changes_nothing(
+    yookassa_server, yookassa_payment, make_order, tmp_path
+):
+    order = make_order("pay_1")
+    yookassa_server.payments["pay_1"] = yookassa_payment("pay_1", "succeeded", order.id)
+    path = tmp_path / "checkpoint.json"
+
+    stats = reconcile_payments(
+        rate=0, min_age=NOW, dry_run=True, checkpoint=Checkpoint(path)
+    )
+
+    assert (stats["paid"], stats["updated"]) == (1, 0)
+    assert Order.objects.get(id=order.id).status == "pending"
+    assert not path.exists()
+
+
+@pytest.mark.django_db
+def test_reconcile_resumes_from_checkpoint(
+    yookassa_server, yookassa_payment, make_order, tmp_path
+):
+    first, second = make_order("pay_1"), make_order("pay_2")
+    for order in (first, second):
+        yookassa_server.payments[order.payment_id] = yookassa_payment(
+            order.payment_id, "succeeded", order.id
+        )
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"last_id": first.id}))
+
+    stats = reconcile_payments(rate=0, min_age=NOW, checkpoint=Checkpoint(path))
+
+    assert stats["checked"] == 1
+    assert Order.objects.get(id=first.id).status == "pending"
+    assert Order.objects.get(id=second.id).status == "paid"
+    # Проход завершен: следующий начнется сначала
+    assert json.loads(path.read_text()) == {"last_id": 0}
+
+
+@pytest.mark.django_db
+def test_reconcile_payments_command(yookassa_server, yookassa_payment, make_order):
+    order = make_order("pay_1")
+    yookassa_server.payments["pay_1"] = yookassa_payment("pay_1", "succeeded", order.id)
+    Order.objects.filter(id=order.id).update(
+        created_at=order.created_at - datetime.timedelta(hours=1)
+    )
+
+    call_command("reconcile_payments", "--rate", "0")
+
+    assert Order.objects.get(id=order.id).status == "paid"
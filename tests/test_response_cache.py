@@ -0,0 +1,102 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from shop.models import Product, Tag
+from shop.response_cache import get_generation
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def create_product():
+    def _create_product(title, count=5):
+        return Product.objects.create(
+            title=title,
+            price=100.0,
+            count=count,
+            description="Description",
+            full_description="Full description",
+        )
+
+    return _create_product
+
+
+@pytest.mark.django_db
+def test_second_request_served_from_cache(
+    api_client, create_product, django_assert_num_queries
+):
+    create_product("Product 1")
+    url = reverse("get_products_limited")
+
+    first = api_client.get(url)
+    assert first["X-Cache"] == "MISS"
+    with django_assert_num_queries(0):
+        second = api_client.get(url)
+    assert second["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+
+
+@pytest.mark.django_db
+def test_model_change_invalidates_cache(api_client, create_product):
+    product = create_product("Product 1")
+    url = reverse("get_products_limited")
+    api_client.get(url)
+
+    product.title = "Renamed"
+    product.save()
+    response = api_client.get(url)
+
+    assert response["X-Cache"] == "MISS"
+    assert response.json()[0]["title"] == "Renamed"
+
+
+@pytest.mark.django_db
+def test_queryset_update_invalidates_cache(api_client, create_product):
+    product = create_product("Product 1")
+    url = reverse("get_products_limited")
+    api_client.get(url)
+
+    # update() не шлет сигналы: так списывается остаток оплаченного заказа
+    Product.objects.filter(pk=product.pk).update(count=2)
+    response = api_client.get(url)
+
+    assert response["X-Cache"] == "MISS"
+    assert response.json()[0]["count"] == 2
+
+
+@pytest.mark.django_db
+def test_tag_link_invalidates_cache(api_client, create_product):
+    tag = Tag.objects.create(name="Tag1")
+    url = reverse("get_tags")
+    api_client.get(url)
+
+    tag.products.add(create_product("Product 1"))
+    assert api_client.get(url)["X-Cache"] == "MISS"
+
+
+@pytest.mark.django_db
+def test_stale_response_served_while_refreshing(
+    api_client, create_product, settings, django_assert_num_queries
+):
+    settings.STOREFRONT_CACHE = {"TIMEOUT": 0, "STALE_TIMEOUT": 60}
+    create_product("Product 1")
+    url = reverse("get_products_limited")
+    api_client.get(url)
+    time.sleep(0.01)
+
+    # Пересчет уже идет в другом запросе
+    query_hash = "d41d8cd98f00b204e9800998ecf8427e"
+    key = f"storefront:products_limited:{get_generation(cache)}:{query_hash}"
+    cache.add(f"{key}:lock", 1)
+    with django_assert_num_queries(0):
+        response = api_client.get(url)
+
+    assert response["X-Cache"] == "STALE"
+    assert response.json()[0]["title"] == "Product 1"
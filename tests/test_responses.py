@@ -0,0 +1,43 @@
+# tests/test_responses.py
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+from django.utils.translation import gettext_lazy
+
+from shop.responses import JsonResponse
+
+
+def test_json_response_encodes_decimal_and_dates():
+    moment = datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+    response = JsonResponse(
+        {
+            "price": Decimal("19.90"),
+            "date": moment,
+            "day": moment.date(),
+            "label": gettext_lazy("Paid"),
+            "cards": {7: "seven"},
+        }
+    )
+
+    assert response["Content-Type"] == "application/json"
+    assert json.loads(response.content) == {
+        "price": 19.9,
+        "date": "2024-05-01T12:30:00+00:00",
+        "day": "2024-05-01",
+        "label": "Paid",
+        "cards": {"7": "seven"},
+    }
+
+
+def test_json_response_keeps_safe_and_status():
+    with pytest.raises(TypeError):
+        JsonResponse([1, 2])
+
+    response = JsonResponse([1, 2], safe=False, status=201)
+    assert response.status_code == 201
+    assert json.loads(response.content) == [1, 2]
+
+    with pytest.raises(TypeError):
+        JsonResponse({"value": object()})
@@ -0,0 +1,140 @@
+import datetime
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shop.models import Order, OrderItem, Product, StockReservation
+from shop.stock import annotate_available, commit_order_stock, reserve_order_items
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def create_reserved_order():
+    def _create_reserved_order(product, quantity, status="pending"):
+        user = User.objects.create_user(username=f"user{Order.objects.count()}")
+        order = Order.objects.create(
+            user=user,
+            full_name="Test User",
+            email="test@example.com",
+            delivery_type="standard",
+            payment_type="online",
+            total_cost=100.0,
+            city="Test City",
+            address="Test Address",
+            status=status,
+        )
+        item = OrderItem.objects.create(
+            order=order, product=product, quantity=quantity, price=product.price
+        )
+        reserve_order_items(order, [item])
+        return order
+
+    return _create_reserved_order
+
+
+@pytest.fixture
+def product():
+    return Product.objects.create(
+        title="Product",
+        price=100.0,
+        count=12,
+        description="Description",
+        full_description="Full description",
+    )
+
+
+def available(product):
+    return annotate_available(Product.objects.filter(pk=product.pk)).get().available
+
+
+@pytest.mark.django_db
+def test_active_reservations_reduce_available(product, create_reserved_order):
+    order = create_reserved_order(product, 5)
+    assert available(product) == 7
+
+    order.reservations.update(expires_at=timezone.now() - datetime.timedelta(1))
+    assert available(product) == 12
+
+
+@pytest.mark.django_db
+def test_commit_order_stock_is_idempotent(product, create_reserved_order):
+    order = create_reserved_order(product, 5)
+
+    commit_order_stock(order)
+    commit_order_stock(order)
+
+    product.refresh_from_db()
+    assert product.count == 7
+    assert available(product) == 7
+
+
+@pytest.mark.django_db
+def test_commit_rechecks_stock_for_expired_reservation(product, create_reserved_order):
+    order = create_reserved_order(product, 5)
+    order.reservations.update(expires_at=timezone.now() - datetime.timedelta(1))
+    create_reserved_order(product, 4)
+
+    assert commit_order_stock(order) == 1
+
+    product.refresh_from_db()
+    assert product.count == 7
+    assert order.payment_error is None
+
+
+@pytest.mark.django_db
+def test_commit_refuses_released_reservation_without_stock(
+    product, create_reserved_order
+):
+    order = create_reserved_order(product, 5)
+    order.reservations.update(status="released")
+    create_reserved_order(product, 10)
+
+    assert commit_order_stock(order) == 0
+
+    product.refresh_from_db()
+    order.refresh_from_db()
+    assert product.count == 12
+    assert order.payment_error == f"Not enough stock for products [{product.id}]"
+    assert order.reservations.get().status == "released"
+
+
+@pytest.mark.django_db
+def test_release_command_releases_expired_and_canceled(product, create_reserved_order):
+    expired = create_reserved_order(product, 1)
+    expired.reservations.update(expires_at=timezone.now() - datetime.timedelta(1))
+    create_reserved_order(product, 2, status="canceled")
+    kept = create_reserved_order(product, 3)
+
+    out = StringIO()
+    call_command("release_stock_reservations", stdout=out)
+
+    assert "2" in out.getvalue()
+    assert list(
+        StockReservation.objects.filter(status="active").values_list(
+            "order_id", flat=True
+        )
+    ) == [kept.id]
+
+
+@pytest.mark.django_db
+def test_limited_products_use_available_stock(
+    api_client, product, create_reserved_order
+):
+    url = reverse("get_products_limited")
+    assert api_client.get(url).json() == []
+
+    create_reserved_order(product, 3)
+    # Резервы не сбрасывают кэш витрины, он обновляется по TTL
+    cache.clear()
+    data = api_client.get(url).json()
+    assert [item["count"] for item in data] == [9]
@@ -0,0 +1,99 @@
+# tests/test_views_async.py
+import datetime
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+
+from shop import views_async, views_catalog, views_product
+from shop.models import Banner, Category, Product, Review, Sale, Tag
+
+
+@pytest.fixture
+def storefront():
+    parent = Category.objects.create(name="Parent")
+    child = Category.objects.create(name="Child", parent=parent)
+    tag = Tag.objects.create(name="Tag")
+    products = []
+    for index in range(5):
+        product = Product.objects.create(
+            title=f"Product {index}",
+            price=100 + index,
+            count=index * 5,
+            category=child,
+            description="Description",
+            full_description="Full description",
+        )
+        product.tags.add(tag)
+        products.append(product)
+    Review.objects.create(
+        product=products[0], author="A", email="a@example.com", text="Ok", rate=4
+    )
+    Sale.objects.create(
+        product=products[1],
+        sale_price=50,
+        date_from=datetime.date.today(),
+        date_to=datetime.date.today() + datetime.timedelta(days=1),
+    )
+    Banner.objects.create(
+        product=products[2], title="Banner", description="Banner", image="banner.jpg"
+    )
+    return products
+
+
+def call(view, path, *args, **headers):
+    request = RequestFactory().get(path, headers=headers)
+    if views_async.__name__ in view.__module__:
+        return async_to_sync(view)(request, *args)
+    return view(request, *args)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "name, path",
+    [
+        ("get_categories", "/api/categories"),
+        ("get_catalog", "/api/catalog/?limit=2&currentPage=2"),
+        ("get_catalog", "/api/catalog/?limit=2&currentPage=9&sort=price"),
+        ("get_catalog", '/api/catalog/?filter={"available": true}&limit=2&cursor='),
+        ("get_catalog", '/api/catalog/?filter={"name": "Product 3"}'),
+        ("get_products_popular", "/api/products/popular"),
+        ("get_products_limited", "/api/products/limited"),
+        ("get_sales", "/api/sales/"),
+        ("get_banners", "/api/banners"),
+    ],
+)
+def test_async_views_match_sync_views(storefront, name, path):
+    sync_response = call(getattr(views_catalog, name), path)
+    async_response = call(getattr(views_async, name), path)
+
+    assert async_response.status_code == sync_response.status_code == 200
+    assert json.loads(async_response.content) == json.loads(sync_response.content)
+
+
+@pytest.mark.django_db
+def test_async_product_item(storefront):
+    product = storefront[1]
+    sync_response = call(views_product.get_product_item, "/", product.id)
+    async_response = call(views_async.get_product_item, "/", product.id)
+
+    assert json.loads(async_response.content) == json.loads(sync_response.content)
+    assert call(views_async.get_product_item, "/", 999).status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_categories_not_modified(storefront):
+    response = call(views_async.get_categories, "/api/categories")
+    etag = response["ETag"]
+
+    response = call(views_async.get_categories, "/api/categories", if_none_match=etag)
+
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+
+@pytest.mark.django_db
+def test_async_catalog_invalid_cursor(storefront):
+    response = call(views_async.get_catalog, "/api/catalog/?cursor=broken")
+    assert response.status_code == 400
@@ -1,6 +1,12 @@
 # tests/test_views_basket.py
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
 import pytest
 from django.contrib.auth.models import User
+from django.db import connection
 from django.urls import reverse
 from rest_framework.test import APIClient
 
@@ -145,3 +151,145 @@ def test_delete_basket_nonexistent_item(api_client, create_user):
 
     assert response.status_code == 404
     assert response.json() == {"error": "Item not found in basket"}
+
+
+@pytest.mark.django_db
+def test_post_basket_bulk(api_client, create_user, create_product):
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+
+    kept = create_product("Kept", 100.0, 10)
+    removed = create_product("Removed", 50.0, 10)
+    added = create_product("Added", 30.0, 10)
+    BasketItem.objects.create(user=user, product=kept, quantity=2)
+    BasketItem.objects.create(user=user, product=removed, quantity=1)
+
+    url = reverse("basket_bulk")
+    payload = [
+        {"id": kept.id, "count": 3},
+        {"id": removed.id, "count": -1},
+        {"id": added.id, "count": 1},
+        {"id": added.id, "count": 1},
+    ]
+    response = api_client.post(url, payload, format="json")
+
+    assert response.status_code == 200
+    quantities = dict(
+        BasketItem.objects.filter(user=user).values_list("product_id", "quantity")
+    )
+    assert quantities == {kept.id: 5, added.id: 2}
+
+
+@pytest.mark.django_db
+def test_post_basket_bulk_unknown_product(api_client, create_user, create_product):
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+
+    product = create_product("Test Product", 100.0, 10)
+    url = reverse("basket_bulk")
+    payload = [{"id": product.id, "count": 1}, {"id": 999, "count": 1}]
+    response = api_client.post(url, payload, format="json")
+
+    assert response.status_code == 404
+    assert not BasketItem.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db
+def test_get_basket_compact(
+    api_client, create_user, create_product, create_sale, django_assert_num_queries
+):
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+
+    regular = create_product("Regular", 100.0, 10)
+    discounted = create_product("Discounted", 50.0, 10)
+    create_sale(discounted, 40.0, date.today(), date.today() + timedelta(days=7))
+    BasketItem.objects.create(user=user, product=regular, quantity=2)
+    BasketItem.objects.create(user=user, product=discounted, quantity=3)
+
+    url = reverse("basket_view") + "?view=compact"
+    # Сессия, пользователь, строки корзины и товары со скидками
+    with django_assert_num_queries(4):
+        response = api_client.get(url)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert sorted(data["items"], key=lambda item: item["id"]) == [
+        {"id": regular.id, "count": 2, "price": 100.0},
+        {"id": discounted.id, "count": 3, "price": 40.0},
+    ]
+    assert data["totals"] == {"count": 5, "cost": 320.0}
+
+
+@pytest.mark.django_db
+def test_post_basket_accumulates_quantity(api_client, create_user, create_product):
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+    product = create_product("Test Product", 100.0, 10)
+
+    url = reverse("basket_view")
+    api_client.post(url, {"id": product.id, "count": 2}, format="json")
+    response = api_client.post(url, {"id": product.id, "count": 3}, format="json")
+
+    assert response.status_code == 200
+    assert response.json()[0]["count"] == 5
+    assert BasketItem.objects.filter(user=user).count() == 1
+
+
+@pytest.mark.django_db
+def test_post_basket_unknown_product(api_client, create_user):
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+
+    url = reverse("basket_view")
+    response = api_client.post(url, {"id": 999, "count": 1}, format="json")
+
+    assert response.status_code == 404
+    assert not BasketItem.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db
+def test_delete_basket_removes_item_at_zero(api_client, create_user, create_product):
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+    product = create_product("Test Product", 100.0, 10)
+    BasketItem.objects.create(user=user, product=product, quantity=2)
+
+    url = reverse("basket_view")
+    response = api_client.delete(url, {"id": product.id, "count": 5}, format="json")
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert not BasketItem.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_post_basket_concurrent_adds(create_user, create_product):
+    if connection.vendor != "postgresql":
+        pytest.skip("Параллельные upsert проверяются только на PostgreSQL")
+    user = create_user("testuser", "securepassword")
+    product = create_product("Test Product", 100.0, 10)
+    clients = []
+    for _ in range(10):
+        client = APIClient()
+        client.login(username="testuser", password="securepassword")
+        clients.append(client)
+
+    url = reverse("basket_view")
+    payload = json.dumps({"id": product.id, "count": 1})
+    barrier = threading.Barrier(len(clients))
+
+    def add(client):
+        try:
+            barrier.wait()
+            return client.post(
+                url, payload, content_type="application/json"
+            ).status_code
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        statuses = list(executor.map(add, clients))
+
+    assert statuses == [200] * 10
+    assert BasketItem.objects.get(user=user, product=product).quantity == 10
@@ -1,6 +1,7 @@
 # tests/tesrs_views_catalog.py
 import datetime
 import io
+import json
 
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -8,6 +9,7 @@ from django.urls import reverse
 from PIL import Image
 from rest_framework.test import APIClient
 
+from shop.category_tree import get_category_tree_version
 from shop.models import Banner, Category, Product, Sale
 
 
@@ -83,6 +85,44 @@ def test_get_categories(api_client, create_category):
     assert data[0]["title"] == "Parent Category"
 
 
+@pytest.mark.django_db
+def test_get_categories_nested_and_cached(
+    api_client, create_category, django_assert_num_queries
+):
+    root = create_category("Root")
+    child = create_category("Child", parent=root)
+    create_category("Grandchild", parent=child)
+
+    url = reverse("get_categories")
+    response = api_client.get(url)
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["subcategories"][0]["subcategories"][0]["title"] == "Grandchild"
+
+    etag = response["ETag"]
+    with django_assert_num_queries(0):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    child.name = "Renamed"
+    child.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()[0]["subcategories"][0]["title"] == "Renamed"
+
+
+@pytest.mark.django_db
+def test_category_save_and_delete_bump_tree_version(create_category):
+    # Ресиверы подключаются в ShopConfig.ready()
+    version = get_category_tree_version()
+    category = create_category("Root")
+    assert get_category_tree_version() != version
+
+    version = get_category_tree_version()
+    category.delete()
+    assert get_category_tree_version() != version
+
+
 @pytest.mark.django_db
 def test_get_catalog(api_client, create_product):
     product1 = create_product("Product 1", 100.0, 10)
@@ -185,3 +225,110 @@ def test_get_banners(api_client, create_product, create_banner):
     assert data[0]["title"] == "Banner 1"
     assert "src" in data[0]["images"][0]
     assert data[0]["images"][0]["alt"] == "Banner 1"
+
+
+@pytest.mark.django_db
+def test_get_catalog_cursor_pagination(api_client, create_product):
+    products = [create_product(f"Product {i}", 100.0 + i, 10) for i in range(5)]
+
+    url = f"{reverse('get_catalog')}?sort=price&sortType=dec&limit=2&cursor="
+    titles = []
+    cursor = ""
+    for page in range(1, 4):
+        response = api_client.get(f"{url}{cursor}&currentPage={page}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["currentPage"] == page
+        titles += [item["title"] for item in data["items"]]
+        cursor = data["nextCursor"]
+        if cursor is None:
+            break
+
+    assert page == 3
+    assert data["lastPage"] == 3
+    assert titles == [product.title for product in reversed(products)]
+
+
+@pytest.mark.django_db
+def test_get_catalog_invalid_cursor(api_client):
+    url = f"{reverse('get_catalog')}?cursor=not-a-cursor"
+    response = api_client.get(url)
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "Invalid cursor"}
+
+
+@pytest.mark.django_db
+def test_get_catalog_search_by_name(api_client, create_product):
+    create_product("Red phone", 100.0, 10, description="Smartphone")
+    create_product("Blue laptop", 200.0, 5, description="Fast phone charger inside")
+    create_product("Green chair", 300.0, 5)
+
+    url = reverse("get_catalog")
+    response = api_client.get(url, {"filter": json.dumps({"name": "phone"})})
+
+    assert response.status_code == 200
+    titles = [item["title"] for item in response.json()["items"]]
+    assert titles == ["Red phone", "Blue laptop"]
+
+
+@pytest.mark.django_db
+def test_get_catalog_empty_name_does_not_filter(api_client, create_product):
+    create_product("Product 1", 100.0, 10)
+    create_product("Product 2", 200.0, 5)
+
+    url = reverse("get_catalog")
+    response = api_client.get(url, {"filter": json.dumps({"name": ""})})
+
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 2
+
+
+@pytest.fixture
+def priced_products(create_product, create_sale):
+    today = datetime.date.today()
+    cheap = create_product("Cheap", 50.0, 10)
+    discounted = create_product("Discounted", 300.0, 10)
+    expired = create_product("Expired", 200.0, 10)
+    create_sale(discounted, 40.0, today, today + datetime.timedelta(days=3))
+    # Прошедшие даты не проходят Sale.clean, поэтому окно сдвигается update
+    sale = create_sale(expired, 10.0, today, today)
+    Sale.objects.filter(id=sale.id).update(
+        date_from=today - datetime.timedelta(days=5),
+        date_to=today - datetime.timedelta(days=1),
+    )
+    return cheap, discounted, expired
+
+
+@pytest.mark.django_db
+def test_get_catalog_price_filters_use_sale_price(api_client, priced_products):
+    price_filter = json.dumps({"minPrice": 30, "maxPrice": 100})
+
+    response = api_client.get(reverse("get_catalog"), {"filter": price_filter})
+
+    items = response.json()["items"]
+    assert sorted(item["title"] for item in items) == ["Cheap", "Discounted"]
+    assert {item["title"]: item["price"] for item in items}["Discounted"] == 40.0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("cursor", [None, ""])
+def test_get_catalog_sort_by_price_uses_sale_price(api_client, priced_products, cursor):
+    params = {"sort": "price", "sortType": "inc", "limit": 2}
+    if cursor is not None:
+        params["cursor"] = cursor
+    titles = []
+    while True:
+        data = api_client.get(reverse("get_catalog"), params).json()
+        titles += [item["title"] for item in data["items"]]
+        if cursor is None or not data["nextCursor"]:
+            break
+        params["cursor"] = data["nextCursor"]
+    if cursor is None:
+        params["currentPage"] = 2
+        titles += [
+            item["title"]
+            for item in api_client.get(reverse("get_catalog"), params).json()["items"]
+        ]
+
+    assert titles == ["Discounted", "Cheap", "Expired"]
@@ -1,11 +1,30 @@
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
 
 import pytest
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 
-from shop.models import BasketItem, Order, Product, Profile
+from shop.models import (
+    BasketItem,
+    IdempotencyKey,
+    Order,
+    Product,
+    Profile,
+    Sale,
+    StockReservation,
+)
+
+# Дата заказа с микросекундами: в ответе только строка для отображения
+CREATED_AT = datetime(2024, 5, 1, 12, 30, 45, 123456, tzinfo=dt_timezone.utc)
 
 
 @pytest.fixture
@@ -111,11 +130,100 @@ def test_post_orders(api_client, create_user, create_product, create_profile):
     assert BasketItem.objects.filter(user=user).count() == 0
 
 
+@pytest.mark.django_db
+def test_post_orders_uses_sale_price(
+    api_client, create_user, create_product, create_profile
+):
+    user = create_user("testuser", "securepassword")
+    create_profile(user)
+    api_client.login(username="testuser", password="securepassword")
+    product = create_product("Product 1", 100.0, 10)
+    Sale.objects.create(
+        product=product,
+        sale_price=Decimal("79.99"),
+        date_from=date.today(),
+        date_to=date.today() + timedelta(days=1),
+    )
+
+    response = api_client.post(
+        reverse("orders_view"),
+        json.dumps([{"id": product.id, "count": 3}]),
+        content_type="application/json",
+    )
+
+    order = Order.objects.get(id=response.json()["orderId"])
+    assert order.total_cost == Decimal("239.97")
+    assert order.items.get().price == Decimal("79.99")
+
+
+@pytest.mark.django_db
+def test_post_orders_idempotency_key(
+    api_client, create_user, create_product, create_profile
+):
+    user = create_user("testuser", "securepassword")
+    create_profile(user)
+    api_client.login(username="testuser", password="securepassword")
+    product = create_product("Product 1", 100.0, 10)
+
+    url = reverse("orders_view")
+    payload = json.dumps([{"id": product.id, "count": 2}])
+    first = api_client.post(
+        url, payload, content_type="application/json", HTTP_IDEMPOTENCY_KEY="order-1"
+    )
+    second = api_client.post(
+        url, payload, content_type="application/json", HTTP_IDEMPOTENCY_KEY="order-1"
+    )
+    other = api_client.post(
+        url,
+        json.dumps([{"id": product.id, "count": 1}]),
+        content_type="application/json",
+        HTTP_IDEMPOTENCY_KEY="order-1",
+    )
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert other.status_code == 422
+    assert Order.objects.filter(user=user).count() == 1
+
+
+@pytest.mark.django_db
+def test_abandoned_idempotency_key_is_retaken_after_lease(
+    api_client, create_user, create_product, create_profile
+):
+    user = create_user("testuser", "securepassword")
+    create_profile(user)
+    api_client.login(username="testuser", password="securepassword")
+    product = create_product("Product 1", 100.0, 10)
+    url = reverse("orders_view")
+    payload = json.dumps([{"id": product.id, "count": 1}])
+
+    def post():
+        cache.clear()
+        return api_client.post(
+            url, payload, content_type="application/json", HTTP_IDEMPOTENCY_KEY="k-1"
+        )
+
+    assert post().status_code == 200
+    # Воркер упал, не сохранив ответ: строка осталась «в работе»
+    in_progress = IdempotencyKey.objects.filter(user=user, key="k-1")
+    in_progress.update(
+        status_code=None, locked_until=timezone.now() + timedelta(minutes=1)
+    )
+    assert post().status_code == 409
+
+    in_progress.update(locked_until=timezone.now() - timedelta(seconds=1))
+    assert post().status_code == 200
+    assert Order.objects.filter(user=user).count() == 2
+    record = in_progress.get()
+    assert (record.status_code, record.locked_until) == (200, None)
+
+
 @pytest.mark.django_db
 def test_get_order_by_id(api_client, create_user, create_order):
     user = create_user("testuser", "securepassword")
     api_client.login(username="testuser", password="securepassword")
     order = create_order(user)
+    Order.objects.filter(id=order.id).update(created_at=CREATED_AT)
 
     url = reverse("order_view", args=[order.id])
     response = api_client.get(url)
@@ -124,6 +232,7 @@ def test_get_order_by_id(api_client, create_user, create_order):
     data = response.json()
     assert data["id"] == order.id
     assert data["status"] == "pending"
+    assert data["createdAt"] == "2024-05-01 12:30"
 
 
 @pytest.mark.django_db
@@ -150,7 +259,8 @@ def test_post_order_update(api_client, create_user, create_order):
 def test_get_history_order(api_client, create_user, create_order):
     user = create_user("testuser", "securepassword")
     api_client.login(username="testuser", password="securepassword")
-    create_order(user, total_cost=100.0, status="pending")
+    order = create_order(user, total_cost=100.0, status="pending")
+    Order.objects.filter(id=order.id).update(created_at=CREATED_AT)
 
     url = reverse("get_history_order")
     response = api_client.get(url)
@@ -159,4 +269,88 @@ def test_get_history_order(api_client, create_user, create_order):
     data = response.json()
     assert len(data) == 1
     assert data[0]["status"] == "Pending"
+    assert data[0]["createdAt"] == "2024-05-01 12:30:45"
     assert float(data[0]["totalCost"]) == 100.0
+
+
+@pytest.mark.django_db
+def test_post_orders_not_enough_stock(
+    api_client, create_user, create_product, create_profile
+):
+    user = create_user("testuser", "securepassword")
+    create_profile(user)
+    api_client.login(username="testuser", password="securepassword")
+    product = create_product("Product 1", 100.0, 1)
+
+    url = reverse("orders_view")
+    payload = [{"id": product.id, "count": 2}]
+    response = api_client.post(
+        url, json.dumps(payload), content_type="application/json"
+    )
+
+    assert response.status_code == 400
+    assert response.json()["products"] == [product.id]
+    assert Order.objects.count() == 0
+    product.refresh_from_db()
+    assert product.count == 1
+
+
+@pytest.mark.django_db
+def test_post_orders_query_count_is_fixed(
+    api_client, create_user, create_product, create_profile, django_assert_num_queries
+):
+    user = create_user("testuser", "securepassword")
+    create_profile(user)
+    api_client.login(username="testuser", password="securepassword")
+    products = [create_product(f"Product {i}", 100.0, 10) for i in range(5)]
+
+    url = reverse("orders_view")
+    payload = [{"id": product.id, "count": 2} for product in products]
+    with django_assert_num_queries(12):
+        response = api_client.post(
+            url, json.dumps(payload), content_type="application/json"
+        )
+
+    assert response.status_code == 200
+    order = Order.objects.get(id=response.json()["orderId"])
+    assert order.total_cost == 1000.0
+    assert order.reservations.filter(status="active", quantity=2).count() == 5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_post_orders_concurrent_checkout_does_not_oversell(create_product):
+    if connection.vendor != "postgresql":
+        pytest.skip("Блокировки строк проверяются только на PostgreSQL")
+    product = create_product("Product 1", 100.0, 5)
+    clients = []
+    for index in range(20):
+        user = User.objects.create_user(username=f"user{index}", password="pass")
+        Profile.objects.create(
+            user=user, fullName="Test User", email=f"user{index}@example.com"
+        )
+        client = APIClient()
+        client.login(username=f"user{index}", password="pass")
+        clients.append(client)
+
+    url = reverse("orders_view")
+    payload = json.dumps([{"id": product.id, "count": 1}])
+    barrier = threading.Barrier(len(clients))
+
+    def checkout(client):
+        try:
+            barrier.wait()
+            return client.post(
+                url, payload, content_type="application/json"
+            ).status_code
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        statuses = list(executor.map(checkout, clients))
+
+    assert statuses.count(200) == 5
+    assert statuses.count(400) == 15
+    assert Order.objects.count() == 5
+    assert (
+        StockReservation.objects.filter(product=product, status="active").count() == 5
+    )
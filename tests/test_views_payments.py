@@ -1,15 +1,13 @@
+import hashlib
 import json
-from unittest.mock import (
-    MagicMock,
-    patch,
-)
+from unittest.mock import patch
 
 import pytest
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework.test import APIClient
 
-from shop.models import Order, Profile
+from shop.models import IdempotencyKey, Order, Profile
 
 
 @pytest.fixture
@@ -128,20 +126,31 @@ def test_create_payment(mock_payment_create, api_client, create_user, create_ord
 
 
 @pytest.mark.django_db
-@patch("shop.views_payments.Payment.find_one")
-def test_payment_success(mock_find_one, api_client, create_user, create_order):
-    mock_find_one.return_value = MagicMock(id="test_payment_id", status="succeeded")
+def test_payment_success_reads_local_state(api_client, create_user, create_order):
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+    order = create_order(user, total_cost=100.0, status="paid", payment_id="pay_1")
+
+    url = reverse("payment_success") + f"?order_id={order.id}"
+    response = api_client.get(url)
 
+    assert response.status_code == 200
+    assert "payment_success.html" in [t.name for t in response.templates]
+
+
+@pytest.mark.django_db
+def test_payment_success_waits_for_notification(api_client, create_user, create_order):
     user = create_user("testuser", "securepassword")
     api_client.login(username="testuser", password="securepassword")
-    order = create_order(
-        user, total_cost=100.0, status="pending", payment_id="test_payment_id"
-    )
+    order = create_order(user, total_cost=100.0, payment_id="pay_1")
+
     url = reverse("payment_success") + f"?order_id={order.id}"
     response = api_client.get(url)
+
     assert response.status_code == 200
+    assert "payment_pending.html" in [t.name for t in response.templates]
     order.refresh_from_db()
-    assert order.status == "paid"
+    assert order.status == "pending"
 
 
 @pytest.mark.django_db
@@ -155,3 +164,68 @@ def test_retry_payment(api_client, create_user, create_order):
 
     assert response.status_code == 302  # Redirect to create_payment
     assert response.url == reverse("create_payment", args=[order.id])
+
+
+@pytest.mark.django_db
+@patch("yookassa.Payment.create")
+def test_create_payment_idempotency_key(
+    mock_payment_create, api_client, create_user, create_order
+):
+    mock_payment_create.return_value = {
+        "id": "test_payment_id",
+        "confirmation": {"confirmation_url": "http://test-confirmation-url.com"},
+    }
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+    order = create_order(user, total_cost=100.0, status="pending")
+
+    url = reverse("create_payment", args=[order.id])
+    first = api_client.get(url, HTTP_IDEMPOTENCY_KEY="payment-1")
+    second = api_client.get(url, HTTP_IDEMPOTENCY_KEY="payment-1")
+
+    assert mock_payment_create.call_count == 1
+    assert second.status_code == first.status_code == 302
+    assert second["Location"] == "http://test-confirmation-url.com"
+    assert second["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.django_db
+def test_post_payment_replay_skips_view(
+    api_client, create_user, create_order, django_assert_max_num_queries
+):
+    user = create_user("testuser", "securepassword")
+    api_client.login(username="testuser", password="securepassword")
+    order = create_order(user, total_cost=100.0, status="pending")
+    url = reverse("post_payment", args=[order.id])
+    payload = json.dumps(
+        {
+            "number": "1234567812345678",
+            "name": "Test User",
+            "month": "12",
+            "year": "25",
+            "code": "123",
+        }
+    )
+    first = api_client.post(
+        url, payload, content_type="application/json", HTTP_IDEMPOTENCY_KEY="pay-1"
+    )
+    Order.objects.filter(id=order.id).update(status="pending")
+
+    # Только сессия и пользователь: ответ берется из кэша
+    with django_assert_max_num_queries(2):
+        second = api_client.post(
+            url, payload, content_type="application/json", HTTP_IDEMPOTENCY_KEY="pay-1"
+        )
+
+    assert second.json() == first.json()
+    order.refresh_from_db()
+    assert order.status == "pending"
+    # В БД нет хэша, по которому можно подобрать номер карты и CVV
+    stored = IdempotencyKey.objects.get(key="pay-1").request_hash
+    assert stored != hashlib.sha256(payload.encode()).hexdigest()
+    assert (
+        stored
+        != hashlib.sha256(
+            b"\0".join([b"POST", url.encode(), payload.encode()]) + b"\0"
+        ).hexdigest()
+    )
@@ -1,5 +1,5 @@
 import json
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 
 import pytest
 from django.urls import reverse
@@ -69,15 +69,21 @@ def test_get_product_item(api_client, create_product, create_sale, create_review
         date_to=now().date() + timedelta(days=1),
     )
 
-    create_review(product, "Test Author", "test@example.com", "Great product!", 5)
+    review = create_review(
+        product, "Test Author", "test@example.com", "Great product!", 5
+    )
+    Review.objects.filter(id=review.id).update(
+        date=datetime(2024, 5, 1, 12, 30, 45, 123456, tzinfo=timezone.utc)
+    )
     url = reverse("get_product_item", args=[product.id])
     response = api_client.get(url)
     assert response.status_code == 200
     data = response.json()
     assert data["id"] == product.id
-    assert data["price"] == "80.00"
+    assert data["price"] == 80.0
     assert len(data["reviews"]) == 1
     assert data["reviews"][0]["author"] == "Test Author"
+    assert data["reviews"][0]["date"] == "2024-05-01 12:30"
 
 
 @pytest.mark.django_db